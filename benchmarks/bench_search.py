@@ -0,0 +1,251 @@
+"""
+Offline benchmark of the search pipeline against a local fixture server.
+
+Measures fetch, parse, dedupe and notify throughput, plus the p50/p99 latency of whole search cycles,
+and writes the results as JSON so runs can be compared across commits.
+
+Usage (from the repository root):
+    python benchmarks/bench_search.py --pages 5 --items 50 --latency-ms 20 --output bench_results.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from functools import partial
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "src"))
+
+import html_parser
+import scraper
+
+from fixture_server import FixtureServer
+from http_client import HttpClient
+from listing_store import ListingStore, listing_key
+from notifications import MemorySink, NotificationDispatcher
+
+# Search parameters used for every benchmarked search
+SEARCH_PARAMS = {"model": "VW ID7", "year": "2023"}
+
+def percentile(samples, percent):
+    """
+    Get a nearest-rank percentile.
+
+    Parameters:
+    samples (list): The measured values.
+    percent (float): The percentile, between 0 and 100.
+
+    Returns:
+    float: The percentile value, or 0 if there are no samples.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+def summarize(samples, total_bytes=None, total_items=None):
+    """
+    Summarize the durations of one phase.
+
+    Parameters:
+    samples (list): Durations in seconds.
+    total_bytes (int): Bytes processed over all samples, for throughput.
+    total_items (int): Items processed over all samples, for throughput.
+
+    Returns:
+    dict: Count, total, mean, p50 and p99 in milliseconds and the throughputs.
+    """
+    total = sum(samples)
+    summary = {
+        "count": len(samples),
+        "total_s": round(total, 6),
+        "mean_ms": round(total / len(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
+    if total_bytes is not None and total:
+        summary["mb_per_s"] = round(total_bytes / total / 1e6, 3)
+    if total_items is not None and total:
+        summary["items_per_s"] = round(total_items / total, 1)
+    return summary
+
+def page_urls(server, pages):
+    """
+    Get the URLs of every result page of the benchmark search.
+    """
+    first = scraper.build_search_url(SEARCH_PARAMS, server.base_url)
+    return [first] + [f"{first}&page={page}" for page in range(2, pages + 1)]
+
+def bench_fetch(client, urls, rounds):
+    """
+    Fetch every page `rounds` times over the pooled client.
+
+    Returns:
+    tuple: The phase summary and the (url, content) of every page.
+    """
+    samples, total_bytes, pages = [], 0, []
+    for _ in range(rounds):
+        pages = []
+        for url in urls:
+            start = time.perf_counter()
+            response = client.get(url)
+            content = response.content
+            samples.append(time.perf_counter() - start)
+            total_bytes += len(content)
+            pages.append((response.url, content))
+    return summarize(samples, total_bytes=total_bytes), pages
+
+def bench_parse(pages, backend, rounds):
+    """
+    Parse every fetched page `rounds` times with the given backend.
+
+    Returns:
+    tuple: The phase summary and the listings of the last round.
+    """
+    parser = html_parser.get_listing_parser(scraper.SELECTORS, backend)
+    samples, total_bytes, total_items, listings = [], 0, 0, []
+    for _ in range(rounds):
+        listings = []
+        for url, content in pages:
+            start = time.perf_counter()
+            page_listings, _ = parser.parse(content, url)
+            samples.append(time.perf_counter() - start)
+            total_bytes += len(content)
+            total_items += len(page_listings)
+            listings.extend(page_listings)
+    return summarize(samples, total_bytes=total_bytes, total_items=total_items), listings
+
+def bench_dedupe(listings, rounds, db_dir):
+    """
+    Apply the listings to a fresh store, then again to the warmed store.
+
+    Returns:
+    dict: The summaries of the first (all new) and repeated (all known) runs.
+    """
+    first, repeated = [], []
+    for round_number in range(rounds):
+        store = ListingStore(os.path.join(db_dir, f"dedupe-{round_number}.db"))
+        start = time.perf_counter()
+        store.apply_run("bench", listings, complete=True)
+        first.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        store.apply_run("bench", listings, complete=True)
+        repeated.append(time.perf_counter() - start)
+        store.close()
+    return {
+        "first_run": summarize(first, total_items=len(listings) * rounds),
+        "repeat_run": summarize(repeated, total_items=len(listings) * rounds),
+    }
+
+def bench_notify(listings, rounds):
+    """
+    Time from queueing a batch on the dispatcher until the sink received it.
+
+    Returns:
+    dict: The phase summary.
+    """
+    samples = []
+    for _ in range(rounds):
+        sink = MemorySink()
+        dispatcher = NotificationDispatcher([sink], coalesce_seconds=0)
+        dispatcher.start()
+        start = time.perf_counter()
+        dispatcher.notify(listings)
+        dispatcher.stop()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, total_items=len(listings) * rounds)
+
+def bench_pipeline(server, client, pages, rounds, db_dir):
+    """
+    Time whole search cycles: a full crawl into an empty store, then a re-poll of the warmed store.
+
+    Returns:
+    dict: The summaries of full crawls and re-polls, with the pages fetched per re-poll.
+    """
+    full, repoll = [], []
+    requests_before = server.requests
+    for round_number in range(rounds):
+        store = ListingStore(os.path.join(db_dir, f"pipeline-{round_number}.db"))
+        key = scraper.search_key(SEARCH_PARAMS)
+        for samples in (full, repoll):
+            start = time.perf_counter()
+            result = scraper.run_search(SEARCH_PARAMS, is_seen=partial(store.is_known, key), client=client,
+                                        max_pages=pages, base_url=server.base_url)
+            store.apply_run(key, result.listings, result.complete)
+            samples.append(time.perf_counter() - start)
+        store.close()
+    pages_per_cycle = (server.requests - requests_before) / rounds
+    return {
+        "full_crawl": summarize(full),
+        "repoll": summarize(repoll),
+        "pages_per_repoll": round(pages_per_cycle - pages, 2),
+    }
+
+def git_commit():
+    """
+    Returns:
+    str: The current commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5, help="result pages per search")
+    parser.add_argument("--items", type=int, default=50, help="listings per result page")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay injected before every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="random extra delay per response")
+    parser.add_argument("--padding", type=int, default=0, help="filler bytes per listing")
+    parser.add_argument("--rounds", type=int, default=5, help="repetitions of every phase")
+    parser.add_argument("--backend", default="auto", help="HTML parser backend")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    html_parser.set_default_backend(args.backend)
+    # Rate limiting would measure the limiter, not the pipeline
+    client = HttpClient(rate_limit_per_host=0)
+
+    with FixtureServer(args.pages, args.items, args.latency_ms, args.jitter_ms, args.padding) as server, \
+            tempfile.TemporaryDirectory() as db_dir:
+        fetch, pages = bench_fetch(client, page_urls(server, args.pages), args.rounds)
+        parse, listings = bench_parse(pages, args.backend, args.rounds)
+        dedupe = bench_dedupe(listings, args.rounds, db_dir)
+        notify = bench_notify(listings, args.rounds)
+        pipeline = bench_pipeline(server, client, args.pages, args.rounds, db_dir)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser_backend": html_parser.get_backend(args.backend).name,
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": {
+            "fetch": fetch,
+            "parse": parse,
+            "dedupe": dedupe,
+            "notify": notify,
+            "pipeline": pipeline,
+        },
+        "listings_per_search": len({listing_key(listing) for listing in listings}),
+    }
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
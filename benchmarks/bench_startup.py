@@ -0,0 +1,232 @@
+"""
+Benchmark of the GUI cold start: import time and the time until the main window is shown.
+
+Starts the application in fresh interpreters with -X importtime and reports, as the median of
+several runs, the time from process start until the main window is shown, first painted and
+ready to search, the import time spent before and after the first show, and the modules that
+cost the most before it. The results are written as JSON so runs can be compared across
+commits. The application opens its usual config and data files but runs no search.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py --runs 5 --output startup_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.normpath(os.path.join(BENCH_DIR, "..", "src"))
+
+# Modules that should not be imported before the first window is shown
+HEAVY_MODULES = ("requests", "urllib3", "sentry_sdk", "aiohttp", "bs4", "lxml", "twilio", "smtplib", "numpy")
+
+# Written to stderr by the child when the window is first shown, splitting the import log
+SHOW_MARKER = "bench-startup: first show"
+
+# Runs in the child interpreter; mirrors main.main() and reports when each startup stage is
+# reached as "MARK <stage> <wall clock time>" lines on stdout
+CHILD_SCRIPT = r"""
+import os, sys, time
+sys.path.insert(0, os.getcwd())
+
+def mark(stage):
+    print(f"MARK {stage} {time.time()!r}", flush=True)
+
+import main
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+mark("imported")
+
+app = QApplication(sys.argv)
+sys.excepthook = main.exception_hook
+window_manager = main.WindowManager(app)
+window_manager.run()
+window = window_manager.main_window
+sys.stderr.write(SHOW_MARKER + "\n")
+sys.stderr.flush()
+mark("first_show")
+
+class PaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and not getattr(self, "painted", False):
+            self.painted = True
+            mark("first_paint")
+        return False
+
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+
+def wait_until_ready():
+    if window.search_engine is None:
+        QTimer.singleShot(5, wait_until_ready)
+        return
+    mark("search_ready")
+    # Leave the app without closing the window, which would save the config
+    sys.stdout.flush()
+    os._exit(0)
+
+QTimer.singleShot(0, wait_until_ready)
+QTimer.singleShot(TIMEOUT_MS, lambda: os._exit(1))
+app.exec()
+"""
+
+# One line of -X importtime: "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def parse_importtime(stderr):
+    """
+    Split the -X importtime log of a run at the first show.
+
+    Parameters:
+    stderr (str): The standard error of the child.
+
+    Returns:
+    tuple: (modules imported before the first show, after it), each a list of
+    (name, self microseconds, cumulative microseconds, nesting depth) tuples.
+    """
+    before, after = [], []
+    current = before
+    for line in stderr.splitlines():
+        if line.strip() == SHOW_MARKER:
+            current = after
+            continue
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            current.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return before, after
+
+def run_once(python, platform_name, timeout_s):
+    """
+    Start the application once and measure its startup.
+
+    Parameters:
+    python (str): The interpreter to run.
+    platform_name (str): The Qt platform plugin, e.g. "offscreen", or None for the default.
+    timeout_s (float): Time after which the run is abandoned.
+
+    Returns:
+    dict: The stage times in milliseconds since the process was started, the import
+    times before and after the first show and the imported modules.
+
+    Raises:
+    RuntimeError: If the application does not become ready.
+    """
+    env = dict(os.environ)
+    if platform_name:
+        env["QT_QPA_PLATFORM"] = platform_name
+    script = CHILD_SCRIPT.replace("SHOW_MARKER", repr(SHOW_MARKER)).replace("TIMEOUT_MS", str(int(timeout_s * 1000)))
+    started = time.time()
+    completed = subprocess.run([python, "-X", "importtime", "-c", script], cwd=SRC_DIR, env=env,
+                               capture_output=True, text=True, timeout=timeout_s + 10)
+    stages = {}
+    for line in completed.stdout.splitlines():
+        if line.startswith("MARK "):
+            _, stage, timestamp = line.split()
+            stages[stage] = round((float(timestamp) - started) * 1000, 1)
+    if completed.returncode != 0 or "search_ready" not in stages:
+        raise RuntimeError(f"The application did not start (exit code {completed.returncode}):\n"
+                           f"{completed.stderr[-2000:]}")
+
+    before, after = parse_importtime(completed.stderr)
+    return {
+        "stages_ms": stages,
+        # Top-level entries already include the modules they imported
+        "import_before_show_ms": round(sum(cumulative for _, _, cumulative, depth in before if depth == 0) / 1000, 1),
+        "import_after_show_ms": round(sum(cumulative for _, _, cumulative, depth in after if depth == 0) / 1000, 1),
+        "before_show": before,
+    }
+
+def median_of(runs, get):
+    """
+    Get the median of a value over the runs that have it.
+    """
+    values = [get(run) for run in runs if get(run) is not None]
+    return round(statistics.median(values), 1) if values else None
+
+def summarize(runs, top):
+    """
+    Combine the runs into the report.
+
+    Parameters:
+    runs (list): The results of run_once().
+    top (int): The number of most expensive modules to list.
+
+    Returns:
+    dict: The medians of the stage and import times, the most expensive modules imported
+    before the first show and the heavy modules among them.
+    """
+    stages = sorted({stage for run in runs for stage in run["stages_ms"]},
+                    key=lambda stage: median_of(runs, lambda run: run["stages_ms"].get(stage)))
+    cumulative = {}
+    self_times = {}
+    for run in runs:
+        for name, self_us, cumulative_us, _ in run["before_show"]:
+            cumulative.setdefault(name, []).append(cumulative_us)
+            self_times.setdefault(name, []).append(self_us)
+    slowest = sorted(cumulative, key=lambda name: statistics.median(cumulative[name]), reverse=True)[:top]
+    return {
+        "stages_ms": {stage: median_of(runs, lambda run: run["stages_ms"].get(stage)) for stage in stages},
+        "import_before_show_ms": median_of(runs, lambda run: run["import_before_show_ms"]),
+        "import_after_show_ms": median_of(runs, lambda run: run["import_after_show_ms"]),
+        "slowest_imports_before_show": [
+            {
+                "module": name,
+                "cumulative_ms": round(statistics.median(cumulative[name]) / 1000, 2),
+                "self_ms": round(statistics.median(self_times[name]) / 1000, 2),
+            }
+            for name in slowest
+        ],
+        "heavy_modules_before_show": sorted(name for name in cumulative if name in HEAVY_MODULES),
+    }
+
+def git_commit():
+    """
+    Returns:
+    str: The current commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="number of cold starts")
+    parser.add_argument("--warmup", type=int, default=1, help="starts run first and not measured, to fill OS caches")
+    parser.add_argument("--platform", default="offscreen",
+                        help="Qt platform plugin, or an empty string for the default display")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to report")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds after which a start is abandoned")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    for _ in range(args.warmup):
+        run_once(sys.executable, args.platform, args.timeout)
+    runs = [run_once(sys.executable, args.platform, args.timeout) for _ in range(args.runs)]
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": summarize(runs, args.top),
+    }
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import hashlib
+import random
+import struct
+import threading
+import time
+import zlib
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+class FixtureServer:
+    """
+    Local HTTP server serving synthetic, paginated search result pages.
+
+    Every page holds `items_per_page` listings using the `.listing-item`/`.title`/`.price`
+    markup the scraper expects, and links to the next page until `pages` is reached.
+    Pages carry an ETag and unchanged pages are answered with 304 to conditional requests.
+    """
+    def __init__(self, pages=5, items_per_page=50, latency_ms=0.0, jitter_ms=0.0, padding_bytes=0, images=False):
+        """
+        Initialize the FixtureServer.
+
+        Parameters:
+        pages (int): Number of result pages of every search.
+        items_per_page (int): Listings per result page.
+        latency_ms (float): Delay added before every response.
+        jitter_ms (float): Random extra delay of up to this many milliseconds.
+        padding_bytes (int): Filler markup added to every listing to make pages larger.
+        images (bool): Give every listing an image, served as a PNG under /image/.
+        """
+        self.pages = pages
+        self.items_per_page = items_per_page
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.padding = "x" * padding_bytes
+        self.images = images
+        self.requests = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """
+        Returns:
+        str: The search URL to pass as the scraper's base_url.
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/search?"
+
+    def render_page(self, query, page):
+        """
+        Render one result page.
+
+        Parameters:
+        query (dict): The search parameters of the request.
+        page (int): The 1-based page number.
+
+        Returns:
+        bytes: The HTML of the page.
+        """
+        search = "-".join(str(value) for _, value in sorted(query.items())) or "all"
+        items = []
+        for index in range(self.items_per_page):
+            number = (page - 1) * self.items_per_page + index
+            image = f'<img src="/image/{number}.png">' if self.images else ""
+            items.append(
+                f'<div class="listing-item">{image}'
+                f'<a href="/listing/{search}/{number}"><span class="title">{search} car #{number}</span></a>'
+                f'<span class="price">{10000 + number * 37} EUR</span>'
+                f'<p class="description">{self.padding}</p>'
+                f'</div>'
+            )
+        next_link = ""
+        if page < self.pages:
+            next_link = f'<div class="pagination"><a rel="next" href="/search?{urlencode({**query, "page": page + 1})}">Next</a></div>'
+        return f"<html><body><div class=\"results\">{''.join(items)}</div>{next_link}</body></html>".encode("utf-8")
+
+    @staticmethod
+    def render_image(number, width=320, height=240):
+        """
+        Render the image of a listing, a solid PNG whose color depends on the listing number.
+
+        Parameters:
+        number (int): The listing number.
+        width (int): The image width in pixels.
+        height (int): The image height in pixels.
+
+        Returns:
+        bytes: The PNG file.
+        """
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        color = bytes(((number * 67) % 256, (number * 131) % 256, (number * 29) % 256))
+        rows = b"".join(b"\x00" + color * width for _ in range(height))
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+    def start(self):
+        """
+        Start serving on a free localhost port in a background thread.
+
+        Returns:
+        FixtureServer: This server, for chaining.
+        """
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like a real site
+            disable_nagle_algorithm = True  # Headers and body are written separately
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path.startswith("/image/"):
+                    body = fixture.render_image(int(path[len("/image/"):].split(".")[0]))
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/png")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                query = dict(parse_qsl(urlsplit(self.path).query))
+                page = int(query.pop("page", 1))
+                delay = fixture.latency_ms + random.uniform(0, fixture.jitter_ms)
+                if delay:
+                    time.sleep(delay / 1000)
+                with fixture._lock:
+                    fixture.requests += 1
+
+                body = fixture.render_page(query, page)
+                etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    with fixture._lock:
+                        fixture.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="FixtureServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
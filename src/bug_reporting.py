@@ -1,16 +1,46 @@
-import sentry_sdk
-import os
 import sys
 import logging
+import threading
 
+from logging_setup import DEFAULT_LOG_PATH, flush_logging, tail_lines
 from PySide6.QtWidgets import QApplication, QDialog, QTextEdit, QPushButton, QVBoxLayout, QLabel
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
+# Project the reports are sent to
+SENTRY_DSN = "https://cf091345c1c0562686b5b85b3c64cb31@o4508930992439296.ingest.de.sentry.io/4508930996699216"
+
 # Global flag to track if the dialog has been shown
 _dialog_shown = False
 
+# Guards the one-time initialization of Sentry, which may run on a background thread
+_sentry_lock = threading.Lock()
+
+def init_sentry(traces_sample_rate=0.0):
+    """
+    Import and initialize Sentry once; later calls return the initialized module.
+
+    Importing sentry_sdk and its integrations takes a large share of the startup time, so
+    the GUI calls this after the first window is shown, on a background thread. Reporting
+    an error initializes Sentry right away if that has not happened yet.
+
+    Parameters:
+    traces_sample_rate (float): The traces sample rate; performance tracing is off at 0.
+
+    Returns:
+    module: The sentry_sdk module.
+    """
+    with _sentry_lock:
+        import sentry_sdk
+        from sentry_sdk.integrations.excepthook import ExcepthookIntegration
+        if not sentry_sdk.is_initialized():
+            # exception_hook already reports unhandled exceptions; Sentry's own hook would
+            # wrap it when initialized after it is installed and report them twice
+            sentry_sdk.init(dsn=SENTRY_DSN, traces_sample_rate=traces_sample_rate,
+                            disabled_integrations=[ExcepthookIntegration()])
+        return sentry_sdk
+
 class BugReportDialog(QDialog):
     """
     Dialog to report a bug to the user and send a report to Sentry.
@@ -54,15 +84,15 @@ class BugReportDialog(QDialog):
         """
         # Get the description and log content
         desc = self.description.toPlainText()
-        log_path = os.path.join(os.path.dirname(__file__), "data/application.log")
-        # Read the last 1000 lines of the log file
+        # Read the last 1000 lines of the log file, including records still queued
+        flush_logging()
         try:
-            with open(log_path, 'r') as log_file:
-                log_content = ''.join(log_file.readlines()[-1000:])  # Last 1000 lines
+            log_content = tail_lines(DEFAULT_LOG_PATH, 1000)
         except FileNotFoundError:
             log_content = "Log file not found."
 
         # Send additional context to Sentry
+        sentry_sdk = init_sentry()
         sentry_sdk.capture_message(
             f"User-reported crash: {desc}",
             level="error",
@@ -85,6 +115,7 @@ def exception_hook(exctype, value, traceback):
     
     """    
     global _dialog_shown
+    sentry_sdk = init_sentry()
     
     # If the dialog is already shown, log the additional exception and exit
     if _dialog_shown:
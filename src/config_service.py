@@ -0,0 +1,292 @@
+import copy
+import json
+import logging
+import metrics
+import os
+import tempfile
+import threading
+
+from exporters import EVENTS, FORMATS
+from filters import FilterError, ListingFilter
+from sms import SMS_BACKENDS
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default location of the application config
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "data", "config.json")
+
+# Expected type of every known top-level key; unknown keys are kept as they are
+SCHEMA = {
+    "search_params": dict,
+    "combobox_options": dict,
+    "fan_out": list,
+    "saved_searches": list,
+    "max_concurrent_searches": int,
+    "html_parser": str,
+    "stream_pages": bool,
+    "sites": list,
+    "filters": list,
+    "duplicates": dict,
+    "exports": dict,
+    "http": dict,
+    "notifications": dict,
+    "schedule": dict,
+    "logging": dict,
+    "metrics": dict,
+    "workers": dict,
+}
+
+class ConfigError(ValueError):
+    """Raised when a config does not match the schema."""
+
+def is_number(value):
+    """
+    Check whether a JSON value is a number; booleans are not.
+    """
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def is_positive(value):
+    """
+    Check whether a JSON value is a number greater than zero.
+    """
+    return is_number(value) and value > 0
+
+def validate(config):
+    """
+    Check a config against the schema.
+
+    Parameters:
+    config (dict): The parsed config.
+
+    Raises:
+    ConfigError: Describing the first problem found.
+    """
+    if not isinstance(config, dict):
+        raise ConfigError("The config must be a JSON object")
+
+    for key, expected_type in SCHEMA.items():
+        if key in config and not isinstance(config[key], expected_type):
+            raise ConfigError(f"'{key}' must be of type {expected_type.__name__}")
+
+    for name, value in config.get("search_params", {}).items():
+        if not isinstance(value, (str, int, float)):
+            raise ConfigError(f"search_params.{name} must be a string or a number")
+    for name, options in config.get("combobox_options", {}).items():
+        if not isinstance(options, list) or not all(isinstance(option, str) for option in options):
+            raise ConfigError(f"combobox_options.{name} must be a list of strings")
+    if not all(isinstance(name, str) for name in config.get("fan_out", [])):
+        raise ConfigError("fan_out must be a list of parameter names")
+    for index, saved_search in enumerate(config.get("saved_searches", [])):
+        if not isinstance(saved_search, dict) or not isinstance(saved_search.get("search_params"), dict):
+            raise ConfigError(f"saved_searches[{index}] must be an object with search_params")
+        if not is_positive(saved_search.get("interval_minutes", 1)):
+            raise ConfigError(f"saved_searches[{index}].interval_minutes must be a positive number")
+    if not is_positive(config.get("schedule", {}).get("interval_minutes", 1)):
+        raise ConfigError("schedule.interval_minutes must be a positive number")
+    for index, site in enumerate(config.get("sites", [])):
+        if not isinstance(site, dict) or not isinstance(site.get("name"), str):
+            raise ConfigError(f"sites[{index}] must be an object with a name")
+        if "search_url" not in site and "plugin" not in site:
+            raise ConfigError(f"sites[{index}] needs a search_url or a plugin")
+    if not all(isinstance(rule, dict) for rule in config.get("filters", [])):
+        raise ConfigError("filters must be a list of rule objects")
+    try:
+        ListingFilter(config.get("filters"))
+    except FilterError as e:
+        raise ConfigError(str(e)) from None
+    duplicates = config.get("duplicates", {})
+    if duplicates.get("action", "suppress") not in ("suppress", "notify"):
+        raise ConfigError("duplicates.action must be 'suppress' or 'notify'")
+    threshold = duplicates.get("threshold", 1)
+    if not is_number(threshold) or not 0 < threshold <= 1:
+        raise ConfigError("duplicates.threshold must be a number between 0 and 1")
+    notifications = config.get("notifications", {})
+    if notifications.get("sms_backend", "twilio") not in SMS_BACKENDS:
+        raise ConfigError(f"notifications.sms_backend must be one of {', '.join(SMS_BACKENDS)}")
+    exports = config.get("exports", {})
+    if exports.get("format", "jsonl") not in FORMATS:
+        raise ConfigError(f"exports.format must be one of {', '.join(FORMATS)}")
+    if not all(event in EVENTS for event in exports.get("events", [])):
+        raise ConfigError(f"exports.events may only contain {', '.join(EVENTS)}")
+    if config.get("max_concurrent_searches", 1) < 1:
+        raise ConfigError("max_concurrent_searches must be at least 1")
+
+def atomic_write_json(path, data):
+    """
+    Write JSON so that readers and crashes only ever see the old or the new file.
+
+    The data is written to a temporary file in the same directory, flushed to disk
+    and renamed over the target.
+
+    Parameters:
+    path (str): The target file.
+    data (object): The JSON-serializable data.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    # Persist the rename itself; not supported for directories on Windows
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+class ConfigService:
+    """
+    Loads the config once and serves the cached copy until the file changes.
+
+    Changes are detected by comparing the file's modification time and size, which
+    costs one stat() per check; callers with a file watcher (e.g. QFileSystemWatcher)
+    can call check_for_changes() from its events instead of polling.
+    """
+    def __init__(self, path=DEFAULT_CONFIG_PATH, backup_path=None):
+        """
+        Initialize the ConfigService.
+
+        Parameters:
+        path (str): The path of the JSON config file.
+        backup_path (str): Where the previous config is kept before every write;
+        defaults to <name>_backup.json next to the config.
+        """
+        self.path = path
+        root, extension = os.path.splitext(path)
+        self.backup_path = backup_path or f"{root}_backup{extension}"
+        self._config = None
+        self._stat = None
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def _file_stat(self):
+        """
+        Get the change signature of the config file, or None if it does not exist.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self, path):
+        """
+        Read and validate a config file.
+        """
+        with open(path, "r") as f:
+            config = json.load(f)
+        validate(config)
+        return config
+
+    def _load(self):
+        """
+        Load the config file, falling back to the backup if it is unreadable.
+
+        Raises:
+        FileNotFoundError: If the config file does not exist.
+        """
+        stat = self._file_stat()
+        with metrics.timed("config_load"):
+            try:
+                config = self._read(self.path)
+            except (ValueError, OSError) as e:
+                if isinstance(e, FileNotFoundError) or not self.backup_path or not os.path.exists(self.backup_path):
+                    raise
+                logger.error(f"Config {self.path} is invalid ({e}), using the backup {self.backup_path}")
+                config = self._read(self.backup_path)
+        self._config, self._stat = config, stat
+
+    def get(self):
+        """
+        Get the config, loading it on first use.
+
+        The returned object is shared and must not be modified; use update() to change the config.
+
+        Returns:
+        dict: The parsed config.
+
+        Raises:
+        FileNotFoundError: If the config file does not exist.
+        """
+        with self._lock:
+            if self._config is None:
+                self._load()
+            return self._config
+
+    def check_for_changes(self):
+        """
+        Reload the config if the file changed since it was last loaded or written.
+
+        Listeners are called with the new config after a reload. An invalid file is
+        logged and ignored, keeping the previous config.
+
+        Returns:
+        bool: True if the config was reloaded.
+        """
+        with self._lock:
+            if self._config is not None and self._file_stat() == self._stat:
+                return False
+            try:
+                self._load()
+            except (ValueError, OSError) as e:
+                logger.error(f"Ignoring config change, cannot load {self.path}: {e}")
+                return False
+            config = self._config
+            listeners = list(self._listeners)
+        logger.info(f"Config {self.path} reloaded")
+        for listener in listeners:
+            listener(config)
+        return True
+
+    def add_listener(self, listener):
+        """
+        Register a callable invoked with the new config whenever the file is reloaded.
+
+        Parameters:
+        listener (callable): Called with the config dict.
+        """
+        self._listeners.append(listener)
+
+    def save(self, config):
+        """
+        Validate and atomically write a config, keeping the previous file as the backup.
+
+        Parameters:
+        config (dict): The complete new config.
+
+        Raises:
+        ConfigError: If the config does not match the schema.
+        """
+        validate(config)
+        with self._lock:
+            if self.backup_path and self._config is not None:
+                atomic_write_json(self.backup_path, self._config)
+            atomic_write_json(self.path, config)
+            self._config, self._stat = copy.deepcopy(config), self._file_stat()
+
+    def update(self, changes):
+        """
+        Replace top-level keys of the config and save it.
+
+        Parameters:
+        changes (dict): The top-level keys to replace.
+        """
+        with self._lock:
+            try:
+                config = copy.deepcopy(self.get())
+            except FileNotFoundError:
+                config = {}
+            config.update(changes)
+            self.save(config)
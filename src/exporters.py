@@ -0,0 +1,553 @@
+import csv
+import json
+import logging
+import metrics
+import os
+import queue
+import threading
+import time
+
+from collections import namedtuple
+from listing_store import listing_key
+from optional_dependencies import lazy_import
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default location of the exported files
+DEFAULT_EXPORT_DIR = os.path.join(os.path.dirname(__file__), "data", "exports")
+
+# Default export settings, overridable through the "exports" section of config.json
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "format": "jsonl",                # "jsonl", "csv" or "parquet"
+    "directory": DEFAULT_EXPORT_DIR,
+    "events": ["new", "changed"],     # Which listings of a run are exported; "disappeared" is also possible
+    "rotate_seconds": 3600.0,         # Age after which the current file is sealed and a new one started
+    "rotate_bytes": 64 * 1024 * 1024, # Size after which the current file is sealed
+    "row_group_size": 10000,          # Rows per Parquet row group, the only rows held in memory
+}
+
+# Columns of every exported row, in order
+FIELDS = ("exported_at", "search_key", "event", "listing_key", "title", "price", "price_cents", "currency",
+          "url", "image_url")
+
+EVENTS = ("new", "changed", "disappeared")
+
+# Suffix of the file being written; it is renamed when sealed, so readers only see complete partitions
+OPEN_SUFFIX = ".open"
+
+# Sealed partitions are listed in this file in the export directory, one JSON object per line
+INDEX_NAME = "index.jsonl"
+
+# Queue item telling the writer to seal the current file and exit
+_STOP = object()
+
+# Settings of an exporter that can change while it runs; queued to the writer to apply them
+ExportSettings = namedtuple("ExportSettings", ["directory", "file_format", "rotate_seconds", "rotate_bytes",
+                                               "row_group_size"])
+
+# Export directories whose leftover files this process has recovered; any .open file found
+# there later belongs to the running exporter and must not be touched
+_recovered_directories = set()
+_recovered_lock = threading.Lock()
+
+class ExportError(Exception):
+    """Raised when the export settings cannot be used."""
+
+# pyarrow is optional and only needed for Parquet exports
+_pyarrow = lazy_import("pyarrow", "pyarrow.parquet")
+
+def to_rows(exported_at, search_key, event, listings):
+    """
+    Build the export rows of listings.
+
+    Parameters:
+    exported_at (str): The ISO 8601 UTC time of the export.
+    search_key (str): The key of the search that found the listings.
+    event (str): One of EVENTS.
+    listings (list): The Listing objects.
+
+    Returns:
+    list: One dict per listing with the FIELDS as keys.
+    """
+    return [
+        {
+            "exported_at": exported_at,
+            "search_key": search_key,
+            "event": event,
+            "listing_key": listing_key(listing),
+            "title": listing.title,
+            "price": listing.price,
+            "price_cents": listing.price_cents,
+            "currency": listing.currency,
+            "url": listing.url,
+            "image_url": listing.image_url,
+        }
+        for listing in listings
+    ]
+
+class JsonLinesWriter:
+    """
+    Appends rows to a JSON Lines file, one object per line.
+    """
+    extension = "jsonl"
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8", newline="\n")
+
+    def write(self, rows):
+        self._file.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows))
+        self._file.flush()
+
+    def size(self):
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+class CsvWriter:
+    """
+    Appends rows to a CSV file with a header line; missing values are written as empty fields.
+    """
+    extension = "csv"
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._file, FIELDS)
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def size(self):
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+class ParquetWriter:
+    """
+    Writes rows to a Parquet file in row groups of row_group_size rows.
+
+    Only the rows of the current row group are held in memory. The file is readable
+    once closed, which writes the footer.
+    """
+    extension = "parquet"
+
+    def __init__(self, path, row_group_size=DEFAULT_SETTINGS["row_group_size"]):
+        pa = _pyarrow()
+        if pa is None:
+            raise ExportError("Parquet exports need pyarrow, install it or export to jsonl or csv")
+        self._pa = pa
+        self._schema = pa.schema([
+            (name, pa.int64() if name == "price_cents" else pa.string()) for name in FIELDS
+        ])
+        self._file = open(path, "wb")
+        self._writer = pa.parquet.ParquetWriter(self._file, self._schema)
+        self.row_group_size = row_group_size
+        self._rows = []
+
+    def write(self, rows):
+        self._rows.extend(rows)
+        while len(self._rows) >= self.row_group_size:
+            self._flush(self._rows[:self.row_group_size])
+            del self._rows[:self.row_group_size]
+
+    def _flush(self, rows):
+        columns = {name: [row[name] for row in rows] for name in FIELDS}
+        self._writer.write_table(self._pa.table(columns, schema=self._schema))
+
+    def size(self):
+        return self._file.tell()
+
+    def close(self):
+        if self._rows:
+            self._flush(self._rows)
+            self._rows = []
+        self._writer.close()
+        self._file.close()
+
+FORMATS = {
+    "jsonl": JsonLinesWriter,
+    "csv": CsvWriter,
+    "parquet": ParquetWriter,
+}
+
+def read_index(directory=DEFAULT_EXPORT_DIR, after_sequence=0):
+    """
+    Get the sealed partitions of an export directory, e.g. to load only the new ones.
+
+    Parameters:
+    directory (str): The export directory.
+    after_sequence (int): The sequence number of the last partition already read.
+
+    Returns:
+    list: The index entries with a higher sequence number, oldest first. Each has the
+    partition path relative to the directory, its format, sequence, number of rows,
+    size in bytes and the time of its first and last row.
+    """
+    entries = []
+    try:
+        with open(os.path.join(directory, INDEX_NAME), encoding="utf-8") as f:
+            for line in f:
+                # A crash can leave a partial last line; the exporter cuts it when it starts
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry["sequence"] > after_sequence:
+                    entries.append(entry)
+    except FileNotFoundError:
+        pass
+    return entries
+
+class ListingExporter:
+    """
+    Streams the listings of every search run to append-only partition files from a background thread.
+
+    Rows are written as runs finish, so no more than one run (or one Parquet row group)
+    is held in memory. The current file is written under a name ending in OPEN_SUFFIX,
+    into a date=YYYY-MM-DD directory. It is sealed after rotate_seconds or rotate_bytes:
+    it is flushed, renamed to its final name and appended to the index file, so readers
+    of the index only ever see complete partitions and can skip those they already read.
+    Files left open by a crash are sealed, or dropped for Parquet, the first time the
+    process uses their directory. One exporter is meant to live as long as the process;
+    reconfigure() changes its settings without a second writer on the same files.
+    """
+    def __init__(self, directory=DEFAULT_EXPORT_DIR, file_format=DEFAULT_SETTINGS["format"],
+                 events=DEFAULT_SETTINGS["events"], rotate_seconds=DEFAULT_SETTINGS["rotate_seconds"],
+                 rotate_bytes=DEFAULT_SETTINGS["rotate_bytes"], row_group_size=DEFAULT_SETTINGS["row_group_size"]):
+        """
+        Initialize the ListingExporter.
+
+        Parameters:
+        directory (str): The export directory.
+        file_format (str): One of FORMATS.
+        events (list): The events exported, see EVENTS.
+        rotate_seconds (float): Age after which a file is sealed, 0 for no limit.
+        rotate_bytes (int): Size after which a file is sealed, 0 for no limit.
+        row_group_size (int): Rows per Parquet row group.
+
+        Raises:
+        ExportError: If the format is unknown or needs a missing package.
+        """
+        _check_format(file_format)
+        self.directory = None
+        self.events = [event for event in EVENTS if event in events]
+        self.queue = queue.Queue()
+        self._thread = None
+        # The file being written: its writer, path, opening time, row count and first/last row times
+        self._writer = None
+        self._path = None
+        self._opened_at = None
+        self._rows = 0
+        self._first_at = self._last_at = None
+        self._apply(ExportSettings(directory, file_format, rotate_seconds, rotate_bytes, row_group_size))
+
+    def start(self):
+        """
+        Start the background writer.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ListingExporter", daemon=True)
+            self._thread.start()
+
+    def reconfigure(self, directory, file_format, events, rotate_seconds, rotate_bytes, row_group_size):
+        """
+        Change the settings; the current file is sealed first, the listings already queued
+        are written with the previous settings.
+
+        Parameters: as for the constructor.
+
+        Raises:
+        ExportError: If the format is unknown or needs a missing package; the settings are kept.
+        """
+        _check_format(file_format)
+        settings = ExportSettings(directory, file_format, rotate_seconds, rotate_bytes, row_group_size)
+        self.events = [event for event in EVENTS if event in events]
+        if self._thread is None:
+            self._apply(settings)
+        else:
+            self.queue.put(settings)
+
+    def _apply(self, settings):
+        """
+        Use new settings, opening the export directory if it changed.
+        """
+        self.format = settings.file_format
+        self.rotate_seconds = settings.rotate_seconds
+        self.rotate_bytes = settings.rotate_bytes
+        self.row_group_size = settings.row_group_size
+        if settings.directory == self.directory:
+            return
+        self.directory = settings.directory
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_NAME)
+        if os.path.exists(index_path):
+            _truncate_partial_line(index_path)
+        self._sequence = max((entry["sequence"] for entry in read_index(self.directory)), default=0)
+        with _recovered_lock:
+            recover = os.path.abspath(self.directory) not in _recovered_directories
+            _recovered_directories.add(os.path.abspath(self.directory))
+        if recover:
+            self._recover()
+
+    def export(self, search_key, new=(), changed=(), disappeared=()):
+        """
+        Queue the listings of a run for export; returns immediately.
+
+        Parameters:
+        search_key (str): The key of the search.
+        new (list): The new listings.
+        changed (list): The changed listings.
+        disappeared (list): The disappeared listings.
+        """
+        exported_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        rows = []
+        for event, listings in (("new", new), ("changed", changed), ("disappeared", disappeared)):
+            if event in self.events and listings:
+                rows.extend(to_rows(exported_at, search_key, event, listings))
+        if rows:
+            self.queue.put(rows)
+
+    def stop(self, timeout=10.0):
+        """
+        Write whatever is queued, seal the current file and stop the writer.
+
+        Parameters:
+        timeout (float): Maximum seconds to wait for the writer.
+        """
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        """
+        Writer loop appending the queued rows and sealing the file when it is due for rotation.
+        """
+        while True:
+            timeout = None
+            if self._writer is not None and self.rotate_seconds:
+                timeout = self._opened_at + self.rotate_seconds - time.time()
+                if timeout <= 0:
+                    self._seal()
+                    continue
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self._seal()
+                continue
+            if item is _STOP:
+                self._seal()
+                return
+            if isinstance(item, ExportSettings):
+                self._seal()
+                try:
+                    self._apply(item)
+                except OSError as e:
+                    logger.error(f"Cannot export to {item.directory}: {e}")
+                continue
+            try:
+                self._write(item)
+            except Exception as e:
+                logger.error(f"Failed to export {len(item)} listings to {self._path}: {e}")
+                metrics.count("exported_rows_total", "Listings written to export files",
+                              format=self.format, outcome="failed", amount=len(item))
+
+    def _write(self, rows):
+        """
+        Append rows to the current file, opening a new one if needed, and seal it once it is large enough.
+        """
+        if self._writer is None:
+            self._open()
+        self._writer.write(rows)
+        self._rows += len(rows)
+        self._first_at = self._first_at or rows[0]["exported_at"]
+        self._last_at = rows[-1]["exported_at"]
+        metrics.count("exported_rows_total", "Listings written to export files",
+                      format=self.format, outcome="written", amount=len(rows))
+        if self.rotate_bytes and self._writer.size() >= self.rotate_bytes:
+            self._seal()
+
+    def _open(self):
+        """
+        Start a new partition file.
+        """
+        now = time.time()
+        partition = os.path.join(self.directory, time.strftime("date=%Y-%m-%d", time.gmtime(now)))
+        os.makedirs(partition, exist_ok=True)
+        name = f"listings-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(now))}-{self._sequence + 1:06d}"
+        writer_class = FORMATS[self.format]
+        self._path = os.path.join(partition, f"{name}.{writer_class.extension}")
+        if writer_class is ParquetWriter:
+            self._writer = ParquetWriter(self._path + OPEN_SUFFIX, self.row_group_size)
+        else:
+            self._writer = writer_class(self._path + OPEN_SUFFIX)
+        self._opened_at = now
+        self._rows = 0
+        self._first_at = self._last_at = None
+
+    def _seal(self):
+        """
+        Close the current file, give it its final name and add it to the index.
+        """
+        if self._writer is None:
+            return
+        writer, self._writer = self._writer, None
+        try:
+            writer.close()
+            _fsync(self._path + OPEN_SUFFIX)
+            os.replace(self._path + OPEN_SUFFIX, self._path)
+            self._add_to_index(self._path, self._rows, self._first_at, self._last_at)
+        except OSError as e:
+            logger.error(f"Failed to seal the export {self._path}: {e}")
+            return
+        logger.info(f"Exported {self._rows} listings to {self._path}")
+
+    def _add_to_index(self, path, rows, first_at, last_at):
+        """
+        Append a sealed partition to the index file and flush it to disk.
+        """
+        self._sequence += 1
+        entry = {
+            "sequence": self._sequence,
+            "path": os.path.relpath(path, self.directory).replace(os.sep, "/"),
+            "format": self.format,
+            "rows": rows,
+            "bytes": os.path.getsize(path),
+            "first_exported_at": first_at,
+            "last_exported_at": last_at,
+            "sealed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(os.path.join(self.directory, INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.count("export_partitions_total", "Export files sealed", format=self.format)
+
+    def _recover(self):
+        """
+        Seal the files an earlier process left open, or drop them if they cannot be read.
+
+        JSON Lines and CSV files are cut after their last complete line; a Parquet file
+        without its footer is unreadable and removed.
+        """
+        for root, _, names in os.walk(self.directory):
+            for name in sorted(names):
+                if not name.endswith(OPEN_SUFFIX):
+                    continue
+                open_path = os.path.join(root, name)
+                path = open_path[:-len(OPEN_SUFFIX)]
+                try:
+                    if path.endswith((".jsonl", ".csv")):
+                        rows, first_at, last_at = _truncate_partial_line(open_path)
+                        if path.endswith(".csv"):
+                            rows -= 1  # The header line
+                        if rows <= 0:
+                            os.remove(open_path)
+                            continue
+                        os.replace(open_path, path)
+                        self._add_to_index(path, rows, first_at, last_at)
+                        logger.info(f"Recovered the export {path} with {rows} listings")
+                    else:
+                        os.remove(open_path)
+                        logger.warning(f"Removed the unfinished export {open_path}, it was not closed")
+                except OSError as e:
+                    logger.error(f"Failed to recover the export {open_path}: {e}")
+
+def _check_format(file_format):
+    """
+    Raise ExportError if a format is unknown or needs a missing package.
+    """
+    if file_format not in FORMATS:
+        raise ExportError(f"Unknown export format {file_format!r}, expected one of {', '.join(FORMATS)}")
+    if file_format == "parquet" and _pyarrow() is None:
+        raise ExportError("Parquet exports need pyarrow, install it or export to jsonl or csv")
+
+def _truncate_partial_line(path):
+    """
+    Cut a text file after its last complete line.
+
+    Returns:
+    tuple: The number of complete lines, and the exported_at of the first and last JSON
+    line, or None for CSV files.
+    """
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        f.truncate(end)
+    lines = data[:end].splitlines()
+    first_at = last_at = None
+    if path.endswith(".jsonl.open") and lines:
+        first_at = json.loads(lines[0]).get("exported_at")
+        last_at = json.loads(lines[-1]).get("exported_at")
+    return len(lines), first_at, last_at
+
+def _fsync(path):
+    """
+    Flush a closed file to disk, so it survives a crash once it is in the index.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def create_exporter(settings):
+    """
+    Build the exporter of the "exports" section of the config.
+
+    Parameters:
+    settings (dict): The export settings, or None.
+
+    Returns:
+    ListingExporter: The exporter, not started yet, or None if exports are disabled or
+    cannot be used.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if not settings["enabled"]:
+        return None
+    try:
+        exporter = ListingExporter(settings["directory"], settings["format"], settings["events"],
+                                   settings["rotate_seconds"], settings["rotate_bytes"], settings["row_group_size"])
+    except (ExportError, OSError) as e:
+        logger.error(f"Exports are disabled: {e}")
+        return None
+    logger.info(f"Exporting {', '.join(exporter.events)} listings as {exporter.format} to {exporter.directory}")
+    return exporter
+
+def configure_exporter(exporter, settings):
+    """
+    Apply the "exports" section of the config to the running exporter, e.g. after a config reload.
+
+    The exporter is reconfigured in place rather than replaced, so there is never more
+    than one writer on the export directory.
+
+    Parameters:
+    exporter (ListingExporter): The running exporter, or None.
+    settings (dict): The export settings, or None.
+
+    Returns:
+    ListingExporter: The exporter to use from now on, started, or None if exports are disabled.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if not settings["enabled"]:
+        if exporter is not None:
+            exporter.stop()
+        return None
+    if exporter is None:
+        exporter = create_exporter(settings)
+        if exporter is not None:
+            exporter.start()
+        return exporter
+    try:
+        exporter.reconfigure(settings["directory"], settings["format"], settings["events"],
+                             settings["rotate_seconds"], settings["rotate_bytes"], settings["row_group_size"])
+    except ExportError as e:
+        logger.error(f"Keeping the previous export settings: {e}")
+    return exporter
@@ -0,0 +1,271 @@
+import logging
+import re
+import threading
+
+from collections import deque
+from functools import lru_cache
+from optional_dependencies import lazy_import
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Rule types and the keys they require
+RULE_TYPES = {
+    "min_price": ("value",),      # Keep listings costing at least value (in major units, e.g. euros)
+    "max_price": ("value",),      # Keep listings costing at most value
+    "include": ("keywords",),     # Keep listings whose field contains any of the keywords
+    "exclude": ("keywords",),     # Drop listings whose field contains any of the keywords
+    "regex": ("pattern",),        # Keep listings whose field matches the pattern; drop them with "exclude": true
+}
+
+# Listing attributes a text rule can look at
+TEXT_FIELDS = ("title", "price", "url")
+
+# Texts whose keyword matches are remembered per matcher; re-polled pages repeat most titles
+MATCH_CACHE_SIZE = 65536
+
+# The shared filter and the lock guarding its replacement
+_filter = None
+_lock = threading.Lock()
+
+class FilterError(ValueError):
+    """Raised when a filter rule is invalid."""
+
+# pyahocorasick is optional and only speeds up keyword matching
+_ahocorasick = lazy_import("ahocorasick")
+
+class KeywordMatcher:
+    """
+    Aho–Corasick automaton finding every keyword of many rules in one pass over a text.
+
+    Each keyword carries a bitmask of the rules it belongs to, and matching a text
+    returns the union of the masks of all keywords it contains, so the cost depends on
+    the length of the text and not on the number of keywords or rules. Matching is
+    case-insensitive. The automaton is compiled into a complete transition table, so
+    every character costs one dict lookup; pyahocorasick is used instead when installed.
+    The results of recent texts are cached.
+    """
+    def __init__(self, keywords):
+        """
+        Compile the automaton.
+
+        Parameters:
+        keywords (dict): Maps each keyword to the bitmask of its rules.
+        """
+        keywords = {keyword.casefold(): mask for keyword, mask in keywords.items() if keyword}
+        ahocorasick = _ahocorasick()
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, mask in keywords.items():
+                self._automaton.add_word(keyword, mask)
+            self._automaton.make_automaton()
+            self._match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._scan_native)
+            return
+
+        # Trie of the keywords; outputs[state] is the mask of the keywords ending there
+        transitions = [{}]
+        outputs = [0]
+        for keyword, mask in keywords.items():
+            state = 0
+            for char in keyword:
+                next_state = transitions[state].get(char)
+                if next_state is None:
+                    next_state = transitions[state][char] = len(transitions)
+                    transitions.append({})
+                    outputs.append(0)
+                state = next_state
+            outputs[state] |= mask
+
+        # Breadth-first, complete every state with the transitions of its failure state,
+        # turning the trie into a DFA; a missing character leads back to the root
+        fail = [0] * len(transitions)
+        queue = deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] |= outputs[fail[state]]
+            children = transitions[state]
+            for char, child in children.items():
+                fail[child] = transitions[fail[state]].get(char, 0) if state else 0
+                queue.append(child)
+            if state:
+                transitions[state] = {**transitions[fail[state]], **children}
+        self._transitions = transitions
+        self._outputs = outputs
+        self._match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._scan)
+
+    def match(self, text):
+        """
+        Find the rules with a keyword in a text.
+
+        Parameters:
+        text (str): The text to scan.
+
+        Returns:
+        int: The union of the masks of every keyword found.
+        """
+        return self._match(text)
+
+    def _scan(self, text):
+        transitions, outputs = self._transitions, self._outputs
+        state = found = 0
+        for char in text.casefold():
+            state = transitions[state].get(char, 0)
+            found |= outputs[state]
+        return found
+
+    def _scan_native(self, text):
+        found = 0
+        for _, mask in self._automaton.iter(text.casefold()):
+            found |= mask
+        return found
+
+class ListingFilter:
+    """
+    A set of filter rules compiled into one predicate over a batch of listings.
+
+    A listing passes if it satisfies every rule. The rules are evaluated cheapest first:
+    price rules, then the keyword rules of each field through a single KeywordMatcher, and regular
+    expressions last, only for the listings left.
+    """
+    def __init__(self, rules=None):
+        """
+        Compile the rules.
+
+        Parameters:
+        rules (list): The "filters" section of the config; see RULE_TYPES. Price rules may
+        set "currency" to only keep prices in that currency and drop listings without a parsed
+        price, text rules set "field" to one of TEXT_FIELDS (default "title") and rules with
+        "enabled": false are skipped.
+
+        Raises:
+        FilterError: If a rule is invalid.
+        """
+        self.rules = [rule for rule in rules or [] if rule.get("enabled", True)]
+        self.price_ranges = []
+        # Per field: [keyword masks, mask of the include rules, mask of the exclude rules]
+        keyword_rules = {}
+        self.regex_rules = []
+
+        for index, rule in enumerate(self.rules):
+            rule_type = rule.get("type")
+            if rule_type not in RULE_TYPES:
+                raise FilterError(f"filters[{index}]: unknown rule type {rule_type!r}")
+            missing = [key for key in RULE_TYPES[rule_type] if key not in rule]
+            if missing:
+                raise FilterError(f"filters[{index}]: {rule_type} rule needs {', '.join(missing)}")
+            field = rule.get("field", "title")
+            if field not in TEXT_FIELDS:
+                raise FilterError(f"filters[{index}]: unknown field {field!r}")
+
+            if rule_type in ("min_price", "max_price"):
+                if not isinstance(rule["value"], (int, float)):
+                    raise FilterError(f"filters[{index}]: value must be a number")
+                cents = round(rule["value"] * 100)
+                bounds = (cents, None) if rule_type == "min_price" else (None, cents)
+                self.price_ranges.append(bounds + (rule.get("currency"),))
+            elif rule_type == "regex":
+                try:
+                    pattern = re.compile(rule["pattern"], re.IGNORECASE)
+                except re.error as e:
+                    raise FilterError(f"filters[{index}]: invalid pattern: {e}") from None
+                self.regex_rules.append((field, pattern, bool(rule.get("exclude", False))))
+            else:
+                if not rule["keywords"] or not all(isinstance(keyword, str) and keyword for keyword in rule["keywords"]):
+                    raise FilterError(f"filters[{index}]: keywords must be a list of non-empty strings")
+                keywords, include_mask, exclude_mask = keyword_rules.setdefault(field, [{}, 0, 0])
+                bit = 1 << index
+                for keyword in rule["keywords"]:
+                    keywords[keyword.casefold()] = keywords.get(keyword.casefold(), 0) | bit
+                if rule_type == "include":
+                    include_mask |= bit
+                else:
+                    exclude_mask |= bit
+                keyword_rules[field] = [keywords, include_mask, exclude_mask]
+
+        self.keyword_rules = [
+            (field, KeywordMatcher(keywords), include_mask, exclude_mask)
+            for field, (keywords, include_mask, exclude_mask) in keyword_rules.items()
+        ]
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def select(self, listings):
+        """
+        Evaluate the rules over a batch of listings.
+
+        Parameters:
+        listings (list): The Listing objects.
+
+        Returns:
+        list: The indices of the listings passing every rule, in order.
+        """
+        selected = range(len(listings))
+        for min_cents, max_cents, currency in self.price_ranges:
+            low = float("-inf") if min_cents is None else min_cents
+            high = float("inf") if max_cents is None else max_cents
+            selected = [
+                index for index in selected
+                if listings[index].price_cents is not None and low <= listings[index].price_cents <= high
+                and (currency is None or listings[index].currency == currency)
+            ]
+
+        for field, matcher, include_mask, exclude_mask in self.keyword_rules:
+            kept = []
+            for index in selected:
+                found = matcher.match(getattr(listings[index], field) or "")
+                if found & exclude_mask == 0 and found & include_mask == include_mask:
+                    kept.append(index)
+            selected = kept
+
+        for field, pattern, exclude in self.regex_rules:
+            selected = [index for index in selected
+                        if (pattern.search(getattr(listings[index], field) or "") is None) == exclude]
+        return list(selected)
+
+    def apply(self, listings):
+        """
+        Keep the listings passing every rule.
+
+        Parameters:
+        listings (list): The Listing objects.
+
+        Returns:
+        list: The passing listings, in order.
+        """
+        if not self.rules:
+            return list(listings)
+        return [listings[index] for index in self.select(listings)]
+
+def configure(rules=None):
+    """
+    Replace the shared filter with one compiled from the given rules.
+
+    Parameters:
+    rules (list): The "filters" section of the config, or None to keep every listing.
+
+    Returns:
+    ListingFilter: The new shared filter.
+
+    Raises:
+    FilterError: If a rule is invalid; the previous filter stays in place.
+    """
+    global _filter
+    new_filter = ListingFilter(rules)
+    with _lock:
+        _filter = new_filter
+    logger.info(f"Listing filter configured with {len(new_filter.rules)} rules")
+    return new_filter
+
+def get_filter():
+    """
+    Get the shared filter, creating an empty one on first use.
+
+    Returns:
+    ListingFilter: The shared filter.
+    """
+    global _filter
+    with _lock:
+        if _filter is None:
+            _filter = ListingFilter()
+        return _filter
@@ -0,0 +1,434 @@
+"""
+Headless WebScrapper daemon.
+
+Runs the searches from data/config.json on an adaptive schedule and logs the results,
+without importing PySide6 or needing a display. Changes to the config file are applied
+while the daemon runs.
+
+Usage (from the src directory):
+    python -m headless              # search on the configured schedule until interrupted
+    python -m headless --once       # run every search once and exit
+    python -m headless --workers 4  # run the searches in 4 worker processes
+    python -m headless --worker --queue data/jobs.db   # only work on the jobs of another daemon on this host
+"""
+import argparse
+import logging
+import metrics
+import near_duplicates
+import signal
+import sys
+import threading
+import search_core
+import worker_pool
+
+from config_service import ConfigService, DEFAULT_CONFIG_PATH
+from exporters import configure_exporter, create_exporter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from job_queue import DEFAULT_QUEUE_PATH
+from listing_store import ListingStore, DEFAULT_DB_PATH
+from near_duplicates import NearDuplicateIndex
+from logging_setup import configure_logging
+from notifications import configure_dispatcher, create_dispatcher
+from price_history import PriceHistory
+from scheduler import configure_scheduler, create_scheduler
+from scraper import SearchCancelled, search_key
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Longest sleep between checks of the config file for changes
+CONFIG_POLL_SECONDS = 5.0
+
+class Outputs:
+    """
+    The notification dispatcher and exporter of the coordinator, which receive the results
+    collected from the worker processes; replaced like those of a SearchPipeline.
+    """
+    def __init__(self, dispatcher, exporter=None):
+        """
+        Initialize the Outputs.
+
+        Parameters:
+        dispatcher (NotificationDispatcher): Receives the new listings of every run, already started.
+        exporter (ListingExporter): Writes the new listings of every run to the export files, or None.
+        """
+        self.dispatcher = dispatcher
+        self.exporter = exporter
+
+    def set_dispatcher(self, dispatcher):
+        """
+        Replace the dispatcher, stopping the previous one unless it is the same.
+        """
+        previous, self.dispatcher = self.dispatcher, dispatcher
+        if previous is not None and previous is not dispatcher:
+            previous.stop()
+
+    def set_exporter(self, exporter):
+        """
+        Replace the exporter, stopping the previous one unless it is the same.
+        """
+        previous, self.exporter = self.exporter, exporter
+        if previous is not None and previous is not exporter:
+            previous.stop()
+
+    def close(self):
+        """
+        Flush pending notifications and exports.
+        """
+        self.set_dispatcher(None)
+        self.set_exporter(None)
+
+def override_interval(config, interval):
+    """
+    Get the config with the base interval given on the command line.
+
+    Parameters:
+    config (dict): The application config.
+    interval (float): The base interval in minutes, or None to keep the configured one.
+
+    Returns:
+    dict: The config, copied if changed.
+    """
+    if interval is None:
+        return config
+    return {**config, 'schedule': {**config.get('schedule', {}), 'interval_minutes': interval}}
+
+def schedule_entries(config):
+    """
+    Get every search to schedule, in the form taken by SearchScheduler.replace().
+
+    Parameters:
+    config (dict): The application config.
+
+    Returns:
+    dict: {search_id: (search_params, interval in seconds)}.
+    """
+    return {search_key(search_params): (search_params, interval_minutes * 60)
+            for search_params, interval_minutes in search_core.scheduled_searches(config)}
+
+def reload_config(config, search_scheduler, outputs, interval=None):
+    """
+    Apply a config that was changed on disk to the running daemon.
+
+    Searches that stay keep their timing. The concurrency and worker settings are only
+    read at startup.
+
+    Parameters:
+    config (dict): The new config.
+    search_scheduler (SearchScheduler): The scheduler holding every search.
+    outputs (SearchPipeline or Outputs): Holds the dispatcher and exporter, which are reconfigured in place.
+    interval (float): The base interval in minutes given on the command line, or None.
+    """
+    config = override_interval(config, interval)
+    try:
+        search_core.apply_settings(config)
+        configure_scheduler(search_scheduler, config.get('schedule'))
+        search_scheduler.replace(schedule_entries(config))
+        outputs.set_dispatcher(configure_dispatcher(outputs.dispatcher, config.get('notifications')))
+        outputs.set_exporter(configure_exporter(outputs.exporter, config.get('exports')))
+    except Exception as e:
+        logger.error(f"Failed to apply the reloaded config: {e}", exc_info=True)
+        return
+    logger.info(f"Scheduling {len(search_scheduler.searches)} searches")
+
+def wait_for(wakeup, due_in, poll_seconds, config_service):
+    """
+    Sleep until woken, the next search is due or it is time to check for changes.
+
+    Parameters:
+    wakeup (threading.Event): Ends the sleep early when set; cleared afterwards.
+    due_in (float): Seconds until the next search is due, or None if nothing is scheduled.
+    poll_seconds (float): Longest sleep, or None for no limit.
+    config_service (ConfigService): Checked for config changes after the sleep, or None.
+    """
+    timeouts = [timeout for timeout in (due_in, poll_seconds) if timeout is not None]
+    if config_service is not None:
+        timeouts.append(CONFIG_POLL_SECONDS)
+    wakeup.wait(min(timeouts) if timeouts else None)
+    wakeup.clear()
+    if config_service is not None:
+        config_service.check_for_changes()
+
+def log_result(key, future):
+    """
+    Log the outcome of a finished search.
+
+    Parameters:
+    key (str): The key of the search.
+    future (Future): The finished pipeline run.
+
+    Returns:
+    int: The number of new listings, or None if the search failed or was cancelled.
+    """
+    try:
+        diff = future.result()
+    except SearchCancelled:
+        logger.info(f"Search {key} cancelled")
+        return None
+    except Exception as e:
+        logger.error(f"Search {key} failed: {e}", exc_info=True)
+        return None
+    return log_listings(key, diff.new, len(diff.changed), len(diff.disappeared), len(diff.duplicates))
+
+def log_listings(key, new, changed_count, disappeared_count, duplicate_count=0):
+    """
+    Log the outcome of a successful search.
+
+    Parameters:
+    key (str): The key of the search.
+    new (list): The new listings.
+    changed_count (int): The number of changed listings.
+    disappeared_count (int): The number of disappeared listings.
+    duplicate_count (int): The number of new listings that are near-duplicates of earlier ones.
+
+    Returns:
+    int: The number of new listings.
+    """
+    duplicates = f" ({duplicate_count} near-duplicates)" if duplicate_count else ""
+    logger.info(f"Search {key}: {len(new)} new{duplicates}, {changed_count} changed, "
+                f"{disappeared_count} disappeared listings")
+    for listing in new:
+        logger.info(f"New listing: {listing.title} - {listing.price} {listing.url or ''}")
+    return len(new)
+
+def log_job(job, dispatcher, exporter=None):
+    """
+    Log the outcome of a job finished by a worker process, notify and export its new listings.
+
+    Parameters:
+    job (FinishedJob): The finished job.
+    dispatcher (NotificationDispatcher): Receives the new listings.
+    exporter (ListingExporter): Writes the new listings to the export files, or None; the
+    workers only report the number of changed and disappeared listings.
+
+    Returns:
+    int: The number of new listings, or None if the job failed.
+    """
+    if job.state != "done":
+        logger.error(f"Search {job.search_key} failed after {job.attempts} attempts: {job.error}")
+        return None
+    new = worker_pool.new_listings(job.result)
+    duplicates = set(job.result.get("duplicates", ()))
+    dispatcher.notify(near_duplicates.to_notify(new, duplicates))
+    if exporter is not None:
+        exporter.export(job.search_key, new)
+    return log_listings(job.search_key, new, job.result["changed"], job.result["disappeared"], len(duplicates))
+
+def export_metrics(path):
+    """
+    Write the metrics registry to a file, logging instead of raising on failure.
+
+    Parameters:
+    path (str): The target file, or None to skip the export.
+    """
+    if not path:
+        return
+    try:
+        metrics.registry.export(path)
+    except OSError as e:
+        logger.error(f"Failed to export metrics to {path}: {e}")
+
+def run_cycle(pipeline, searches, executor, stop_event):
+    """
+    Run every search once, concurrently, and log the outcome of each.
+
+    Parameters:
+    pipeline (SearchPipeline): The pipeline running the searches.
+    searches (list): The search parameter dicts.
+    executor (ThreadPoolExecutor): The pool bounding the concurrency.
+    stop_event (threading.Event): Set on shutdown to cancel running searches.
+    """
+    futures = {executor.submit(pipeline.run, search_params, cancel_event=stop_event): search_params
+               for search_params in searches}
+    for future in as_completed(futures):
+        log_result(search_key(futures[future]), future)
+
+def run_scheduled(pipeline, search_scheduler, executor, stop_event, wakeup, metrics_file=None, config_service=None):
+    """
+    Submit searches as they become due until the stop event is set.
+
+    Parameters:
+    pipeline (SearchPipeline): The pipeline running the searches.
+    search_scheduler (SearchScheduler): The scheduler holding every search.
+    executor (ThreadPoolExecutor): The pool bounding the concurrency.
+    stop_event (threading.Event): Set on shutdown.
+    wakeup (threading.Event): Set to re-check the schedule; set here whenever a run completes,
+    since that changes the next due time, and by the shutdown handler.
+    metrics_file (str): Where the metrics are exported whenever the schedule is re-checked, or None.
+    config_service (ConfigService): Checked for config changes whenever the schedule is re-checked, or None.
+    """
+    def on_done(search_id, future):
+        search_scheduler.complete(search_id, log_result(search_id, future))
+        wakeup.set()
+
+    while not stop_event.is_set():
+        for search in search_scheduler.pop_due():
+            future = executor.submit(pipeline.run, search.search_params, cancel_event=stop_event)
+            future.add_done_callback(partial(on_done, search.search_id))
+        wait_for(wakeup, search_scheduler.next_due_in(), None, config_service)
+        export_metrics(metrics_file)
+
+def run_coordinator(queue, pool, outputs, search_scheduler, stop_event, wakeup, once=False, poll_seconds=1.0,
+                    metrics_file=None, config_service=None):
+    """
+    Enqueue searches as they become due and collect the results of the worker processes.
+
+    Parameters:
+    queue (JobQueue): The queue shared with the workers.
+    pool (WorkerPool): The local worker processes, or None if only other daemons' workers take the jobs.
+    outputs (Outputs): The dispatcher and exporter receiving the new listings of every run.
+    search_scheduler (SearchScheduler): The scheduler holding every search.
+    stop_event (threading.Event): Set on shutdown.
+    wakeup (threading.Event): Set by the shutdown handler to stop waiting.
+    once (bool): Enqueue every search once and return when the queue is empty.
+    poll_seconds (float): Seconds between checks of the queue.
+    metrics_file (str): Where the metrics are exported after every check, or None.
+    config_service (ConfigService): Checked for config changes after every check, or None.
+    """
+    if once:
+        for search in search_scheduler.pop_due():
+            queue.enqueue(search.search_id, search.search_params)
+
+    while not stop_event.is_set():
+        if not once:
+            for search in search_scheduler.pop_due():
+                if queue.enqueue(search.search_id, search.search_params) is None:
+                    logger.info(f"Search {search.search_id} is still queued from an earlier run")
+        for job in queue.collect_finished():
+            search_scheduler.complete(job.search_key, log_job(job, outputs.dispatcher, outputs.exporter))
+        if once and queue.pending_count() == 0:
+            return
+        if pool is not None and not pool.check_workers():
+            logger.error("Every worker process failed to start, see the errors above")
+            return
+        wait_for(wakeup, None if once else search_scheduler.next_due_in(), poll_seconds, config_service)
+        export_metrics(metrics_file)
+
+def positive_minutes(text):
+    """
+    Parse the --interval argument.
+
+    Raises:
+    argparse.ArgumentTypeError: If it is not a positive number.
+    """
+    try:
+        minutes = float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a number of minutes: {text!r}") from None
+    if not minutes > 0:
+        raise argparse.ArgumentTypeError(f"the interval must be positive, got {text}")
+    return minutes
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="python -m headless", description="Run the WebScrapper searches without a GUI.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="path of the JSON config")
+    parser.add_argument("--database", default=DEFAULT_DB_PATH, help="path of the listing database")
+    parser.add_argument("--interval", type=positive_minutes,
+                        help="base minutes between runs of a search, overriding the config")
+    parser.add_argument("--once", action="store_true", help="run every search once and exit")
+    parser.add_argument("--log-file", help="write the log to this rotated file instead of stderr")
+    parser.add_argument("--log-level", help="logging level, overriding the config")
+    parser.add_argument("--metrics-file", help="export the metrics to this file after every search, "
+                                               "as JSON if it ends in .json and as Prometheus text otherwise")
+    parser.add_argument("--workers", type=int, help="number of worker processes running the searches, "
+                                                    "overriding the config; 0 runs them in threads")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH, help="path of the job queue shared with the workers")
+    parser.add_argument("--worker", action="store_true", help="only run jobs from the queue, without scheduling searches")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Run the daemon until interrupted, or for a single cycle with --once.
+
+    Returns:
+    int: The process exit code.
+    """
+    args = parse_args(argv)
+    config_service = ConfigService(args.config)
+    try:
+        config, config_error = config_service.get(), None
+    except (OSError, ValueError) as e:
+        config, config_error = {}, e
+
+    logging_settings = dict(config.get('logging', {}))
+    if args.log_level:
+        logging_settings['level'] = args.log_level
+    configure_logging(args.log_file, logging_settings)
+
+    if config_error is not None:
+        logger.error(f"Cannot load config {args.config}: {config_error}")
+        return 1
+    search_core.apply_settings(config)
+
+    config = override_interval(config, args.interval)
+    searches = search_core.scheduled_searches(config)
+
+    # Stop between runs or at the next checkpoint of the running searches
+    stop_event = threading.Event()
+    wakeup = threading.Event()
+
+    def stop(*_):
+        stop_event.set()
+        wakeup.set()
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, stop)
+
+    if args.worker:
+        worker_pool.run_worker(worker_pool.make_worker_id(), args.config, args.database, args.queue, stop_event)
+        logger.info("Stopped")
+        return 0
+
+    search_scheduler = create_scheduler(config.get('schedule'))
+    search_scheduler.replace(schedule_entries(config))
+    dispatcher = create_dispatcher(config.get('notifications'))
+    dispatcher.start()
+    exporter = create_exporter(config.get('exports'))
+    if exporter is not None:
+        exporter.start()
+
+    worker_settings = {**worker_pool.DEFAULT_SETTINGS, **config.get('workers', {})}
+    processes = worker_settings['processes'] if args.workers is None else args.workers
+    if processes > 0:
+        queue = worker_pool.create_queue(args.queue, worker_settings)
+        pool = worker_pool.WorkerPool(processes, args.config, args.database, queue, worker_settings).start()
+        outputs = Outputs(dispatcher, exporter)
+        if not args.once:
+            config_service.add_listener(partial(reload_config, search_scheduler=search_scheduler, outputs=outputs,
+                                                interval=args.interval))
+        try:
+            if not args.once:
+                logger.info(f"Scheduling {len(searches)} searches on {processes} worker processes")
+            run_coordinator(queue, pool, outputs, search_scheduler, stop_event, wakeup, once=args.once,
+                            poll_seconds=worker_settings['poll_seconds'], metrics_file=args.metrics_file,
+                            config_service=None if args.once else config_service)
+        finally:
+            pool.stop()
+            queue.close()
+            outputs.close()
+            export_metrics(args.metrics_file)
+        logger.info("Stopped")
+        return 0
+
+    pipeline = search_core.SearchPipeline(ListingStore(args.database), dispatcher, PriceHistory(args.database),
+                                          NearDuplicateIndex(args.database), exporter)
+    max_workers = config.get('max_concurrent_searches', search_core.DEFAULT_MAX_CONCURRENT_SEARCHES)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search") as executor:
+            if args.once:
+                run_cycle(pipeline, [search_params for search_params, _ in searches], executor, stop_event)
+            else:
+                logger.info(f"Scheduling {len(searches)} searches")
+                config_service.add_listener(partial(reload_config, search_scheduler=search_scheduler,
+                                                    outputs=pipeline, interval=args.interval))
+                run_scheduled(pipeline, search_scheduler, executor, stop_event, wakeup, args.metrics_file,
+                              config_service)
+    finally:
+        pipeline.close()
+        export_metrics(args.metrics_file)
+    logger.info("Stopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,442 @@
+import logging
+import threading
+
+from collections import namedtuple
+from functools import lru_cache
+from listing import Listing
+from urllib.parse import urljoin
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Backends tried in order when the backend is "auto", fastest first
+BACKEND_ORDER = ("selectolax", "lxml", "html.parser")
+
+# Backend used when no backend is requested explicitly
+_default_backend = "auto"
+
+class SelectolaxBackend:
+    """
+    Backend using selectolax's lexbor engine, a C HTML5 parser with native CSS selectors.
+    """
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser_class = LexborHTMLParser
+
+    def compile(self, selector):
+        # Lexbor compiles and caches selectors itself, the string is the compiled form
+        return selector
+
+    def parse(self, content):
+        return self._parser_class(content)
+
+    def select(self, node, selector):
+        return node.css(selector)
+
+    def select_one(self, node, selector):
+        return node.css_first(selector)
+
+    def text(self, node):
+        return node.text()
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+class LxmlBackend:
+    """
+    Backend using lxml's libxml2 HTML parser with CSS selectors translated to XPath.
+    """
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        from cssselect import HTMLTranslator
+        self._fromstring = lxml.html.fromstring
+        self._xpath_class = etree.XPath
+        self._translator = HTMLTranslator()
+        # XPath evaluators must not be shared between threads
+        self._local = threading.local()
+
+    def compile(self, selector):
+        return self._translator.css_to_xpath(selector)
+
+    def _xpath(self, expression):
+        compiled = getattr(self._local, "compiled", None)
+        if compiled is None:
+            compiled = self._local.compiled = {}
+        xpath = compiled.get(expression)
+        if xpath is None:
+            xpath = compiled[expression] = self._xpath_class(expression)
+        return xpath
+
+    def parse(self, content):
+        return self._fromstring(content)
+
+    def select(self, node, selector):
+        return self._xpath(selector)(node)
+
+    def select_one(self, node, selector):
+        matches = self._xpath(selector)(node)
+        return matches[0] if matches else None
+
+    def text(self, node):
+        return node.text_content()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+class SoupBackend:
+    """
+    Pure-Python fallback using BeautifulSoup's html.parser with precompiled soupsieve selectors.
+    """
+    name = "html.parser"
+
+    def __init__(self):
+        import soupsieve
+        from bs4 import BeautifulSoup
+        self._compile = soupsieve.compile
+        self._soup_class = BeautifulSoup
+
+    def compile(self, selector):
+        return self._compile(selector)
+
+    def parse(self, content):
+        return self._soup_class(content, 'html.parser')
+
+    def select(self, node, selector):
+        return selector.select(node)
+
+    def select_one(self, node, selector):
+        return selector.select_one(node)
+
+    def text(self, node):
+        return node.get_text()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+# Backend classes by name
+BACKENDS = {backend.name: backend for backend in (SelectolaxBackend, LxmlBackend, SoupBackend)}
+
+def set_default_backend(name):
+    """
+    Set the backend used by parsers created without an explicit backend.
+
+    Parameters:
+    name (str): A name from BACKENDS, or "auto" for the fastest installed backend.
+    """
+    global _default_backend
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {name}")
+    _default_backend = name
+
+@lru_cache(maxsize=None)
+def get_backend(name="auto"):
+    """
+    Get a backend instance, importing its library on first use.
+
+    Parameters:
+    name (str): A name from BACKENDS, or "auto" for the fastest installed backend.
+
+    Returns:
+    object: The backend instance.
+
+    Raises:
+    ImportError: If the requested backend, or no backend at all for "auto", is installed.
+    """
+    if name != "auto":
+        return BACKENDS[name]()
+
+    for candidate in BACKEND_ORDER:
+        try:
+            backend = BACKENDS[candidate]()
+        except ImportError:
+            continue
+        logger.info(f"Using the {candidate} HTML parser backend")
+        return backend
+    raise ImportError("No HTML parser backend is installed, install selectolax, lxml or beautifulsoup4")
+
+class ListingParser:
+    """
+    Extracts listings from result pages using selectors compiled once for a site configuration.
+    """
+    def __init__(self, selectors, backend):
+        """
+        Initialize the ListingParser.
+
+        Parameters:
+        selectors (dict): CSS selectors for 'listing', 'title', 'price', 'link' and 'next_page',
+        and optionally 'image'; the item selectors are relative to the listing element.
+        backend (object): The parser backend.
+        """
+        self.backend = backend
+        self.listing = backend.compile(selectors['listing'])
+        self.title = backend.compile(selectors['title'])
+        self.price = backend.compile(selectors['price'])
+        self.link = backend.compile(selectors['link'])
+        self.image = backend.compile(selectors['image']) if selectors.get('image') else None
+        self.next_page = backend.compile(selectors['next_page'])
+
+    def parse(self, content, page_url):
+        """
+        Extract the listings and the next page link from a results page.
+
+        Parameters:
+        content (bytes): The raw HTML of the results page.
+        page_url (str): The URL of the page, used to resolve relative links.
+
+        Returns:
+        tuple: The Listing of every listing on the page,
+        and the absolute URL of the next page or None on the last page.
+        """
+        backend = self.backend
+        document = backend.parse(content)
+
+        listings = []
+        for item in backend.select(document, self.listing):
+            title = backend.select_one(item, self.title)
+            price = backend.select_one(item, self.price)
+            if title is None or price is None:
+                logger.debug(f"Skipping listing without title or price on {page_url}")
+                continue
+            link = backend.select_one(item, self.link)
+            href = backend.attr(link, 'href') if link is not None else None
+            image = backend.select_one(item, self.image) if self.image is not None else None
+            src = backend.attr(image, 'src') if image is not None else None
+            listings.append(Listing.from_text(
+                backend.text(title).strip(),
+                backend.text(price).strip(),
+                urljoin(page_url, href) if href else None,
+                urljoin(page_url, src) if src else None,
+            ))
+
+        next_link = backend.select_one(document, self.next_page)
+        next_href = backend.attr(next_link, 'href') if next_link is not None else None
+        next_url = urljoin(page_url, next_href) if next_href else None
+        return listings, next_url
+
+# A compound selector: the required tag (or None) and class names, and the XPath testing the element itself
+CompoundMatcher = namedtuple("CompoundMatcher", ["tag", "classes", "self_test"])
+
+# A selector with a combinator: the element must match right and its related elements left
+CombinedMatcher = namedtuple("CombinedMatcher", ["combinator", "left", "right"])
+
+# Pseudo-classes the streaming parser cannot evaluate: they look at later siblings, which are
+# not parsed yet when an element is complete, or at the content of listings, which is dropped
+LOOKAHEAD_PSEUDO_CLASSES = frozenset((
+    "last-child", "last-of-type", "only-child", "only-of-type", "nth-last-child", "nth-last-of-type",
+    "has", "contains",
+))
+
+class StreamingListingParser:
+    """
+    Extracts listings while a results page is still downloading, using lxml's incremental HTML parser.
+
+    Every listing is emitted as soon as its element is closed and its content is then dropped
+    from the partial tree, so memory stays bounded by the largest listing plus an empty element
+    per listing rather than the page. Elements keep their attributes and siblings, so sibling
+    and position selectors still work; selectors using LOOKAHEAD_PSEUDO_CLASSES do not.
+    """
+    def __init__(self, selectors):
+        """
+        Initialize the StreamingListingParser.
+
+        Parameters:
+        selectors (dict): The CSS selectors of the site, see ListingParser.
+
+        Raises:
+        ImportError: If lxml or cssselect is not installed.
+        """
+        import cssselect
+        from lxml import etree
+        self.backend = get_backend("lxml")
+        self._pull_parser_class = etree.HTMLPullParser
+        self._parse_selector = cssselect.parse
+        self._combined_class = cssselect.parser.CombinedSelector
+        self._function_class = cssselect.parser.Function
+        # :has() is parsed into a Relation since cssselect 1.2
+        self._relation_class = getattr(cssselect.parser, "Relation", ())
+        self.listing = self._compile_matcher(selectors['listing'])
+        self.next_page = self._compile_matcher(selectors['next_page'])
+        self.looks_ahead = any(
+            self._looks_ahead(parsed.parsed_tree)
+            for parsed in self._parse_selector(selectors['listing']) + self._parse_selector(selectors['next_page'])
+        )
+        self.title = self.backend.compile(selectors['title'])
+        self.price = self.backend.compile(selectors['price'])
+        self.link = self.backend.compile(selectors['link'])
+        self.image = self.backend.compile(selectors['image']) if selectors.get('image') else None
+
+    def _compile_matcher(self, selector):
+        """
+        Compile a selector group into a list of matchers, one per selector.
+
+        Tag and class names are tested before the XPath of every compound selector
+        because they are cheap.
+        """
+        return [self._compile_tree(parsed.parsed_tree) for parsed in self._parse_selector(selector)]
+
+    def _compile_tree(self, tree):
+        if isinstance(tree, self._combined_class):
+            return CombinedMatcher(tree.combinator, self._compile_tree(tree.selector), self._compile_tree(tree.subselector))
+
+        tag, classes, part = None, set(), tree
+        while part is not None:
+            if hasattr(part, "class_name"):
+                classes.add(part.class_name)
+            elif hasattr(part, "element"):
+                tag = part.element
+            part = getattr(part, "selector", None)
+        return CompoundMatcher(tag, frozenset(classes), "self::" + str(self.backend._translator.xpath(tree)))
+
+    def _looks_ahead(self, tree):
+        """
+        Check whether a parsed selector uses one of the LOOKAHEAD_PSEUDO_CLASSES anywhere.
+        """
+        if tree is None:
+            return False
+        if isinstance(tree, self._relation_class) or getattr(tree, "ident", None) in LOOKAHEAD_PSEUDO_CLASSES:
+            return True
+        if isinstance(tree, self._function_class) and tree.name in LOOKAHEAD_PSEUDO_CLASSES:
+            return True
+        children = [getattr(tree, "selector", None), getattr(tree, "subselector", None)]
+        children.extend(getattr(tree, "selector_list", ()))
+        return any(self._looks_ahead(child) for child in children)
+
+    def _match(self, element, matcher):
+        """
+        Check an element of the partial tree against one compiled selector.
+
+        Only ancestors and earlier siblings are consulted, which are always parsed already.
+        """
+        if isinstance(matcher, CombinedMatcher):
+            combinator, left, right = matcher
+            if not self._match(element, right):
+                return False
+            if combinator == " ":
+                return any(self._match(ancestor, left) for ancestor in element.iterancestors())
+            if combinator == ">":
+                parent = element.getparent()
+                return parent is not None and self._match(parent, left)
+            if combinator == "+":
+                sibling = element.getprevious()
+                return sibling is not None and self._match(sibling, left)
+            return any(self._match(sibling, left) for sibling in element.itersiblings(preceding=True))
+
+        tag, classes, self_test = matcher
+        if tag is not None and element.tag != tag:
+            return False
+        if classes and not classes.issubset(element.get('class', '').split()):
+            return False
+        return bool(self.backend._xpath(self_test)(element))
+
+    def _matches(self, element, matchers):
+        """
+        Check whether an element of the partial tree matches a compiled selector group.
+        """
+        return any(self._match(element, matcher) for matcher in matchers)
+
+    def _text(self, element):
+        return "".join(element.itertext())
+
+    def parse(self, chunks, page_url):
+        """
+        Feed a results page to the parser chunk by chunk and yield its listings.
+
+        Parameters:
+        chunks (iterable): The raw HTML of the page as byte strings.
+        page_url (str): The URL of the page, used to resolve relative links.
+
+        Yields:
+        Listing: Each listing, as soon as it is complete.
+
+        Returns:
+        str: The absolute URL of the next page, or None on the last page.
+        """
+        backend = self.backend
+        chunks = iter(chunks)
+        parser = self._pull_parser_class(events=("end",))
+        next_href = None
+        done = False
+        while not done:
+            chunk = next(chunks, None)
+            if chunk is None:
+                parser.close()
+                done = True
+            else:
+                parser.feed(chunk)
+
+            for _, element in parser.read_events():
+                if next_href is None and self._matches(element, self.next_page):
+                    next_href = element.get('href')
+                if not self._matches(element, self.listing):
+                    continue
+
+                title = backend.select_one(element, self.title)
+                price = backend.select_one(element, self.price)
+                if title is None or price is None:
+                    logger.debug(f"Skipping listing without title or price on {page_url}")
+                else:
+                    link = backend.select_one(element, self.link)
+                    href = link.get('href') if link is not None else None
+                    image = backend.select_one(element, self.image) if self.image is not None else None
+                    src = image.get('src') if image is not None else None
+                    yield Listing.from_text(
+                        self._text(title).strip(),
+                        self._text(price).strip(),
+                        urljoin(page_url, href) if href else None,
+                        urljoin(page_url, src) if src else None,
+                    )
+
+                # Drop the content of the listing, which was handled already; the element
+                # itself stays with its attributes for the selectors of later siblings
+                attributes = dict(element.attrib)
+                element.clear(keep_tail=True)
+                element.attrib.update(attributes)
+
+        return urljoin(page_url, next_href) if next_href else None
+
+@lru_cache(maxsize=64)
+def _get_listing_parser(selector_items, backend_name):
+    return ListingParser(dict(selector_items), get_backend(backend_name))
+
+def get_listing_parser(selectors, backend=None):
+    """
+    Get the parser for a site configuration, compiling its selectors only once.
+
+    Parameters:
+    selectors (dict): The CSS selectors of the site, see ListingParser.
+    backend (str): A backend name, or None for the default backend.
+
+    Returns:
+    ListingParser: The cached parser.
+    """
+    return _get_listing_parser(tuple(sorted(selectors.items())), backend or _default_backend)
+
+@lru_cache(maxsize=64)
+def _get_streaming_parser(selector_items):
+    parser = StreamingListingParser(dict(selector_items))
+    if parser.looks_ahead:
+        logger.info("The listing or next page selector looks at later siblings or listing content, "
+                    "its pages are parsed once downloaded")
+        return None
+    return parser
+
+def get_streaming_parser(selectors):
+    """
+    Get the incremental parser for a site configuration, compiling its selectors only once.
+
+    Parameters:
+    selectors (dict): The CSS selectors of the site, see ListingParser.
+
+    Returns:
+    StreamingListingParser: The cached parser, or None if the listing or next page selector
+    cannot be evaluated incrementally (see LOOKAHEAD_PSEUDO_CLASSES).
+
+    Raises:
+    ImportError: If lxml or cssselect is not installed.
+    """
+    return _get_streaming_parser(tuple(sorted(selectors.items())))
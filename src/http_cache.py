@@ -0,0 +1,345 @@
+import logging
+import metrics
+import os
+import tempfile
+import threading
+import time
+import requests
+
+from collections import namedtuple
+from listing_store import open_connection, transaction
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default location of the response cache
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "data", "http_cache.db")
+
+# Default cache settings, overridable through the "cache" entry of the "http" section of config.json
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "path": DEFAULT_CACHE_PATH,
+    "ttl_seconds": 60.0,              # Responses younger than this are served without contacting the site
+    "max_bytes": 256 * 1024 * 1024,   # Size of the stored bodies above which the least recently used are evicted
+    "replay": False,                  # Serve only from the cache and fail on misses, e.g. to develop offline
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    content_type TEXT,
+    encoding TEXT,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+"""
+
+# Bytes of a body being downloaded that are kept in memory before the copy spills to a temporary file
+SPOOL_BYTES = 1024 * 1024
+
+# A stored response; url is the final URL after redirects
+CacheEntry = namedtuple("CacheEntry", ["url", "etag", "last_modified", "content_type", "encoding", "body", "stored_at"])
+
+class CacheMiss(requests.RequestException):
+    """Raised in replay mode when a URL is not in the cache."""
+
+def normalize_url(url):
+    """
+    Build the cache key of a URL, so equivalent spellings share one entry.
+
+    The scheme and host are lowercased, default ports and the fragment dropped and
+    the query parameters sorted.
+
+    Parameters:
+    url (str): The URL.
+
+    Returns:
+    str: The normalized URL.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ""
+    if parts.port is not None and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+def cached_response(entry):
+    """
+    Wrap a cache entry in a Response that reads like a fully downloaded one.
+
+    Parameters:
+    entry (CacheEntry): The stored response.
+
+    Returns:
+    requests.Response: A 200 response with the stored body; its from_cache attribute is True.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response.url = entry.url
+    response.encoding = entry.encoding
+    response._content = entry.body
+    response._content_consumed = True
+    for name, value in (("ETag", entry.etag), ("Last-Modified", entry.last_modified),
+                        ("Content-Type", entry.content_type), ("Content-Length", str(len(entry.body)))):
+        if value is not None:
+            response.headers[name] = value
+    response.from_cache = True
+    return response
+
+class CacheWriter:
+    """
+    Copies the body of a streamed response into the cache while it is being read.
+
+    HttpClient.iter_body() writes every chunk it yields here and commits once the body
+    was read completely, so a miss streams like an uncached response. The copy is kept
+    in a temporary file, in memory up to SPOOL_BYTES, and stored in one piece at the end;
+    a body read only partly is discarded.
+    """
+    def __init__(self, cache, key, response):
+        """
+        Initialize the CacheWriter.
+
+        Parameters:
+        cache (ResponseCache): The cache the body is stored in.
+        key (str): The normalized URL.
+        response (requests.Response): The response, for its URL and headers.
+        """
+        self.cache = cache
+        self.key = key
+        self.response = response
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+
+    def write(self, chunk):
+        """
+        Append a chunk of the decoded body.
+        """
+        self._file.write(chunk)
+
+    def commit(self):
+        """
+        Store the complete body.
+
+        Returns:
+        CacheEntry: The stored entry.
+        """
+        with self._file:
+            self._file.seek(0)
+            body = self._file.read()
+        return self.cache.store(self.key, self.response, body)
+
+    def discard(self):
+        """
+        Drop the copy of a body that was not read completely.
+        """
+        self._file.close()
+
+class ResponseCache:
+    """
+    SQLite-backed cache of successful GET responses with TTLs, revalidation and LRU eviction.
+
+    A response younger than its TTL is served without any request. An older one is
+    revalidated with If-None-Match/If-Modified-Since when the site sent an ETag or
+    Last-Modified, so an unchanged page costs a 304 without a body. The stored bodies
+    are kept under max_bytes by evicting the least recently used. Each thread gets its
+    own connection, in the same way as ListingStore.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_SETTINGS["ttl_seconds"],
+                 max_bytes=DEFAULT_SETTINGS["max_bytes"], replay=False):
+        """
+        Initialize the ResponseCache and create the schema if needed.
+
+        Parameters:
+        path (str): The path of the SQLite database file.
+        ttl_seconds (float): Default age up to which a response is served without revalidation.
+        max_bytes (int): Size of the stored bodies above which entries are evicted, 0 for no limit.
+        replay (bool): True to never send requests and raise CacheMiss for unknown URLs.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """
+        Get the connection of the calling thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = open_connection(self.path)
+        return connection
+
+    def lookup(self, key):
+        """
+        Get a stored response and mark it as recently used.
+
+        Parameters:
+        key (str): The normalized URL.
+
+        Returns:
+        CacheEntry: The entry, or None if the URL is not cached.
+        """
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT url, etag, last_modified, content_type, encoding, body, stored_at FROM responses WHERE cache_key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute("UPDATE responses SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+        return CacheEntry(*row)
+
+    def store(self, key, response, body):
+        """
+        Store a downloaded response and evict the least recently used entries over the size cap.
+
+        Parameters:
+        key (str): The normalized URL.
+        response (requests.Response): The response, for its URL and headers.
+        body (bytes): Its decoded body.
+
+        Returns:
+        CacheEntry: The stored entry.
+        """
+        now = time.time()
+        entry = CacheEntry(response.url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                           response.headers.get("Content-Type"), response.encoding, body, now)
+        connection = self._connection()
+        with transaction(connection):
+            connection.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(cache_key, url, etag, last_modified, content_type, encoding, body, stored_at, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key,) + entry + (len(body), now),
+            )
+            if self.max_bytes:
+                self._evict(connection)
+        return entry
+
+    def _evict(self, connection):
+        """
+        Delete the least recently used entries until the stored bodies fit max_bytes.
+        """
+        excess = connection.execute("SELECT TOTAL(size) FROM responses").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in connection.execute("SELECT cache_key, size FROM responses ORDER BY last_used"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        connection.executemany("DELETE FROM responses WHERE cache_key = ?", evicted)
+        metrics.count("http_cache_evictions_total", "Responses evicted from the HTTP cache", amount=len(evicted))
+
+    def refresh(self, key, entry, response):
+        """
+        Record that a stored response was revalidated by a 304.
+
+        Parameters:
+        key (str): The normalized URL.
+        entry (CacheEntry): The stored entry.
+        response (requests.Response): The 304 response, whose validators replace the stored ones.
+
+        Returns:
+        CacheEntry: The refreshed entry.
+        """
+        entry = entry._replace(
+            etag=response.headers.get("ETag", entry.etag),
+            last_modified=response.headers.get("Last-Modified", entry.last_modified),
+            stored_at=time.time(),
+        )
+        self._connection().execute(
+            "UPDATE responses SET etag = ?, last_modified = ?, stored_at = ? WHERE cache_key = ?",
+            (entry.etag, entry.last_modified, entry.stored_at, key),
+        )
+        return entry
+
+    def get(self, url, send, ttl_seconds=None, headers=None):
+        """
+        Get a URL through the cache.
+
+        Parameters:
+        url (str): The URL to fetch.
+        send (callable): Called with the URL and the request headers to send a streamed GET request.
+        ttl_seconds (float): The TTL of this URL, or None for the default TTL.
+        headers (dict): Extra request headers.
+
+        Returns:
+        requests.Response: The response. Hits and revalidated responses are already read and
+        have from_cache set. A downloaded 200 is returned unread, with a CacheWriter as its
+        cache_writer attribute storing the body as HttpClient.iter_body() reads it; other
+        statuses are returned as sent and not stored.
+
+        Raises:
+        CacheMiss: If the cache replays and the URL is not stored.
+        """
+        key = normalize_url(url)
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        entry = self.lookup(key)
+        if self.replay:
+            if entry is None:
+                metrics.count("http_cache_total", "HTTP cache lookups by outcome", outcome="miss")
+                raise CacheMiss(f"{url} is not in the replayed cache {self.path}")
+            metrics.count("http_cache_total", "HTTP cache lookups by outcome", outcome="hit")
+            return cached_response(entry)
+        if entry is not None and time.time() - entry.stored_at < ttl_seconds:
+            metrics.count("http_cache_total", "HTTP cache lookups by outcome", outcome="hit")
+            return cached_response(entry)
+
+        headers = dict(headers or {})
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        response = send(url, headers)
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            metrics.count("http_cache_total", "HTTP cache lookups by outcome", outcome="revalidated")
+            return cached_response(self.refresh(key, entry, response))
+        metrics.count("http_cache_total", "HTTP cache lookups by outcome", outcome="miss")
+        if response.status_code == 200 and "no-store" not in response.headers.get("Cache-Control", ""):
+            response.cache_writer = CacheWriter(self, key, response)
+        return response
+
+    def clear(self):
+        """
+        Delete every stored response.
+        """
+        self._connection().execute("DELETE FROM responses")
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+def create_cache(settings):
+    """
+    Build the response cache of the "cache" entry of the HTTP settings.
+
+    Parameters:
+    settings (dict): The cache settings, or None.
+
+    Returns:
+    ResponseCache: The cache, or None if it is disabled.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    if not settings["enabled"] and not settings["replay"]:
+        return None
+    if settings["replay"]:
+        logger.info(f"Replaying HTTP responses from {settings['path']}, no requests are sent")
+    return ResponseCache(settings["path"], settings["ttl_seconds"], settings["max_bytes"], settings["replay"])
@@ -0,0 +1,325 @@
+import http_cache
+import logging
+import metrics
+import threading
+import requests
+
+from urllib.parse import urlsplit
+from rate_limiter import HostRateLimiter
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default client settings, overridable through the "http" section of config.json
+DEFAULT_SETTINGS = {
+    "connect_timeout": 5.0,       # Seconds to establish a connection
+    "read_timeout": 30.0,         # Seconds to wait between bytes of the response
+    "retries": 3,                 # Retries for connection errors and retryable statuses
+    "backoff_factor": 0.5,        # Sleeps 0.5s, 1s, 2s, ... between retries
+    "pool_connections": 10,       # Number of hosts with a cached connection pool
+    "pool_maxsize": 10,           # Keep-alive connections kept per host
+    "rate_limit_per_host": 5.0,   # Sustained requests per second per host, 0 to disable
+    "rate_limit_burst": 10,       # Requests per host allowed back to back
+    "user_agent": "WebScrapper/1.0",
+    "max_body_bytes": 16 * 1024 * 1024,  # Decoded size at which a response is rejected, 0 for no limit
+    "chunk_bytes": 64 * 1024,     # Read size of streamed response bodies
+    "cache": None,                # On-disk response cache, see http_cache.DEFAULT_SETTINGS; None to disable
+}
+
+# Statuses that are retried with exponential backoff
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# The shared client and the lock guarding its creation
+_client = None
+_client_lock = threading.Lock()
+
+def accepted_encodings():
+    """
+    Get the content encodings urllib3 can decode in this environment.
+
+    Returns:
+    str: The value for the Accept-Encoding header.
+    """
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401
+        encodings.append("br")
+    except ImportError:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except ImportError:
+            pass
+    return ", ".join(encodings)
+
+class ResponseTooLarge(requests.RequestException):
+    """Raised when a response body exceeds the configured maximum size."""
+
+class TimedHTTPConnection(HTTPConnection):
+    """
+    Records the DNS lookup and TCP connect of every new connection as the "connect" phase.
+    """
+    def connect(self):
+        with metrics.timed("connect"):
+            super().connect()
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """
+    Records the DNS lookup, TCP connect and TLS handshake of every new connection as the "connect" phase.
+    """
+    def connect(self):
+        with metrics.timed("connect"):
+            super().connect()
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pools time the establishment of their connections.
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+class RateLimitedRetry(Retry):
+    """
+    Retry that waits for the host's rate limit before every retried attempt, as before the first one.
+    """
+    def __init__(self, *args, rate_limiter=None, host=None, **kwargs):
+        """
+        Initialize the RateLimitedRetry.
+
+        Parameters:
+        rate_limiter (HostRateLimiter): The limiter to take a token from per retry, or None.
+        host (str): The host of the last attempt, set by increment().
+        args, kwargs: The arguments of urllib3's Retry.
+        """
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.host = host
+
+    def new(self, **kwargs):
+        kwargs.setdefault("rate_limiter", self.rate_limiter)
+        kwargs.setdefault("host", self.host)
+        return super().new(**kwargs)
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        if _pool is not None:
+            retry.host = _pool.host
+        return retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.rate_limiter is not None and self.host:
+            self.rate_limiter.acquire(self.host)
+
+class HttpClient:
+    """
+    Thread-safe HTTP client with per-host keep-alive connection pools, rate limits, timeouts and retries.
+
+    Responses are decoded transparently for every encoding listed in Accept-Encoding.
+    With a response cache, GET requests are served from disk while fresh and revalidated
+    with conditional requests after their TTL.
+    """
+    def __init__(self, previous=None, **settings):
+        """
+        Initialize the HttpClient.
+
+        Parameters:
+        previous (HttpClient): A client this one replaces; its rate limiter and response cache
+        are taken over when their settings are unchanged, so the hosts' token buckets carry on.
+        settings: Overrides for any of the keys in DEFAULT_SETTINGS.
+        """
+        unknown = set(settings) - set(DEFAULT_SETTINGS)
+        if unknown:
+            raise ValueError(f"Unknown HTTP client settings: {', '.join(sorted(unknown))}")
+        self.settings = {**DEFAULT_SETTINGS, **settings}
+        self.timeout = (self.settings["connect_timeout"], self.settings["read_timeout"])
+
+        if previous is not None and previous.rate_limiter is not None and (
+                previous.rate_limiter.rate, previous.rate_limiter.burst) == (
+                self.settings["rate_limit_per_host"], self.settings["rate_limit_burst"]):
+            self.rate_limiter = previous.rate_limiter
+        elif self.settings["rate_limit_per_host"] > 0:
+            self.rate_limiter = HostRateLimiter(self.settings["rate_limit_per_host"], self.settings["rate_limit_burst"])
+        else:
+            self.rate_limiter = None
+        if previous is not None and previous.settings["cache"] == self.settings["cache"]:
+            self.cache = previous.cache
+        else:
+            self.cache = http_cache.create_cache(self.settings["cache"])
+
+        retry = RateLimitedRetry(
+            rate_limiter=self.rate_limiter,
+            total=self.settings["retries"],
+            backoff_factor=self.settings["backoff_factor"],
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.settings["pool_connections"],
+            pool_maxsize=self.settings["pool_maxsize"],
+            max_retries=retry,
+        )
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": self.settings["user_agent"],
+            "Accept-Encoding": accepted_encodings(),
+            "Connection": "keep-alive",
+        })
+
+    def get(self, url, cache_ttl=None, **kwargs):
+        """
+        Send a GET request through the pooled session, waiting for the host's rate limit first.
+
+        Parameters:
+        url (str): The URL to fetch.
+        cache_ttl (float): Seconds a cached response of this URL is served without revalidation,
+        or None for the TTL of the cache settings.
+        kwargs: Extra arguments for requests.Session.get; the timeout defaults to the client settings.
+
+        Returns:
+        requests.Response: The response after any retries; responses served by the cache are
+        already read and have from_cache set. A response the cache has to store is stored
+        once its body was read with iter_body() or read_body().
+
+        Raises:
+        CacheMiss: If the cache replays and the URL is not stored.
+        """
+        if self.cache is not None:
+            def send(url, headers):
+                return self._send(url, **{**kwargs, "headers": headers, "stream": True})
+            return self.cache.get(url, send, cache_ttl, kwargs.get("headers"))
+        return self._send(url, **kwargs)
+
+    def _send(self, url, **kwargs):
+        """
+        Send a GET request, waiting for the host's rate limit first.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(urlsplit(url).hostname)
+        return self.session.get(url, **kwargs)
+
+    def iter_body(self, response):
+        """
+        Read the body of a response sent with stream=True in chunks, enforcing the size limit.
+
+        The limit applies to the decoded body, so compressed responses cannot expand past it.
+        A response downloaded through the response cache is stored once it was read completely.
+
+        Parameters:
+        response (requests.Response): The streamed response.
+
+        Yields:
+        bytes: The decoded body, chunk by chunk.
+
+        Raises:
+        ResponseTooLarge: If the body is larger than max_body_bytes.
+        """
+        writer = getattr(response, "cache_writer", None)
+        response.cache_writer = None
+        limit = self.settings["max_body_bytes"]
+        declared = response.headers.get("Content-Length", "")
+        if limit and declared.isdigit() and int(declared) > limit:
+            if writer is not None:
+                writer.discard()
+            raise ResponseTooLarge(f"{response.url} declares {declared} bytes, the limit is {limit}", response=response)
+
+        received = 0
+        complete = False
+        try:
+            for chunk in response.iter_content(self.settings["chunk_bytes"]):
+                received += len(chunk)
+                if limit and received > limit:
+                    raise ResponseTooLarge(f"{response.url} is larger than the limit of {limit} bytes", response=response)
+                if writer is not None:
+                    writer.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            if writer is not None and not complete:
+                writer.discard()
+        if writer is not None:
+            writer.commit()
+
+    def read_body(self, response):
+        """
+        Read the whole body of a response sent with stream=True, enforcing the size limit.
+
+        Parameters:
+        response (requests.Response): The streamed response.
+
+        Returns:
+        bytes: The decoded body.
+
+        Raises:
+        ResponseTooLarge: If the body is larger than max_body_bytes.
+        """
+        return b"".join(self.iter_body(response))
+
+    def close(self, keep_cache=False):
+        """
+        Close all pooled connections.
+
+        Connections in use by in-flight requests are closed once released. The response cache
+        only closes the connection of the calling thread; those of other threads are closed
+        when the cache is garbage collected.
+
+        Parameters:
+        keep_cache (bool): True to leave the response cache open, e.g. when a new client took it over.
+        """
+        self.session.close()
+        if self.cache is not None and not keep_cache:
+            self.cache.close()
+
+def configure(settings=None):
+    """
+    Replace the shared client with one built from the given settings, unless they are unchanged.
+
+    Parameters:
+    settings (dict): The "http" section of the config, or None for the defaults.
+
+    Returns:
+    HttpClient: The shared client.
+    """
+    global _client
+    with _client_lock:
+        previous = _client
+        if previous is not None and previous.settings == {**DEFAULT_SETTINGS, **(settings or {})}:
+            return previous
+        new_client = _client = HttpClient(previous, **(settings or {}))
+    if previous is not None:
+        previous.close(keep_cache=previous.cache is new_client.cache)
+    logger.info(f"HTTP client configured: {new_client.settings}")
+    return new_client
+
+def get_client():
+    """
+    Get the shared client, creating it with the default settings on first use.
+
+    Returns:
+    HttpClient: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,443 @@
+import hashlib
+import itertools
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from collections import OrderedDict
+from listing_store import open_connection, transaction
+from PySide6.QtCore import QBuffer, QByteArray, QIODevice, QObject, QRunnable, QSize, QThreadPool, Qt, Signal, Slot
+from PySide6.QtGui import QImage, QImageReader, QPixmap
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default location of the thumbnail cache
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "thumbnails")
+
+# Default edge length of thumbnails in pixels; images are scaled to fit, keeping their aspect ratio
+THUMBNAIL_SIZE = 32
+
+# Default size of the thumbnails kept on disk before the least recently used are evicted
+DEFAULT_MAX_DISK_BYTES = 64 * 1024 * 1024
+
+# Default number of decoded thumbnails kept in memory
+DEFAULT_MEMORY_ITEMS = 1000
+
+# Default number of images downloaded and decoded at the same time
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Settings of the image HTTP client overriding those of the shared page client
+IMAGE_HTTP_SETTINGS = {
+    "cache": None,  # Images would fill the page cache and evict the pages
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    source_key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_thumbnails_digest ON thumbnails (digest);
+CREATE INDEX IF NOT EXISTS idx_thumbnails_last_used ON thumbnails (last_used);
+"""
+
+def source_key(source, size):
+    """
+    Build the key of the thumbnail of an image at a size.
+
+    Parameters:
+    source (str): The image URL or file path.
+    size (int): The thumbnail edge length.
+
+    Returns:
+    str: The key.
+    """
+    return f"{size}:{source}"
+
+class ThumbnailCache:
+    """
+    Content-addressed disk cache of encoded thumbnails with size-bounded LRU eviction.
+
+    Every thumbnail is stored once, in a file named after the hash of its bytes, so the
+    same picture behind several URLs takes the space of one. An SQLite index maps each
+    source to its file and records when it was last used. The cache is thread-safe: the
+    index queries take microseconds, so the threads share one connection under a lock,
+    and files are read and written atomically outside of it.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_DISK_BYTES):
+        """
+        Initialize the ThumbnailCache and create the directory and index if needed.
+
+        Parameters:
+        directory (str): The cache directory.
+        max_bytes (int): Size of the stored files above which the least recently used are evicted.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._connection = open_connection(os.path.join(directory, "index.db"), check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        """
+        Read a stored thumbnail and mark it as recently used.
+
+        Parameters:
+        key (str): The source key, see source_key().
+
+        Returns:
+        bytes: The encoded thumbnail, or None if it is not stored.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT digest FROM thumbnails WHERE source_key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._path(row[0]), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._connection.execute("DELETE FROM thumbnails WHERE source_key = ?", (key,))
+            return None
+        with self._lock:
+            self._connection.execute("UPDATE thumbnails SET last_used = ? WHERE source_key = ?", (time.time(), key))
+        return data
+
+    def put(self, key, data):
+        """
+        Store an encoded thumbnail and evict the least recently used ones over the size cap.
+
+        Parameters:
+        key (str): The source key, see source_key().
+        data (bytes): The encoded thumbnail.
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+        with self._lock, transaction(self._connection) as connection:
+            connection.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?)",
+                               (key, digest, len(data), time.time()))
+            self._evict(connection)
+
+    def _evict(self, connection):
+        """
+        Delete the least recently used entries, and the files no entry refers to any more,
+        until the stored files fit max_bytes.
+        """
+        # Files shared by several sources count once
+        stored = connection.execute("SELECT TOTAL(size) FROM (SELECT DISTINCT digest, size FROM thumbnails)").fetchone()[0]
+        excess = stored - self.max_bytes
+        if excess <= 0:
+            return
+        for key, digest, size in connection.execute(
+            "SELECT source_key, digest, size FROM thumbnails ORDER BY last_used"
+        ).fetchall():
+            if excess <= 0:
+                break
+            connection.execute("DELETE FROM thumbnails WHERE source_key = ?", (key,))
+            if connection.execute("SELECT 1 FROM thumbnails WHERE digest = ?", (digest,)).fetchone() is None:
+                try:
+                    os.remove(self._path(digest))
+                except OSError:
+                    pass
+                excess -= size
+
+    def close(self):
+        """
+        Close the index connection; the cache cannot be used afterwards.
+        """
+        with self._lock:
+            self._connection.close()
+
+def decode_thumbnail(data, size):
+    """
+    Decode an image and scale it down to fit a square, keeping its aspect ratio.
+
+    The decoder is asked for the reduced size directly, which lets JPEG images skip
+    most of the full-size decoding.
+
+    Parameters:
+    data (bytes): The encoded image.
+    size (int): The edge length of the square.
+
+    Returns:
+    QImage: The thumbnail.
+
+    Raises:
+    ValueError: If the data is not a supported image.
+    """
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid() and (original.width() > size or original.height() > size):
+        reader.setScaledSize(original.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise ValueError(f"Cannot decode image: {reader.errorString()}")
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+def encode_thumbnail(image):
+    """
+    Encode a thumbnail for the disk cache, as PNG if it has transparency and JPEG otherwise.
+
+    Parameters:
+    image (QImage): The thumbnail.
+
+    Returns:
+    bytes: The encoded image.
+    """
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    if image.hasAlphaChannel():
+        image.save(buffer, "PNG")
+    else:
+        image.save(buffer, "JPG", 85)
+    return bytes(buffer.data())
+
+class ImageSignals(QObject):
+    """
+    Signals emitted by an ImageTask while it runs on a worker thread.
+
+    The object is created on the GUI thread, so connected slots are invoked
+    through queued connections on the GUI event loop.
+    """
+    loaded = Signal(str, QImage)
+    failed = Signal(str, str)
+
+class ImageTask(QRunnable):
+    """
+    Reads, downloads and decodes one thumbnail on the thread pool.
+    """
+    def __init__(self, key, source, size, loader):
+        """
+        Initialize the ImageTask.
+
+        Parameters:
+        key (str): The source key reported with the signals.
+        source (str): The image URL, or the path of a local file.
+        size (int): The thumbnail edge length.
+        loader (ImageLoader): Provides the disk cache and the HTTP client.
+        """
+        super().__init__()
+        self.key = key
+        self.source = source
+        self.size = size
+        self.loader = loader
+        self.signals = ImageSignals()
+        # The loader keeps the task until it reports back, so Qt must not delete it
+        self.setAutoDelete(False)
+
+    @Slot()
+    def run(self):
+        """
+        Produce the thumbnail from the disk cache or its source and report it through the signals.
+        """
+        try:
+            remote = self.source.startswith(("http://", "https://"))
+            cache = self.loader.get_cache() if remote else None
+            data = cache.get(self.key) if cache is not None else None
+            if data is not None:
+                image = decode_thumbnail(data, self.size)
+            else:
+                image = decode_thumbnail(self.read_source(remote), self.size)
+                if cache is not None:
+                    cache.put(self.key, encode_thumbnail(image))
+        except Exception as e:
+            logger.warning(f"Cannot load image {self.source}: {e}")
+            self.signals.failed.emit(self.key, str(e))
+        else:
+            self.signals.loaded.emit(self.key, image)
+
+    def read_source(self, remote):
+        """
+        Get the encoded image from the network or the local file.
+        """
+        if not remote:
+            with open(self.source, "rb") as f:
+                return f.read()
+        client = self.loader.get_client()
+        with client.get(self.source, stream=True) as response:
+            response.raise_for_status()
+            return client.read_body(response)
+
+class ImageLoader(QObject):
+    """
+    Loads thumbnails concurrently, without ever blocking the GUI thread on I/O or decoding.
+
+    request() answers from an in-memory LRU of ready pixmaps or returns None and queues
+    the image; image_ready is emitted once it is loaded. Downloads, disk cache reads and
+    decoding run on a thread pool, only the final conversion of the small thumbnail to a
+    QPixmap happens on the GUI thread. The most recent requests are served first, so
+    scrolling quickly past many rows does not delay the rows that are shown. Images are
+    downloaded with their own HTTP client, so they neither go through the page cache nor
+    take from the rate budget of the searches.
+    """
+
+    # Emitted with the source once its thumbnail can be got from request()
+    image_ready = Signal(str)
+    # Emitted with the source and the reason when its thumbnail cannot be loaded
+    image_failed = Signal(str, str)
+
+    def __init__(self, parent=None, cache=None, size=THUMBNAIL_SIZE, memory_items=DEFAULT_MEMORY_ITEMS,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Initialize the ImageLoader.
+
+        Parameters:
+        parent (QObject): The parent object.
+        cache (ThumbnailCache): The disk cache of downloaded thumbnails, or None for the default cache,
+        which is opened by the first download.
+        size (int): The default thumbnail edge length.
+        memory_items (int): The number of thumbnails kept in memory.
+        max_concurrency (int): The number of images loaded at the same time.
+        """
+        super().__init__(parent)
+        self.cache = cache
+        self.size = size
+        self.memory_items = memory_items
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max_concurrency)
+        self._pixmaps = OrderedDict()
+        self._pending = {}
+        # Sources that failed are not retried until clear() is called
+        self._failed = set()
+        self._priorities = itertools.count()
+        self._client = None
+        # Guards the creation of the cache and client by the worker threads
+        self._lock = threading.Lock()
+
+    def get_cache(self):
+        """
+        Get the disk cache, opening the default cache on first use.
+
+        Called by the tasks on the worker threads, so creating the cache directory and
+        index never blocks the GUI thread.
+
+        Returns:
+        ThumbnailCache: The cache, or None if it cannot be opened.
+        """
+        with self._lock:
+            if self.cache is None:
+                try:
+                    self.cache = ThumbnailCache()
+                except (OSError, sqlite3.Error) as e:
+                    logger.error(f"Cannot open the thumbnail cache: {e}")
+                    self.cache = False
+            return self.cache or None
+
+    def get_client(self):
+        """
+        Get the HTTP client of the image downloads, creating it on first use.
+
+        The client has the settings of the shared page client with IMAGE_HTTP_SETTINGS
+        applied, and its own rate limiter.
+
+        Returns:
+        HttpClient: The client.
+        """
+        with self._lock:
+            if self._client is None:
+                # Imported on first download, so showing local icons does not load requests at startup
+                import http_client
+                self._client = http_client.HttpClient(**{**http_client.get_client().settings, **IMAGE_HTTP_SETTINGS})
+            return self._client
+
+    def request(self, source, size=None):
+        """
+        Get the thumbnail of an image if it is loaded, otherwise start loading it.
+
+        Parameters:
+        source (str): The image URL, or the path of a local file.
+        size (int): The thumbnail edge length, or None for the default size.
+
+        Returns:
+        QPixmap: The thumbnail, or None until image_ready is emitted for the source.
+        """
+        size = size or self.size
+        key = source_key(source, size)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return pixmap
+        if key in self._pending or key in self._failed:
+            return None
+
+        task = ImageTask(key, source, size, self)
+        task.signals.loaded.connect(self._on_loaded)
+        task.signals.failed.connect(self._on_failed)
+        self._pending[key] = (source, task)
+        self.thread_pool.start(task, next(self._priorities))
+        return None
+
+    @Slot(str, QImage)
+    def _on_loaded(self, key, image):
+        """
+        Keep a loaded thumbnail in memory and announce it.
+        """
+        source, _ = self._pending.pop(key, (None, None))
+        if source is None:
+            return
+        self._pixmaps[key] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.memory_items:
+            self._pixmaps.popitem(last=False)
+        self.image_ready.emit(source)
+
+    @Slot(str, str)
+    def _on_failed(self, key, error):
+        """
+        Remember a failed source and announce the failure.
+        """
+        source, _ = self._pending.pop(key, (None, None))
+        if source is None:
+            return
+        self._failed.add(key)
+        self.image_failed.emit(source, error)
+
+    def clear(self):
+        """
+        Drop the queued requests, the thumbnails in memory and the failed sources.
+        """
+        self.thread_pool.clear()
+        self._pending.clear()
+        self._pixmaps.clear()
+        self._failed.clear()
+
+    def shutdown(self, timeout_ms=5000):
+        """
+        Drop the queued requests, wait for the running ones and close the cache and client.
+
+        Parameters:
+        timeout_ms (int): Maximum time to wait for running downloads; if they do not finish
+        in time, the cache and client are left open for them.
+        """
+        self.thread_pool.clear()
+        finished = self.thread_pool.waitForDone(timeout_ms)
+        self._pending.clear()
+        if not finished:
+            return
+        with self._lock:
+            if self.cache:
+                self.cache.close()
+            if self._client is not None:
+                self._client.close()
+            self.cache, self._client = False, None
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import namedtuple
+from listing_store import open_connection, transaction
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default location of the job queue
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(__file__), "data", "jobs.db")
+
+# A leased search job; attempts counts the current lease
+Job = namedtuple("Job", ["job_id", "search_key", "search_params", "attempts"])
+
+# A job that left the queue; result is the worker's JSON result of a done job, error the reason of a failed one
+FinishedJob = namedtuple("FinishedJob", ["job_id", "search_key", "state", "attempts", "result", "error"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    search_key TEXT NOT NULL,
+    search_params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    enqueued_at REAL NOT NULL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_available ON jobs (state, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (state, lease_expires);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending ON jobs (search_key) WHERE state IN ('queued', 'leased');
+"""
+
+class JobQueue:
+    """
+    Durable queue of search jobs in SQLite, shared by a coordinator and worker processes.
+
+    Workers lease a job for a limited time and extend the lease while they work on it.
+    The lease of a worker that crashed or hangs expires and the job is handed to the
+    next worker, until it used up its attempts. Leasing is a single BEGIN IMMEDIATE
+    transaction, so any number of processes can share the queue file. Every worker must
+    be a local process on the same host: the file is in WAL mode, whose shared memory
+    index does not work across machines or on network filesystems. The queue is
+    thread-safe in the same way as ListingStore.
+    """
+    def __init__(self, path=DEFAULT_QUEUE_PATH, max_attempts=3, retry_delay=30.0):
+        """
+        Initialize the JobQueue and create the schema if needed.
+
+        Parameters:
+        path (str): The path of the SQLite database file.
+        max_attempts (int): Leases of a job before it is given up.
+        retry_delay (float): Seconds before a failed job is retried, doubled after every attempt.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """
+        Get the connection of the calling thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = open_connection(self.path)
+        return connection
+
+    def enqueue(self, search_key, search_params):
+        """
+        Add a search job, unless the same search is already queued or running.
+
+        Parameters:
+        search_key (str): The key of the search.
+        search_params (dict): The search parameters.
+
+        Returns:
+        int: The id of the new job, or None if the search was already pending.
+        """
+        cursor = self._connection().execute(
+            "INSERT OR IGNORE INTO jobs (search_key, search_params, state, available_at, enqueued_at) "
+            "VALUES (?, ?, 'queued', ?, ?)",
+            (search_key, json.dumps(search_params), time.time(), time.time()),
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def lease(self, owner, lease_seconds):
+        """
+        Take the oldest available job, including jobs whose lease expired.
+
+        A job with an expired lease that used up its attempts is marked as failed instead.
+
+        Parameters:
+        owner (str): The id of the leasing worker.
+        lease_seconds (float): How long the job stays leased without an extend().
+
+        Returns:
+        Job: The leased job, or None if no job is available.
+        """
+        connection = self._connection()
+        with transaction(connection):
+            now = time.time()
+            while True:
+                row = connection.execute(
+                    "SELECT job_id, search_key, search_params, attempts, state FROM jobs "
+                    "WHERE state = 'queued' AND available_at <= ? ORDER BY available_at, job_id LIMIT 1",
+                    (now,),
+                ).fetchone() or connection.execute(
+                    "SELECT job_id, search_key, search_params, attempts, state FROM jobs "
+                    "WHERE state = 'leased' AND lease_expires <= ? ORDER BY lease_expires LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    return None
+
+                job_id, search_key, search_params, attempts, state = row
+                if state == "leased":
+                    if attempts >= self.max_attempts:
+                        self._finish(connection, job_id, "failed", error="lease expired")
+                        logger.error(f"Job {job_id} of search {search_key} given up, its lease expired {attempts} times")
+                        continue
+                    logger.warning(f"Lease of job {job_id} of search {search_key} expired, reclaiming it")
+
+                connection.execute(
+                    "UPDATE jobs SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE job_id = ?",
+                    (owner, now + lease_seconds, job_id),
+                )
+                return Job(job_id, search_key, json.loads(search_params), attempts + 1)
+
+    def extend(self, job_id, owner, lease_seconds):
+        """
+        Extend the lease of a running job.
+
+        Parameters:
+        job_id (int): The id of the job.
+        owner (str): The id of the worker holding the lease.
+        lease_seconds (float): The new lease duration from now.
+
+        Returns:
+        bool: False if the lease was lost, e.g. because it expired and another worker took the job.
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND lease_owner = ? AND state = 'leased'",
+            (time.time() + lease_seconds, job_id, owner),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, owner, result):
+        """
+        Mark a leased job as done.
+
+        Parameters:
+        job_id (int): The id of the job.
+        owner (str): The id of the worker holding the lease.
+        result (dict): The JSON-serializable result handed to the coordinator.
+
+        Returns:
+        bool: False if the lease was lost and the result discarded.
+        """
+        connection = self._connection()
+        with transaction(connection):
+            if not self._owns(connection, job_id, owner):
+                return False
+            self._finish(connection, job_id, "done", result=json.dumps(result))
+        return True
+
+    def fail(self, job_id, owner, error):
+        """
+        Requeue a leased job after a failure, or give it up once it used up its attempts.
+
+        Parameters:
+        job_id (int): The id of the job.
+        owner (str): The id of the worker holding the lease.
+        error (str): The reason of the failure.
+
+        Returns:
+        bool: True if the job will be retried.
+        """
+        connection = self._connection()
+        with transaction(connection):
+            if not self._owns(connection, job_id, owner):
+                return False
+            attempts, = connection.execute("SELECT attempts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if attempts >= self.max_attempts:
+                self._finish(connection, job_id, "failed", error=error)
+                return False
+            connection.execute(
+                "UPDATE jobs SET state = 'queued', lease_owner = NULL, lease_expires = NULL, available_at = ?, "
+                "error = ? WHERE job_id = ?",
+                (time.time() + self.retry_delay * 2 ** (attempts - 1), error, job_id),
+            )
+        return True
+
+    def release(self, job_id, owner):
+        """
+        Put a leased job back without counting the attempt, e.g. when its worker shuts down.
+
+        Parameters:
+        job_id (int): The id of the job.
+        owner (str): The id of the worker holding the lease.
+        """
+        self._connection().execute(
+            "UPDATE jobs SET state = 'queued', lease_owner = NULL, lease_expires = NULL, available_at = ?, "
+            "attempts = attempts - 1 WHERE job_id = ? AND lease_owner = ? AND state = 'leased'",
+            (time.time(), job_id, owner),
+        )
+
+    def release_owner(self, owner):
+        """
+        Make the jobs of a worker known to be dead available at once, instead of after their lease.
+
+        The attempt still counts, in case the job itself killed the worker.
+
+        Parameters:
+        owner (str): The id of the dead worker.
+
+        Returns:
+        int: The number of released jobs.
+        """
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires = ? WHERE lease_owner = ? AND state = 'leased'",
+            (time.time(), owner),
+        )
+        return cursor.rowcount
+
+    def _owns(self, connection, job_id, owner):
+        """
+        Check that a worker still holds the lease of a job.
+        """
+        return connection.execute(
+            "SELECT 1 FROM jobs WHERE job_id = ? AND lease_owner = ? AND state = 'leased'", (job_id, owner)
+        ).fetchone() is not None
+
+    def _finish(self, connection, job_id, state, result=None, error=None):
+        """
+        Move a job to a final state.
+        """
+        connection.execute(
+            "UPDATE jobs SET state = ?, lease_expires = NULL, finished_at = ?, result = ?, error = ? WHERE job_id = ?",
+            (state, time.time(), result, error, job_id),
+        )
+
+    def collect_finished(self):
+        """
+        Remove the done and failed jobs from the queue.
+
+        Returns:
+        list: FinishedJob tuples in the order the jobs finished.
+        """
+        connection = self._connection()
+        with transaction(connection):
+            rows = connection.execute(
+                "SELECT job_id, search_key, state, attempts, result, error FROM jobs "
+                "WHERE state IN ('done', 'failed') ORDER BY finished_at"
+            ).fetchall()
+            connection.execute("DELETE FROM jobs WHERE state IN ('done', 'failed')")
+        return [
+            FinishedJob(job_id, search_key, state, attempts, json.loads(result) if result else None, error)
+            for job_id, search_key, state, attempts, result, error in rows
+        ]
+
+    def pending_count(self):
+        """
+        Returns:
+        int: The number of queued and running jobs.
+        """
+        count, = self._connection().execute("SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'leased')").fetchone()
+        return count
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
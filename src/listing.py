@@ -0,0 +1,140 @@
+import re
+
+# Currency symbols recognized in price texts, besides ISO 4217 codes
+CURRENCY_SYMBOLS = {
+    "€": "EUR",
+    "$": "USD",
+    "£": "GBP",
+    "¥": "JPY",
+    "₹": "INR",
+    "₽": "RUB",
+    "₺": "TRY",
+    "zł": "PLN",
+    "Fr.": "CHF",
+}
+
+# Active ISO 4217 currency codes; other words of three capitals ("VAT", "OBO", "NEW") are not currencies
+CURRENCY_CODES = frozenset("""
+    AED AFN ALL AMD ANG AOA ARS AUD AWG AZN BAM BBD BDT BGN BHD BIF BMD BND BOB BRL BSD BTN BWP BYN BZD
+    CAD CDF CHF CLP CNY COP CRC CUP CVE CZK DJF DKK DOP DZD EGP ERN ETB EUR FJD FKP GBP GEL GHS GIP GMD
+    GNF GTQ GYD HKD HNL HTG HUF IDR ILS INR IQD IRR ISK JMD JOD JPY KES KGS KHR KMF KPW KRW KWD KYD KZT
+    LAK LBP LKR LRD LSL LYD MAD MDL MGA MKD MMK MNT MOP MRU MUR MVR MWK MXN MYR MZN NAD NGN NIO NOK NPR
+    NZD OMR PAB PEN PGK PHP PKR PLN PYG QAR RON RSD RUB RWF SAR SBD SCR SDG SEK SGD SHP SLE SLL SOS SRD
+    SSP STN SVC SYP SZL THB TJS TMT TND TOP TRY TTD TWD TZS UAH UGX USD UYU UZS VES VND VUV WST XAF XCD
+    XCG XOF XPF YER ZAR ZMW ZWG
+""".split())
+
+_CURRENCY_CODE = re.compile(r"\b[A-Z]{3}\b")
+_NUMBER = re.compile(r"\d[\d.,'\s]*")
+
+def parse_price(text):
+    """
+    Normalize a scraped price text to an amount in cents and a currency code.
+
+    Thousands separators (".", ",", "'", spaces) are told apart from the decimal separator
+    by position: a separator followed by one or two trailing digits is the decimal one.
+    Examples: "10.148 EUR" -> (1014800, "EUR"), "$1,234.50" -> (123450, "USD"),
+    "1 234,5 €" -> (123450, "EUR"), "Price on request" -> (None, None).
+    Only ISO 4217 codes in CURRENCY_CODES are currencies, so "1.500 OBO" -> (150000, None).
+
+    Parameters:
+    text (str): The price as shown on the page.
+
+    Returns:
+    tuple: The amount in cents or None, and the ISO 4217 currency code or None.
+    """
+    match = _NUMBER.search(text)
+
+    # Symbols first, then the ISO 4217 code right after the number, right before it, or anywhere
+    currency = None
+    for symbol, symbol_code in CURRENCY_SYMBOLS.items():
+        if symbol in text:
+            currency = symbol_code
+            break
+    else:
+        codes = [code for code in _CURRENCY_CODE.finditer(text) if code.group() in CURRENCY_CODES]
+        if match is not None:
+            number_end = match.start() + len(match.group().rstrip().rstrip(".,'"))
+            after = [code for code in codes if code.start() >= number_end and not text[number_end:code.start()].strip()]
+            before = [code for code in codes if code.end() <= match.start() and not text[code.end():match.start()].strip()]
+            codes = after + before + codes
+        if codes:
+            currency = codes[0].group()
+
+    if match is None:
+        return None, currency
+    number = match.group().rstrip().rstrip(".,'")
+
+    integer, fraction = number, ""
+    decimal_position = max(number.rfind("."), number.rfind(","))
+    if decimal_position >= 0:
+        decimals = number[decimal_position + 1:]
+        separator = number[decimal_position]
+        if len(decimals) in (1, 2) and decimals.isdigit() and number.count(separator) == 1:
+            integer, fraction = number[:decimal_position], decimals
+
+    digits = "".join(character for character in integer if character.isdigit())
+    return int(digits) * 100 + int(fraction.ljust(2, "0") or 0), currency
+
+class Listing:
+    """
+    A scraped listing.
+
+    The price is kept as shown on the page, for display and change detection, and
+    normalized to integer cents and a currency code for filtering and sorting.
+    """
+    __slots__ = ("title", "price", "url", "price_cents", "currency", "image_url")
+
+    def __init__(self, title, price, url=None, price_cents=None, currency=None, image_url=None):
+        """
+        Initialize the Listing; use from_text() to parse the normalized price.
+
+        Parameters:
+        title (str): The listing title.
+        price (str): The price text as shown on the page.
+        url (str): The absolute URL of the listing, or None.
+        price_cents (int): The price in cents, or None if it could not be parsed.
+        currency (str): The ISO 4217 currency code, or None if unknown.
+        image_url (str): The absolute URL of the listing image, or None.
+        """
+        self.title = title
+        self.price = price
+        self.url = url
+        self.price_cents = price_cents
+        self.currency = currency
+        self.image_url = image_url
+
+    @classmethod
+    def from_text(cls, title, price, url=None, image_url=None):
+        """
+        Create a listing from scraped texts, normalizing the price.
+
+        Parameters:
+        title (str): The listing title.
+        price (str): The price text as shown on the page.
+        url (str): The absolute URL of the listing, or None.
+        image_url (str): The absolute URL of the listing image, or None.
+
+        Returns:
+        Listing: The listing.
+        """
+        price_cents, currency = parse_price(price)
+        return cls(title, price, url, price_cents, currency, image_url)
+
+    def to_dict(self):
+        """
+        Returns:
+        dict: The fields of the listing, for JSON and similar exports.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        if not isinstance(other, Listing):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((self.title, self.price, self.url))
+
+    def __repr__(self):
+        return f"Listing(title={self.title!r}, price={self.price!r}, url={self.url!r})"
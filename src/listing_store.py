@@ -0,0 +1,301 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from collections import namedtuple
+from listing import Listing, parse_price
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default location of the listing database
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "listings.db")
+
+# Result of applying one search run to the store; duplicates are the new listings
+# found to repeat an earlier one, filled in by the search pipeline
+ListingDiff = namedtuple("ListingDiff", ["new", "changed", "disappeared", "duplicates"], defaults=((),))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    search_key TEXT NOT NULL,
+    listing_key TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    title TEXT NOT NULL,
+    price TEXT NOT NULL,
+    url TEXT,
+    price_cents INTEGER,
+    currency TEXT,
+    image_url TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    disappeared_at REAL,
+    PRIMARY KEY (search_key, listing_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_listings_content_hash ON listings (content_hash);
+CREATE INDEX IF NOT EXISTS idx_listings_active ON listings (search_key, disappeared_at);
+"""
+
+# Columns of the listings returned in a ListingDiff
+LISTING_COLUMNS = "title, price, url, price_cents, currency, image_url"
+
+def listing_key(listing):
+    """
+    Get the key identifying a listing across runs.
+
+    Parameters:
+    listing (Listing): A scraped listing.
+
+    Returns:
+    str: The listing URL, or the content hash if it has no link.
+    """
+    return listing.url or content_hash(listing)
+
+def content_hash(listing):
+    """
+    Hash the scraped fields of a listing to detect changes.
+
+    Parameters:
+    listing (Listing): A scraped listing.
+
+    Returns:
+    str: The hex digest of the title, price and URL.
+    """
+    content = "\x1f".join((listing.title, listing.price, listing.url or ""))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+class ListingStore:
+    """
+    SQLite-backed store of every listing seen per search, used to diff consecutive runs.
+
+    Each thread gets its own connection; the database runs in WAL mode so concurrent
+    searches can write while others read.
+    """
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        Initialize the ListingStore and create the schema if needed.
+
+        Parameters:
+        path (str): The path of the SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        self._migrate(connection)
+
+    def _migrate(self, connection):
+        """
+        Add the normalized price and image columns to databases created before they existed.
+        """
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(listings)")}
+        if "image_url" not in columns:
+            connection.execute("ALTER TABLE listings ADD COLUMN image_url TEXT")
+        if "price_cents" in columns:
+            return
+        with transaction(connection):
+            connection.execute("ALTER TABLE listings ADD COLUMN price_cents INTEGER")
+            connection.execute("ALTER TABLE listings ADD COLUMN currency TEXT")
+            prices = connection.execute("SELECT DISTINCT price FROM listings").fetchall()
+            connection.executemany(
+                "UPDATE listings SET price_cents = ?, currency = ? WHERE price = ?",
+                [parse_price(price) + (price,) for price, in prices],
+            )
+        logger.info(f"Added normalized prices to {self.path}")
+
+    def _connection(self):
+        """
+        Get the connection of the calling thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = open_connection(self.path)
+            connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS run ("
+                "listing_key TEXT PRIMARY KEY, content_hash TEXT, title TEXT, price TEXT, url TEXT, "
+                "price_cents INTEGER, currency TEXT, image_url TEXT)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def is_known(self, search_key, listing):
+        """
+        Check whether a listing was stored by an earlier run and has not changed since.
+
+        Parameters:
+        search_key (str): The key of the search.
+        listing (Listing): A scraped listing.
+
+        Returns:
+        bool: True if the listing is stored with the same content.
+        """
+        row = self._connection().execute(
+            "SELECT content_hash FROM listings WHERE search_key = ? AND listing_key = ?",
+            (search_key, listing_key(listing)),
+        ).fetchone()
+        return row is not None and row[0] == content_hash(listing)
+
+    def apply_run(self, search_key, listings, complete):
+        """
+        Store the listings of a search run and compute what changed since the previous run.
+
+        All rows are written with one bulk upsert inside a single transaction.
+
+        Parameters:
+        search_key (str): The key of the search.
+        listings (list): The listings found by the run.
+        complete (bool): True if the run crawled every result page; only then can
+        stored listings missing from the run be reported as disappeared.
+
+        Returns:
+        ListingDiff: The new, changed and disappeared listings as Listing objects.
+        """
+        now = time.time()
+        rows = {}
+        for listing in listings:
+            rows[listing_key(listing)] = (
+                content_hash(listing), listing.title, listing.price, listing.url, listing.price_cents, listing.currency,
+                listing.image_url,
+            )
+
+        connection = self._connection()
+        with transaction(connection):
+            connection.execute("DELETE FROM run")
+            connection.executemany(
+                "INSERT INTO run VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(key,) + row for key, row in rows.items()],
+            )
+
+            diff_rows = connection.execute(
+                "SELECT run.title, run.price, run.url, run.price_cents, run.currency, run.image_url, "
+                "listings.content_hash IS NULL "
+                "FROM run LEFT JOIN listings "
+                "ON listings.search_key = ? AND listings.listing_key = run.listing_key "
+                "WHERE listings.content_hash IS NULL OR listings.content_hash != run.content_hash",
+                (search_key,),
+            ).fetchall()
+            new = [Listing(*row[:-1]) for row in diff_rows if row[-1]]
+            changed = [Listing(*row[:-1]) for row in diff_rows if not row[-1]]
+
+            disappeared = []
+            if complete:
+                disappeared_rows = connection.execute(
+                    f"SELECT listing_key, {LISTING_COLUMNS} FROM listings "
+                    "WHERE search_key = ? AND disappeared_at IS NULL "
+                    "AND listing_key NOT IN (SELECT listing_key FROM run)",
+                    (search_key,),
+                ).fetchall()
+                disappeared = [Listing(*row[1:]) for row in disappeared_rows]
+                connection.executemany(
+                    "UPDATE listings SET disappeared_at = ? WHERE search_key = ? AND listing_key = ?",
+                    [(now, search_key, row[0]) for row in disappeared_rows],
+                )
+
+            # "WHERE true" disambiguates the upsert clause from a join constraint
+            connection.execute(
+                "INSERT INTO listings (search_key, listing_key, content_hash, title, price, url, price_cents, currency, "
+                "image_url, first_seen, last_seen) "
+                "SELECT ?, listing_key, content_hash, title, price, url, price_cents, currency, image_url, ?, ? "
+                "FROM run WHERE true "
+                "ON CONFLICT (search_key, listing_key) DO UPDATE SET "
+                "content_hash = excluded.content_hash, title = excluded.title, price = excluded.price, "
+                "url = excluded.url, price_cents = excluded.price_cents, currency = excluded.currency, "
+                "image_url = excluded.image_url, "
+                "last_seen = excluded.last_seen, disappeared_at = NULL",
+                (search_key, now, now),
+            )
+            connection.execute("DELETE FROM run")
+
+        logger.info(
+            f"Search {search_key}: {len(new)} new, {len(changed)} changed, {len(disappeared)} disappeared listings"
+        )
+        return ListingDiff(new, changed, disappeared)
+
+    def mark_disappeared(self, search_key, seen_since):
+        """
+        Mark the stored listings of a search that were not seen since a run started as disappeared.
+
+        Completes a run stored in parts with apply_run(..., complete=False), e.g. one part per
+        site, once every part was crawled completely.
+
+        Parameters:
+        search_key (str): The key of the search.
+        seen_since (float): The time.time() at which the run started.
+
+        Returns:
+        list: The disappeared listings as Listing objects.
+        """
+        now = time.time()
+        connection = self._connection()
+        with transaction(connection):
+            rows = connection.execute(
+                f"SELECT {LISTING_COLUMNS} FROM listings "
+                "WHERE search_key = ? AND disappeared_at IS NULL AND last_seen < ?",
+                (search_key, seen_since),
+            ).fetchall()
+            connection.execute(
+                "UPDATE listings SET disappeared_at = ? "
+                "WHERE search_key = ? AND disappeared_at IS NULL AND last_seen < ?",
+                (now, search_key, seen_since),
+            )
+        if rows:
+            logger.info(f"Search {search_key}: {len(rows)} disappeared listings")
+        return [Listing(*row) for row in rows]
+
+    def active_listings(self):
+        """
+        Get every listing that has not disappeared, e.g. to show the current results.
+
+        Returns:
+        list: (search_key, Listing) tuples ordered by when the listings were first seen.
+        """
+        rows = self._connection().execute(
+            f"SELECT search_key, {LISTING_COLUMNS} FROM listings WHERE disappeared_at IS NULL ORDER BY first_seen"
+        ).fetchall()
+        return [(row[0], Listing(*row[1:])) for row in rows]
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+def open_connection(path, check_same_thread=True):
+    """
+    Open a connection to a listing database, in autocommit mode with WAL journaling.
+
+    Parameters:
+    path (str): The path of the SQLite database file.
+    check_same_thread (bool): False for a connection shared by several threads under a lock of the caller.
+
+    Returns:
+    sqlite3.Connection: The connection; transactions are opened explicitly with transaction().
+    """
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=check_same_thread)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+class transaction:
+    """
+    Context manager wrapping a block in BEGIN IMMEDIATE ... COMMIT, rolling back on errors.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        # Take the write lock up front so concurrent writers wait instead of failing mid-transaction
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        return False
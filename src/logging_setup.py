@@ -0,0 +1,201 @@
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import time
+
+# Default location of the application log
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(__file__), "data", "application.log")
+
+# Default logging settings, overridable through the "logging" section of config.json
+DEFAULT_SETTINGS = {
+    "level": "INFO",
+    "max_bytes": 5 * 1024 * 1024,  # Rotate once the log reaches this size, 0 to disable
+    "rotate_days": 1,              # Also rotate a log older than this many days, 0 to disable
+    "backup_count": 5,             # Rotated segments to keep
+    "compress": True,              # Gzip rotated segments
+}
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# The listener writing queued records, while logging is configured
+_listener = None
+_queue = None
+
+class RotatingLogFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotates the log when it grows too large or too old, optionally gzipping old segments.
+    """
+    def __init__(self, path, max_bytes=0, rotate_days=0, backup_count=0, compress=False):
+        """
+        Initialize the RotatingLogFileHandler.
+
+        Parameters:
+        path (str): The log file.
+        max_bytes (int): Size that triggers a rotation, or 0.
+        rotate_days (float): Age in days that triggers a rotation, or 0.
+        backup_count (int): Rotated segments to keep.
+        compress (bool): Whether to gzip rotated segments.
+        """
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.max_age = rotate_days * 24 * 60 * 60
+        # The last write of a log left by a previous run bounds the age of its segment
+        self.opened_at = time.time()
+        if os.path.getsize(self.baseFilename):
+            self.opened_at = min(self.opened_at, os.path.getmtime(self.baseFilename))
+        if compress:
+            self.namer = lambda name: name + ".gz"
+            self.rotator = self.gzip_rotator
+
+    @staticmethod
+    def gzip_rotator(source, dest):
+        """
+        Compress the finished log segment into its rotated name.
+        """
+        with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        os.remove(source)
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() - self.opened_at >= self.max_age:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.opened_at = time.time()
+
+def configure_logging(path=DEFAULT_LOG_PATH, settings=None):
+    """
+    Route all logging through a queue to a background thread writing the log.
+
+    Logging calls only enqueue the record, so they never block on disk. The file handler
+    runs on the QueueListener thread, which also rotates and compresses the log.
+
+    Parameters:
+    path (str): The log file, or None to log to stderr.
+    settings (dict): The "logging" section of the config, or None for the defaults.
+
+    Returns:
+    logging.handlers.QueueListener: The running listener; it is stopped at exit.
+    """
+    global _listener, _queue
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    stop_logging()
+
+    if path is None:
+        handler = logging.StreamHandler()
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        handler = RotatingLogFileHandler(
+            path,
+            max_bytes=settings["max_bytes"],
+            rotate_days=settings["rotate_days"],
+            backup_count=settings["backup_count"],
+            compress=settings["compress"],
+        )
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _queue = queue.Queue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(_queue))
+    root.setLevel(str(settings["level"]).upper())
+
+    _listener = logging.handlers.QueueListener(_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def flush_logging():
+    """
+    Wait until every record logged so far has been written.
+    """
+    if _listener is not None and _listener._thread is not None:
+        _queue.join()
+
+def stop_logging():
+    """
+    Write the pending records and stop the listener thread.
+    """
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+atexit.register(stop_logging)
+
+class ForwardingHandler(logging.Handler):
+    """
+    Hands records received from another process to the logger they were logged with.
+    """
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+def configure_child_logging(log_queue, level=DEFAULT_SETTINGS["level"]):
+    """
+    Send the records of a child process to its parent, see forward_child_logging().
+
+    Parameters:
+    log_queue (multiprocessing.Queue): The queue shared with the parent.
+    level (str): The logging level.
+    """
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(str(level).upper())
+
+def forward_child_logging(log_queue):
+    """
+    Log the records child processes put on a queue through the logging of this process.
+
+    Parameters:
+    log_queue (multiprocessing.Queue): The queue shared with the children.
+
+    Returns:
+    logging.handlers.QueueListener: The running listener; stop it after the children exited.
+    """
+    listener = logging.handlers.QueueListener(log_queue, ForwardingHandler())
+    listener.start()
+    return listener
+
+def tail_lines(path, count=1000, block_size=8192):
+    """
+    Read the last lines of a file by seeking backwards from its end.
+
+    Only the blocks holding the requested lines are read, so the cost does not depend
+    on the size of the file.
+
+    Parameters:
+    path (str): The file to read.
+    count (int): The number of lines to return.
+    block_size (int): Bytes read per backwards step.
+
+    Returns:
+    str: The last `count` lines.
+
+    Raises:
+    FileNotFoundError: If the file does not exist.
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        blocks = []
+        # One extra newline is needed to know the first returned line is complete
+        newlines = 0
+        while position > 0 and newlines <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+
+    data = b"".join(reversed(blocks))
+    lines = data.splitlines(keepends=True)[-count:] if count > 0 else []
+    return b"".join(lines).decode("utf-8", errors="replace")
@@ -1,29 +1,26 @@
-import os
 import sys
 import logging
-import sentry_sdk
+import metrics
+import threading
 
+from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
+from config_service import ConfigService
+from logging_setup import configure_logging
 from ui_window_manager import WindowManager
-from bug_reporting import exception_hook
+from bug_reporting import exception_hook, init_sentry
 
-# Initialize Sentry once in your application's entry point
-sentry_sdk.init(dsn="https://cf091345c1c0562686b5b85b3c64cb31@o4508930992439296.ingest.de.sentry.io/4508930996699216", traces_sample_rate=1.0)
+try:
+    config = ConfigService().get()
+except (OSError, ValueError):
+    config = {}
 
-# Ensure the 'data' directory exists
-log_dir = "data"
-log_file = os.path.join(log_dir, "application.log")
+# Sentry is initialized once in main(), after the window is shown; performance tracing is off
+# unless the "metrics" section of the config sets a traces sample rate
+metrics_settings = {**metrics.DEFAULT_SETTINGS, **config.get('metrics', {})}
 
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)  # Create the directory if it does not exist
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    filename=log_file,  # Single log file for all modules
-    filemode="a",  # Append mode
-)
+# Configure logging; records are written to data/application.log by a background thread
+configure_logging(settings=config.get('logging'))
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +47,12 @@ def main():
     # Begin running the window manager to show and manage the app's windows.
     window_manager.run()
 
+    # Import and initialize Sentry in the background once the window has been painted;
+    # the exception hook initializes it right away if an error comes first.
+    QTimer.singleShot(0, lambda: threading.Thread(
+        target=init_sentry, args=(metrics_settings['sentry_traces_sample_rate'],),
+        name="sentry-init", daemon=True).start())
+
     # Execute the main Qt event loop, which processes user inputs and updates the GUI.
     sys.exit(app.exec())
 
@@ -0,0 +1,316 @@
+import bisect
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default metrics settings, overridable through the "metrics" section of config.json
+DEFAULT_SETTINGS = {
+    "sample_rate": 1.0,                 # Fraction of search runs whose phases are timed
+    "sentry_traces_sample_rate": 0.0,   # traces_sample_rate of Sentry; sampled runs become transactions
+    "export_path": None,                # Written on shutdown; .json for JSON, anything else for Prometheus text
+}
+
+# Upper bounds in seconds of the phase duration histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Whether the phases of the current search run are timed; None outside of a run
+_run_sampled = contextvars.ContextVar("run_sampled", default=None)
+
+class Counter:
+    """
+    A monotonically increasing count.
+    """
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"value": self.value}
+
+class Histogram:
+    """
+    Counts observations into cumulative buckets, Prometheus style.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, total = [], 0
+            for count in self.bucket_counts:
+                total += count
+                cumulative.append(total)
+            return {
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+                "count": self.count,
+                "sum": self.sum,
+            }
+
+def escape_label(value):
+    """
+    Escape a label value for the Prometheus text format.
+    """
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+class MetricsRegistry:
+    """
+    In-process registry of labelled counters and histograms.
+
+    Metrics are created on first use and identified by their name and label values.
+    The registry is thread-safe.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._help = {}
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+
+    def _get(self, metric_type, name, help_text, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = metric_type()
+                self._help.setdefault(name, (metric_type, help_text))
+            return metric
+
+    def counter(self, name, help_text="", **labels):
+        """
+        Get a counter.
+
+        Parameters:
+        name (str): The metric name.
+        help_text (str): The description exported with the metric.
+        labels: The label values identifying the series.
+
+        Returns:
+        Counter: The counter of the series.
+        """
+        return self._get(Counter, name, help_text, labels)
+
+    def histogram(self, name, help_text="", **labels):
+        """
+        Get a histogram.
+
+        Parameters:
+        name (str): The metric name.
+        help_text (str): The description exported with the metric.
+        labels: The label values identifying the series.
+
+        Returns:
+        Histogram: The histogram of the series.
+        """
+        return self._get(Histogram, name, help_text, labels)
+
+    def clear(self):
+        """
+        Drop every metric.
+        """
+        with self._lock:
+            self._metrics.clear()
+            self._help.clear()
+
+    def to_json(self):
+        """
+        Export every metric as a JSON-serializable dict.
+
+        Returns:
+        dict: Maps each metric name to its type, help and the snapshot of every series.
+        """
+        with self._lock:
+            items = sorted(self._metrics.items())
+            help_texts = dict(self._help)
+        exported = {}
+        for (name, labels), metric in items:
+            metric_type, help_text = help_texts[name]
+            entry = exported.setdefault(name, {"type": metric_type.__name__.lower(), "help": help_text, "series": []})
+            entry["series"].append({"labels": dict(labels), **metric.snapshot()})
+        return exported
+
+    def to_prometheus(self):
+        """
+        Export every metric in the Prometheus text exposition format.
+
+        Returns:
+        str: The exposition text.
+        """
+        def format_labels(labels, **extra):
+            pairs = [*labels, *extra.items()]
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+        lines = []
+        for name, entry in self.to_json().items():
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            for series in entry["series"]:
+                labels = sorted(series["labels"].items())
+                if entry["type"] == "counter":
+                    lines.append(f"{name}{format_labels(labels)} {series['value']}")
+                    continue
+                for bound, count in series["buckets"].items():
+                    lines.append(f"{name}_bucket{format_labels(labels, le=bound)} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {series['sum']}")
+                lines.append(f"{name}_count{format_labels(labels)} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        Write every metric to a file, as JSON if the path ends in .json and as Prometheus text otherwise.
+
+        Parameters:
+        path (str): The target file; it is replaced atomically.
+        """
+        if path.endswith(".json"):
+            content = json.dumps(self.to_json(), indent=4)
+        else:
+            content = self.to_prometheus()
+        with self._export_lock:
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+
+# The registry the search pipeline reports to
+registry = MetricsRegistry()
+
+# Current sampling settings
+_settings = dict(DEFAULT_SETTINGS)
+
+def configure(settings=None):
+    """
+    Apply the "metrics" section of the config.
+
+    Parameters:
+    settings (dict): The "metrics" section of the config, or None for the defaults.
+    """
+    global _settings
+    _settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+def get_settings():
+    """
+    Returns:
+    dict: The current metrics settings.
+    """
+    return dict(_settings)
+
+def _sentry():
+    """
+    Get the Sentry SDK if the application initialized it; it is never imported here,
+    so processes without Sentry do not pay for loading it.
+    """
+    sentry_sdk = sys.modules.get("sentry_sdk")
+    if sentry_sdk is not None and sentry_sdk.is_initialized():
+        return sentry_sdk
+    return None
+
+def is_sampled():
+    """
+    Decide whether the current phase is timed.
+
+    Within a search run every phase follows the decision taken for the run; outside of
+    a run every phase is sampled on its own.
+
+    Returns:
+    bool: True if the phase should be recorded.
+    """
+    sampled = _run_sampled.get()
+    if sampled is None:
+        return random.random() < _settings["sample_rate"]
+    return sampled
+
+@contextlib.contextmanager
+def traced_run(name):
+    """
+    Mark the code inside as one search run, taking its sampling decision once.
+
+    When Sentry tracing is enabled, sampled runs also start a transaction with every
+    phase as a span; Sentry sends it at its own traces_sample_rate.
+
+    Parameters:
+    name (str): The transaction name, e.g. the search key.
+    """
+    sampled = random.random() < _settings["sample_rate"]
+    token = _run_sampled.set(sampled)
+    try:
+        sentry_sdk = _sentry() if sampled and _settings["sentry_traces_sample_rate"] > 0 else None
+        if sentry_sdk is None:
+            yield
+        else:
+            with sentry_sdk.start_transaction(op="search", name=name):
+                yield
+    finally:
+        _run_sampled.reset(token)
+
+@contextlib.contextmanager
+def timed(phase):
+    """
+    Record the duration of a pipeline phase in the search_phase_seconds histogram.
+
+    Parameters:
+    phase (str): The phase name, e.g. "download" or "parse".
+    """
+    if not is_sampled():
+        yield
+        return
+
+    with contextlib.ExitStack() as stack:
+        # Phases of a run traced by Sentry become spans of its transaction
+        sentry_sdk = _sentry()
+        if sentry_sdk is not None and sentry_sdk.get_current_span() is not None:
+            stack.enter_context(sentry_sdk.start_span(op=phase))
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            registry.histogram("search_phase_seconds", "Duration of the phases of a search cycle", phase=phase) \
+                .observe(time.perf_counter() - start)
+
+def observe(phase, seconds):
+    """
+    Record a phase duration measured by the caller, e.g. summed over interleaved steps.
+
+    Parameters:
+    phase (str): The phase name, e.g. "download" or "parse".
+    seconds (float): The duration of the phase.
+    """
+    if is_sampled():
+        registry.histogram("search_phase_seconds", "Duration of the phases of a search cycle", phase=phase) \
+            .observe(seconds)
+
+def count(name, help_text="", amount=1, **labels):
+    """
+    Increment a counter of the shared registry; counters are cheap and never sampled.
+
+    Parameters:
+    name (str): The metric name.
+    help_text (str): The description exported with the metric.
+    amount (int): The increment.
+    labels: The label values identifying the series.
+    """
+    registry.counter(name, help_text, **labels).inc(amount)
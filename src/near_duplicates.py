@@ -0,0 +1,355 @@
+import hashlib
+import logging
+import math
+import random
+import re
+import threading
+import time
+import zlib
+
+from array import array
+from collections import namedtuple
+from listing_store import DEFAULT_DB_PATH, listing_key, open_connection, transaction
+from optional_dependencies import lazy_import
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default detection settings, overridable through the "duplicates" section of config.json
+DEFAULT_SETTINGS = {
+    "enabled": False,          # Check the new listings of every run against every listing seen before
+    "action": "suppress",      # "suppress" to not notify near-duplicates, "notify" to only record their group
+    "threshold": 0.75,         # Minimum estimated similarity of the title and price shingles
+    "price_tolerance": 0.05,   # Maximum relative price difference of near-duplicates in the same currency
+}
+
+# MinHash signature length and its split into LSH bands. With 16 bands of 4 rows, listings
+# with a similarity of 0.75 become candidates with a probability above 99.7%, those with
+# 0.3 with under 13%; candidates are then compared on their full signatures.
+PERMUTATIONS = 64
+BANDS = 16
+
+# Length of the character shingles of a title
+SHINGLE_SIZE = 4
+
+# Relative width of the price ranges a price is shingled into
+PRICE_STEP = 0.05
+
+# Candidates compared per listing, bounding the cost of overcrowded buckets
+MAX_CANDIDATES = 200
+
+# Mersenne prime of the permutation hashes; with 32-bit shingle hashes and coefficients
+# below it, a * hash + b never overflows 64 bits, so NumPy and pure Python agree exactly
+PRIME = (1 << 31) - 1
+
+# Stored with the index; signatures computed with other parameters cannot be compared
+INDEX_VERSION = f"minhash-{PERMUTATIONS}-{BANDS}-{SHINGLE_SIZE}"
+
+# The permutations are seeded so that every process computes the same signatures
+_random = random.Random(20240601)
+_PERMUTATIONS = [(_random.randrange(1, PRIME), _random.randrange(0, PRIME)) for _ in range(PERMUTATIONS)]
+del _random
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# A new listing found to be a near-duplicate of a listing seen before
+DuplicateMatch = namedtuple("DuplicateMatch", ["listing", "search_key", "listing_key", "similarity"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS near_duplicate_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS near_duplicate_signatures (
+    signature_id INTEGER PRIMARY KEY,
+    search_key TEXT NOT NULL,
+    listing_key TEXT NOT NULL,
+    group_id INTEGER,
+    price_cents INTEGER,
+    currency TEXT,
+    signature BLOB NOT NULL,
+    first_seen REAL NOT NULL,
+    UNIQUE (search_key, listing_key)
+);
+CREATE INDEX IF NOT EXISTS idx_near_duplicate_signatures_group ON near_duplicate_signatures (group_id);
+
+CREATE TABLE IF NOT EXISTS near_duplicate_buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    signature_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, signature_id)
+) WITHOUT ROWID;
+"""
+
+# The shared settings and the lock guarding their replacement
+_settings = dict(DEFAULT_SETTINGS)
+_lock = threading.Lock()
+
+def configure(settings=None):
+    """
+    Replace the shared detection settings.
+
+    Parameters:
+    settings (dict): The "duplicates" section of the config, or None for the defaults.
+    """
+    global _settings
+    with _lock:
+        _settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+def get_settings():
+    """
+    Returns:
+    dict: The shared detection settings.
+    """
+    with _lock:
+        return _settings
+
+def shingles(listing):
+    """
+    Break a listing into the set of features its similarity is measured on.
+
+    The title contributes its overlapping character shingles, ignoring case, punctuation
+    and spacing, so an edited word only changes the shingles around it.
+    The price contributes two tokens on a logarithmic scale, offset by half a step, so
+    close prices share at least one.
+
+    Parameters:
+    listing (Listing): The listing.
+
+    Returns:
+    set: The shingle strings.
+    """
+    title = _NON_WORD.sub("", listing.title.casefold())
+    result = {title[start:start + SHINGLE_SIZE] for start in range(max(1, len(title) - SHINGLE_SIZE + 1))}
+    if listing.price_cents:
+        # Prices in neighbouring half steps always share one of the two whole steps
+        half_step = int(math.log(listing.price_cents) / math.log1p(PRICE_STEP) * 2)
+        result.add(f"price:{listing.currency}:{half_step // 2}")
+        result.add(f"price:{listing.currency}:{(half_step + 1) // 2}+")
+    return result
+
+def minhash(features):
+    """
+    Compute the MinHash signature of a feature set.
+
+    The fraction of equal positions in two signatures estimates the Jaccard similarity
+    of their sets.
+
+    Parameters:
+    features (set): The shingle strings, see shingles().
+
+    Returns:
+    array: PERMUTATIONS unsigned 32-bit minimums.
+    """
+    hashes = [zlib.crc32(feature.encode("utf-8")) for feature in features] or [0]
+    np = _numpy()
+    if np is not None:
+        coefficients = np.array(_PERMUTATIONS, dtype=np.uint64)
+        values = np.array(hashes, dtype=np.uint64)
+        minimums = ((np.outer(values, coefficients[:, 0]) + coefficients[:, 1]) % PRIME).min(axis=0)
+        return array("I", minimums.astype(np.uint32).tobytes())
+    return array("I", [min((a * value + b) % PRIME for value in hashes) for a, b in _PERMUTATIONS])
+
+def similarity(signature, other):
+    """
+    Estimate the Jaccard similarity of the sets behind two signatures.
+
+    Returns:
+    float: The fraction of equal positions, between 0 and 1.
+    """
+    return sum(1 for a, b in zip(signature, other) if a == b) / PERMUTATIONS
+
+def band_buckets(signature):
+    """
+    Hash every band of a signature to the bucket it is indexed under.
+
+    Parameters:
+    signature (array): A MinHash signature.
+
+    Returns:
+    list: (band, bucket) tuples, the bucket as a signed 64-bit integer.
+    """
+    rows = PERMUTATIONS // BANDS
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest(),
+            "little", signed=True))
+        for band in range(BANDS)
+    ]
+
+def prices_match(price_cents, currency, other_cents, other_currency, tolerance):
+    """
+    Check whether two prices are close enough for their listings to be near-duplicates.
+
+    Prices in different currencies, or a missing price, never rule a match out; the
+    similarity of the titles decides alone.
+    """
+    if price_cents is None or other_cents is None or currency != other_currency:
+        return True
+    return abs(price_cents - other_cents) <= tolerance * max(price_cents, other_cents)
+
+def to_notify(listings, duplicate_keys):
+    """
+    Get the new listings to notify, without the near-duplicates if the settings suppress them.
+
+    Parameters:
+    listings (list): The new listings of a run.
+    duplicate_keys (set): The listing keys of the new listings found to be near-duplicates.
+
+    Returns:
+    list: The listings to notify.
+    """
+    if not duplicate_keys or get_settings()["action"] != "suppress":
+        return listings
+    return [listing for listing in listings if listing_key(listing) not in duplicate_keys]
+
+class NearDuplicateIndex:
+    """
+    Persistent locality-sensitive-hash index of the MinHash signatures of every listing seen.
+
+    Each signature is split into bands and indexed under the hash of every band, so
+    the candidates of a new listing are the listings sharing at least one bucket: a
+    few indexed lookups instead of a comparison with every listing ever seen. Only the
+    candidates are compared on their full signature and price. Near-duplicates join
+    the group of the listing they repeat, across searches and sites. The index shares
+    the listing database and is thread-safe in the same way as ListingStore.
+    """
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        Initialize the NearDuplicateIndex and create the schema if needed.
+
+        Parameters:
+        path (str): The path of the SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        self._check_version(connection)
+
+    def _check_version(self, connection):
+        """
+        Clear an index built with other signature parameters, whose signatures cannot be compared.
+        """
+        with transaction(connection):
+            row = connection.execute("SELECT value FROM near_duplicate_meta WHERE key = 'version'").fetchone()
+            if row is not None and row[0] == INDEX_VERSION:
+                return
+            if row is not None:
+                connection.execute("DELETE FROM near_duplicate_signatures")
+                connection.execute("DELETE FROM near_duplicate_buckets")
+                logger.warning(f"Cleared the near-duplicate index of {self.path}, built with {row[0]}")
+            connection.execute(
+                "INSERT OR REPLACE INTO near_duplicate_meta VALUES ('version', ?)", (INDEX_VERSION,)
+            )
+
+    def _connection(self):
+        """
+        Get the connection of the calling thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = open_connection(self.path)
+        return connection
+
+    def add(self, search_key, listings, threshold=DEFAULT_SETTINGS["threshold"],
+            price_tolerance=DEFAULT_SETTINGS["price_tolerance"]):
+        """
+        Index new listings, finding those that repeat a listing seen before.
+
+        The listings are indexed one by one, so near-duplicates within the batch are
+        found as well. Listings already indexed for the search are skipped.
+
+        Parameters:
+        search_key (str): The key of the search.
+        listings (list): The new Listing objects of a run.
+        threshold (float): Minimum estimated similarity of near-duplicates.
+        price_tolerance (float): Maximum relative price difference of near-duplicates.
+
+        Returns:
+        list: A DuplicateMatch with the most similar earlier listing for every near-duplicate.
+        """
+        now = time.time()
+        matches = []
+        connection = self._connection()
+        lookup = ("SELECT DISTINCT signature_id FROM near_duplicate_buckets WHERE "
+                  + " OR ".join(["(band = ? AND bucket = ?)"] * BANDS) + f" LIMIT {MAX_CANDIDATES}")
+        with transaction(connection):
+            for listing in listings:
+                key = listing_key(listing)
+                if connection.execute(
+                    "SELECT 1 FROM near_duplicate_signatures WHERE search_key = ? AND listing_key = ?",
+                    (search_key, key),
+                ).fetchone() is not None:
+                    continue
+                signature = minhash(shingles(listing))
+                buckets = band_buckets(signature)
+
+                candidate_ids = [row[0] for row in connection.execute(
+                    lookup, [value for bucket in buckets for value in bucket]
+                )]
+                candidates = connection.execute(
+                    "SELECT search_key, listing_key, group_id, price_cents, currency, signature "
+                    f"FROM near_duplicate_signatures WHERE signature_id IN ({', '.join('?' * len(candidate_ids))})",
+                    candidate_ids,
+                ).fetchall() if candidate_ids else []
+                best = None
+                for other_search, other_key, group_id, price_cents, currency, blob in candidates:
+                    if not prices_match(listing.price_cents, listing.currency, price_cents, currency, price_tolerance):
+                        continue
+                    score = similarity(signature, array("I", blob))
+                    if score >= threshold and (best is None or score > best[0]):
+                        best = (score, other_search, other_key, group_id)
+
+                signature_id = connection.execute(
+                    "INSERT INTO near_duplicate_signatures "
+                    "(search_key, listing_key, group_id, price_cents, currency, signature, first_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (search_key, key, best and best[3], listing.price_cents, listing.currency,
+                     signature.tobytes(), now),
+                ).lastrowid
+                if best is None:
+                    connection.execute(
+                        "UPDATE near_duplicate_signatures SET group_id = signature_id WHERE signature_id = ?",
+                        (signature_id,),
+                    )
+                else:
+                    matches.append(DuplicateMatch(listing, best[1], best[2], best[0]))
+                connection.executemany(
+                    "INSERT OR IGNORE INTO near_duplicate_buckets VALUES (?, ?, ?)",
+                    [(band, bucket, signature_id) for band, bucket in buckets],
+                )
+        return matches
+
+    def group(self, search_key, listing):
+        """
+        Get every listing in the near-duplicate group of a listing, itself included.
+
+        Parameters:
+        search_key (str): The key of the search.
+        listing (Listing): The listing.
+
+        Returns:
+        list: (search_key, listing_key) tuples in the order they were first seen, or an
+        empty list if the listing is not indexed.
+        """
+        rows = self._connection().execute(
+            "SELECT search_key, listing_key FROM near_duplicate_signatures WHERE group_id = ("
+            "SELECT group_id FROM near_duplicate_signatures WHERE search_key = ? AND listing_key = ?) "
+            "ORDER BY signature_id",
+            (search_key, listing_key(listing)),
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+# NumPy is optional and only speeds up signature computation
+_numpy = lazy_import("numpy")
@@ -0,0 +1,366 @@
+import logging
+import metrics
+import queue
+import smtplib
+import threading
+import time
+
+from collections import namedtuple
+from email.mime.text import MIMEText
+from sms import SMS_BACKENDS
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default dispatcher settings, overridable through the "notifications" section of config.json
+DEFAULT_SETTINGS = {
+    "email": None,               # Recipient of the email notifications
+    "phone": None,               # Recipient of the SMS notifications
+    "coalesce_seconds": 30.0,    # Listings arriving within this window are sent as one message
+    "max_retries": 3,            # Retries per sink after a failed send
+    "backoff_factor": 2.0,       # Sleeps 2s, 4s, 8s, ... between retries
+    "sms_backend": "twilio",     # "twilio", or "log" to only log the messages
+    "smtp": {},
+    "twilio": {},
+}
+
+# Default SMTP settings, overridable through the "smtp" entry of the notifications config
+DEFAULT_SMTP_SETTINGS = {
+    "host": "smtp.example.com",
+    "port": 587,
+    "starttls": True,
+    "username": "your_email@example.com",  # None to skip the login, e.g. for a local aiosmtpd
+    "password": "your_password",
+    "sender": "your_email@example.com",
+    "timeout": 30.0,
+}
+
+# Queue item telling the worker to flush and exit
+_STOP = object()
+
+# Queue item telling the worker to send the pending batch and switch to new sinks and settings
+DispatcherSettings = namedtuple("DispatcherSettings", "sinks coalesce_seconds max_retries backoff_factor")
+
+def format_email(listings):
+    """
+    Build the email text for a batch of listings.
+
+    Parameters:
+    listings (list): The new listings.
+
+    Returns:
+    str: The message body.
+    """
+    return "New listings found:\n" + "\n".join([f"{l.title} - {l.price}" for l in listings])
+
+class EmailSink:
+    """
+    Sends email notifications over one persistent SMTP connection.
+    """
+    name = "email"
+
+    def __init__(self, recipient, settings=None):
+        """
+        Initialize the EmailSink.
+
+        Parameters:
+        recipient (str): The address messages are sent to.
+        settings (dict): Overrides for DEFAULT_SMTP_SETTINGS.
+        """
+        self.recipient = recipient
+        self.settings = {**DEFAULT_SMTP_SETTINGS, **(settings or {})}
+        self._server = None
+
+    def _connect(self):
+        """
+        Open the SMTP connection and authenticate.
+        """
+        server = smtplib.SMTP(self.settings["host"], self.settings["port"], timeout=self.settings["timeout"])
+        if self.settings["starttls"]:
+            server.starttls()
+        if self.settings["username"]:
+            server.login(self.settings["username"], self.settings["password"])
+        self._server = server
+
+    def _get_server(self):
+        """
+        Get a live SMTP connection, reconnecting if the server dropped the idle one.
+        """
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.close()
+        self._connect()
+        return self._server
+
+    def send(self, listings):
+        """
+        Send one email listing every listing of the batch.
+
+        Parameters:
+        listings (list): The new listings.
+        """
+        msg = MIMEText(format_email(listings))
+        msg['Subject'] = "New Car Listings Found"
+        msg['From'] = self.settings["sender"]
+        msg['To'] = self.recipient
+        try:
+            self._get_server().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, OSError):
+            # Drop the broken connection so the retry reconnects
+            self.close()
+            raise
+
+    def close(self):
+        """
+        Close the SMTP connection.
+        """
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+class MemorySink:
+    """
+    Sink recording every batch in memory, for tests and offline runs.
+    """
+    def __init__(self, name="memory"):
+        self.name = name
+        self.sent = []
+
+    def send(self, listings):
+        self.sent.append(list(listings))
+
+    def close(self):
+        pass
+
+class NotificationDispatcher:
+    """
+    Queues listings and sends them from a background thread.
+
+    Listings queued within the coalescing window are merged into one message per sink,
+    and failed sends are retried with exponential backoff. A running dispatcher is
+    reconfigured in place, so listings queued around a config reload are not lost.
+    """
+    def __init__(self, sinks, coalesce_seconds=DEFAULT_SETTINGS["coalesce_seconds"],
+                 max_retries=DEFAULT_SETTINGS["max_retries"], backoff_factor=DEFAULT_SETTINGS["backoff_factor"]):
+        """
+        Initialize the NotificationDispatcher.
+
+        Parameters:
+        sinks (list): Objects with a name, a send(listings) and a close() method.
+        coalesce_seconds (float): How long to wait for more listings after the first one arrives.
+        max_retries (int): Retries per sink after a failed send.
+        backoff_factor (float): Base of the exponential backoff between retries, in seconds.
+        """
+        self._apply(DispatcherSettings(list(sinks), coalesce_seconds, max_retries, backoff_factor))
+        # The "notifications" section the dispatcher was configured from, see configure_dispatcher()
+        self.settings = None
+        self.queue = queue.Queue()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _apply(self, settings):
+        """
+        Switch to the sinks and settings of a DispatcherSettings.
+        """
+        self.sinks = settings.sinks
+        self.coalesce_seconds = settings.coalesce_seconds
+        self.max_retries = settings.max_retries
+        self.backoff_factor = settings.backoff_factor
+
+    def start(self):
+        """
+        Start the background worker.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="NotificationDispatcher", daemon=True)
+            self._thread.start()
+
+    def notify(self, listings):
+        """
+        Queue listings for notification; returns immediately.
+
+        Parameters:
+        listings (list): The new listings.
+        """
+        if listings:
+            self.queue.put(list(listings))
+
+    def reconfigure(self, sinks, coalesce_seconds, max_retries, backoff_factor):
+        """
+        Switch to new sinks and settings; returns immediately.
+
+        The listings queued before the call are still sent to the previous sinks, which
+        are closed afterwards by the worker.
+
+        Parameters:
+        sinks (list): The new sinks.
+        coalesce_seconds (float): How long to wait for more listings after the first one arrives.
+        max_retries (int): Retries per sink after a failed send.
+        backoff_factor (float): Base of the exponential backoff between retries, in seconds.
+        """
+        settings = DispatcherSettings(list(sinks), coalesce_seconds, max_retries, backoff_factor)
+        if self._thread is None:
+            self._close_sinks()
+            self._apply(settings)
+        else:
+            self.queue.put(settings)
+
+    def stop(self, timeout=10.0):
+        """
+        Send whatever is queued, then stop the worker and close the sinks.
+
+        Parameters:
+        timeout (float): Maximum seconds to wait for the worker.
+        """
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        # Abort pending retry sleeps if the worker did not finish in time
+        self._stopping.set()
+        self._thread = None
+
+    def _run(self):
+        """
+        Worker loop collecting listings for one coalescing window and dispatching them.
+        """
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            if isinstance(item, DispatcherSettings):
+                self._close_sinks()
+                self._apply(item)
+                continue
+            batch = item
+            settings = None
+            deadline = time.monotonic() + self.coalesce_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, DispatcherSettings):
+                    # Listings queued before the new settings still go to the previous sinks
+                    settings = item
+                    break
+                batch.extend(item)
+            self._dispatch(batch)
+            if settings is not None:
+                self._close_sinks()
+                self._apply(settings)
+        self._close_sinks()
+
+    def _close_sinks(self):
+        """
+        Close every sink, logging failures.
+        """
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                logger.error(f"Failed to close {sink.name} notifications: {e}")
+
+    def _dispatch(self, listings):
+        """
+        Send a batch to every sink, retrying each sink independently.
+        """
+        for sink in self.sinks:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with metrics.timed("notify"):
+                        sink.send(listings)
+                    logger.info(f"Sent {sink.name} notification for {len(listings)} listings")
+                    metrics.count("notifications_total", "Notifications sent or given up on", sink=sink.name, outcome="sent")
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        logger.error(f"Giving up on {sink.name} notification after {attempt + 1} attempts: {e}")
+                        metrics.count("notifications_total", "Notifications sent or given up on", sink=sink.name, outcome="failed")
+                        break
+                    delay = self.backoff_factor * (2 ** attempt)
+                    logger.warning(f"Sending {sink.name} notification failed ({e}), retrying in {delay:.1f}s")
+                    if self._stopping.wait(delay):
+                        return
+
+def create_sinks(settings):
+    """
+    Build a sink for every configured recipient.
+
+    Parameters:
+    settings (dict): The "notifications" section merged with DEFAULT_SETTINGS.
+
+    Returns:
+    list: The sinks.
+    """
+    sinks = []
+    if settings["email"]:
+        sinks.append(EmailSink(settings["email"], settings["smtp"]))
+    if settings["phone"]:
+        sinks.append(SMS_BACKENDS[settings["sms_backend"]](settings["phone"], settings["twilio"]))
+    if not sinks:
+        logger.warning("No email or phone number configured, notifications are disabled")
+    return sinks
+
+def create_dispatcher(settings):
+    """
+    Build a dispatcher with a sink for every configured recipient.
+
+    Parameters:
+    settings (dict): The "notifications" section of the config.
+
+    Returns:
+    NotificationDispatcher: The dispatcher, not started yet.
+    """
+    merged = {**DEFAULT_SETTINGS, **(settings or {})}
+    dispatcher = NotificationDispatcher(
+        create_sinks(merged),
+        coalesce_seconds=merged["coalesce_seconds"],
+        max_retries=merged["max_retries"],
+        backoff_factor=merged["backoff_factor"],
+    )
+    dispatcher.settings = settings
+    return dispatcher
+
+def configure_dispatcher(dispatcher, settings):
+    """
+    Apply the "notifications" section of the config to the running dispatcher, e.g. after a config reload.
+
+    The dispatcher is reconfigured in place rather than replaced, so listings queued by
+    searches still running are sent instead of reaching a stopped dispatcher, and the
+    caller never waits for a pending batch.
+
+    Parameters:
+    dispatcher (NotificationDispatcher): The running dispatcher, or None.
+    settings (dict): The notification settings, or None.
+
+    Returns:
+    NotificationDispatcher: The dispatcher to use from now on, started.
+    """
+    if dispatcher is None:
+        dispatcher = create_dispatcher(settings)
+        dispatcher.start()
+        return dispatcher
+    if settings == dispatcher.settings:
+        return dispatcher
+    merged = {**DEFAULT_SETTINGS, **(settings or {})}
+    dispatcher.reconfigure(create_sinks(merged), merged["coalesce_seconds"], merged["max_retries"],
+                           merged["backoff_factor"])
+    dispatcher.settings = settings
+    return dispatcher
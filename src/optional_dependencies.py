@@ -0,0 +1,40 @@
+import importlib
+import logging
+import threading
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+def lazy_import(name, *submodules):
+    """
+    Create a getter for an optional dependency, imported on first use.
+
+    Optional dependencies only speed up or extend a feature, so they are not imported
+    at startup and their absence is not an error.
+
+    Parameters:
+    name (str): The module name, e.g. "numpy".
+    submodules (str): Further modules that must be importable too, e.g. "pyarrow.parquet".
+
+    Returns:
+    callable: Returns the module, or None if it or one of the submodules is not installed;
+    the import is only attempted once.
+    """
+    lock = threading.Lock()
+    state = {}
+
+    def get():
+        with lock:
+            if "module" not in state:
+                try:
+                    module = importlib.import_module(name)
+                    for submodule in submodules:
+                        importlib.import_module(submodule)
+                except ImportError as e:
+                    logger.debug(f"Optional dependency {name} is not available: {e}")
+                    module = None
+                state["module"] = module
+            return state["module"]
+
+    get.__doc__ = f"Get {name} if it is installed, or None."
+    return get
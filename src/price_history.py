@@ -0,0 +1,292 @@
+import logging
+import threading
+import time
+
+from collections import namedtuple
+from listing_store import DEFAULT_DB_PATH, listing_key, open_connection, transaction
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Aggregated prices of one search, day and currency
+DailyPrices = namedtuple("DailyPrices", ["day", "currency", "count", "min_cents", "median_cents", "max_cents", "mean_cents"])
+
+# A listing whose price went down, with its previous price in cents
+PriceDrop = namedtuple("PriceDrop", ["listing", "previous_cents", "price_cents"])
+
+# One recorded price of a listing
+PriceObservation = namedtuple("PriceObservation", ["observed_at", "price_cents", "currency"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_observations (
+    search_key TEXT NOT NULL,
+    listing_key TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    currency TEXT,
+    PRIMARY KEY (search_key, listing_key, observed_at)
+) WITHOUT ROWID;
+DROP INDEX IF EXISTS idx_price_observations_day;
+
+CREATE TABLE IF NOT EXISTS price_day_listings (
+    search_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    listing_key TEXT NOT NULL,
+    price_cents INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    PRIMARY KEY (search_key, day, listing_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_price_day_listings_currency ON price_day_listings (search_key, day, currency, price_cents);
+
+CREATE TABLE IF NOT EXISTS price_daily (
+    search_key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sum_cents INTEGER NOT NULL,
+    min_cents INTEGER NOT NULL,
+    max_cents INTEGER NOT NULL,
+    median_cents INTEGER NOT NULL,
+    PRIMARY KEY (search_key, day, currency)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS listing_prices (
+    search_key TEXT NOT NULL,
+    listing_key TEXT NOT NULL,
+    currency TEXT,
+    first_cents INTEGER NOT NULL,
+    previous_cents INTEGER,
+    last_cents INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    last_changed REAL NOT NULL,
+    PRIMARY KEY (search_key, listing_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_listing_prices_changed ON listing_prices (search_key, last_changed);
+"""
+
+def day_of(timestamp):
+    """
+    Get the local calendar day of a timestamp, the unit of the daily rollups.
+
+    Parameters:
+    timestamp (float): Seconds since the epoch.
+
+    Returns:
+    str: The day as YYYY-MM-DD.
+    """
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+class PriceHistory:
+    """
+    Time series of listing prices per search, with daily rollups of the listings on the market.
+
+    A price is recorded whenever a listing is first seen or its price changes, and
+    updates the latest-price row of its listing, so price drops are read from that row
+    instead of rescanning the history. The daily count/sum/min/max/median of a search
+    describe every listing that was active in the listing store on that day, at its
+    last price of the day, so a listing whose price never changes is counted on every
+    day it stays listed. The history shares the listing database, reads its listings
+    table (create the ListingStore first) and is thread-safe in the same way.
+    """
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        Initialize the PriceHistory and create the schema if needed.
+
+        Parameters:
+        path (str): The path of the SQLite database file.
+        """
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        """
+        Get the connection of the calling thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = open_connection(self.path)
+            connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS price_run (listing_key TEXT PRIMARY KEY, price_cents INTEGER, currency TEXT)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def record(self, search_key, listings, observed_at=None):
+        """
+        Record the prices of new or changed listings and update the daily rollups.
+
+        Listings without a parsed price, whose price did not change since they were last
+        recorded, or already recorded at the same observation time, are skipped. The prices
+        are loaded into a temporary table and every table is updated with one bulk statement
+        inside a single transaction. The rollups of the day are refreshed from the active
+        listings of the search, so call this after ListingStore.apply_run(), also when no
+        listing changed.
+
+        Parameters:
+        search_key (str): The key of the search.
+        listings (list): The Listing objects to record.
+        observed_at (float): The observation time, or None for now.
+
+        Returns:
+        list: A PriceDrop for every listing whose price went down in the same currency.
+        """
+        observed_at = time.time() if observed_at is None else observed_at
+        day = day_of(observed_at)
+        priced = {listing_key(listing): listing for listing in listings if listing.price_cents is not None}
+
+        connection = self._connection()
+        with transaction(connection):
+            connection.execute("DELETE FROM price_run")
+            connection.executemany(
+                "INSERT INTO price_run VALUES (?, ?, ?)",
+                [(key, listing.price_cents, listing.currency) for key, listing in priced.items()],
+            )
+            connection.execute(
+                "DELETE FROM price_run WHERE EXISTS ("
+                "SELECT 1 FROM listing_prices WHERE listing_prices.search_key = ? "
+                "AND listing_prices.listing_key = price_run.listing_key "
+                "AND listing_prices.last_cents = price_run.price_cents AND listing_prices.currency IS price_run.currency"
+                ") OR EXISTS ("
+                "SELECT 1 FROM price_observations WHERE price_observations.search_key = ? "
+                "AND price_observations.listing_key = price_run.listing_key AND price_observations.observed_at = ?)",
+                (search_key, search_key, observed_at),
+            )
+
+            drop_rows = connection.execute(
+                "SELECT price_run.listing_key, listing_prices.last_cents FROM price_run JOIN listing_prices "
+                "ON listing_prices.search_key = ? AND listing_prices.listing_key = price_run.listing_key "
+                "WHERE listing_prices.currency IS price_run.currency AND price_run.price_cents < listing_prices.last_cents",
+                (search_key,),
+            ).fetchall()
+            drops = [PriceDrop(priced[key], previous_cents, priced[key].price_cents) for key, previous_cents in drop_rows]
+
+            connection.execute(
+                "INSERT INTO price_observations "
+                "SELECT ?, listing_key, ?, ?, price_cents, currency FROM price_run",
+                (search_key, observed_at, day),
+            )
+            # "WHERE true" disambiguates the upsert clause from a join constraint
+            connection.execute(
+                "INSERT INTO listing_prices "
+                "SELECT ?, listing_key, currency, price_cents, NULL, price_cents, ?, ? FROM price_run WHERE true "
+                "ON CONFLICT (search_key, listing_key) DO UPDATE SET "
+                "currency = excluded.currency, previous_cents = last_cents, last_cents = excluded.last_cents, "
+                "last_changed = excluded.last_changed",
+                (search_key, observed_at, observed_at),
+            )
+            connection.execute("DELETE FROM price_run")
+
+            # Rollups need a currency; prices without one cannot be compared. Rows of listings
+            # already counted today at the same price are left alone, so an unchanged market
+            # writes nothing and the rollups are not rebuilt
+            changes = connection.total_changes
+            connection.execute(
+                "INSERT INTO price_day_listings "
+                "SELECT search_key, ?, listing_key, price_cents, currency FROM listings "
+                "WHERE search_key = ? AND disappeared_at IS NULL AND price_cents IS NOT NULL AND currency IS NOT NULL "
+                "ON CONFLICT (search_key, day, listing_key) DO UPDATE SET "
+                "price_cents = excluded.price_cents, currency = excluded.currency "
+                "WHERE price_cents != excluded.price_cents OR currency != excluded.currency",
+                (day, search_key),
+            )
+            if connection.total_changes != changes:
+                self._update_daily(connection, search_key, day)
+
+        if drops:
+            logger.info(f"Search {search_key}: {len(drops)} price drops")
+        return drops
+
+    def _update_daily(self, connection, search_key, day):
+        """
+        Rebuild the rollups of one search and day from the listings counted that day.
+
+        The aggregates come from one indexed scan of the day's listings. The median is
+        read with LIMIT/OFFSET, which steps over up to half of the listings of each
+        currency; both costs grow with the listings of one search, not with its history.
+        """
+        connection.execute("DELETE FROM price_daily WHERE search_key = ? AND day = ?", (search_key, day))
+        connection.execute(
+            "INSERT INTO price_daily "
+            "SELECT search_key, day, currency, count(*), sum(price_cents), min(price_cents), max(price_cents), 0 "
+            "FROM price_day_listings WHERE search_key = ? AND day = ? GROUP BY currency",
+            (search_key, day),
+        )
+        rows = connection.execute(
+            "SELECT currency, count FROM price_daily WHERE search_key = ? AND day = ?", (search_key, day)
+        ).fetchall()
+        for currency, count in rows:
+            middle = [cents for cents, in connection.execute(
+                "SELECT price_cents FROM price_day_listings WHERE search_key = ? AND day = ? AND currency = ? "
+                "ORDER BY price_cents LIMIT ? OFFSET ?",
+                (search_key, day, currency, 2 - count % 2, (count - 1) // 2),
+            )]
+            connection.execute(
+                "UPDATE price_daily SET median_cents = ? WHERE search_key = ? AND day = ? AND currency = ?",
+                (sum(middle) // len(middle), search_key, day, currency),
+            )
+
+    def daily(self, search_key, since_day=None, currency=None):
+        """
+        Get the daily price rollups of a search, e.g. for a trend chart.
+
+        Parameters:
+        search_key (str): The key of the search.
+        since_day (str): The first day to include as YYYY-MM-DD, or None for all days.
+        currency (str): Only include this currency, or None for every currency.
+
+        Returns:
+        list: DailyPrices tuples ordered by day.
+        """
+        rows = self._connection().execute(
+            "SELECT day, currency, count, min_cents, median_cents, max_cents, sum_cents / count FROM price_daily "
+            "WHERE search_key = ? AND day >= ? AND (? IS NULL OR currency = ?) ORDER BY day, currency",
+            (search_key, since_day or "", currency, currency),
+        ).fetchall()
+        return [DailyPrices(*row) for row in rows]
+
+    def price_drops(self, search_key, since=None):
+        """
+        Get the listings of a search whose latest price change was a drop.
+
+        Parameters:
+        search_key (str): The key of the search.
+        since (float): Only include drops at or after this timestamp, or None for all.
+
+        Returns:
+        list: (listing_key, currency, previous_cents, last_cents, last_changed) tuples, largest drop first.
+        """
+        return self._connection().execute(
+            "SELECT listing_key, currency, previous_cents, last_cents, last_changed FROM listing_prices "
+            "WHERE search_key = ? AND last_changed >= ? AND last_cents < previous_cents "
+            "ORDER BY previous_cents - last_cents DESC",
+            (search_key, since or 0),
+        ).fetchall()
+
+    def listing_history(self, search_key, key):
+        """
+        Get every recorded price of one listing.
+
+        Parameters:
+        search_key (str): The key of the search.
+        key (str): The listing key, see listing_store.listing_key().
+
+        Returns:
+        list: PriceObservation tuples ordered by time.
+        """
+        rows = self._connection().execute(
+            "SELECT observed_at, price_cents, currency FROM price_observations "
+            "WHERE search_key = ? AND listing_key = ? ORDER BY observed_at",
+            (search_key, key),
+        ).fetchall()
+        return [PriceObservation(*row) for row in rows]
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
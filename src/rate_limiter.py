@@ -0,0 +1,82 @@
+import threading
+import time
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing bursts of `capacity` requests at a sustained `rate` per second.
+    """
+    def __init__(self, rate, capacity):
+        """
+        Initialize the TokenBucket.
+
+        Parameters:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens the bucket holds.
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("Rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """
+        Take tokens from the bucket if available.
+
+        Returns:
+        float: 0 if the tokens were taken, otherwise the seconds until they will be available.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        Block until the requested tokens are available and take them.
+
+        Parameters:
+        tokens (float): The number of tokens to take.
+        """
+        # Sleep outside the lock so other threads can refill their view of the bucket
+        while True:
+            wait = self._reserve(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host so each site is throttled independently.
+    """
+    def __init__(self, rate, burst):
+        """
+        Initialize the HostRateLimiter.
+
+        Parameters:
+        rate (float): Sustained requests per second allowed per host.
+        burst (int): Requests per host that may be sent back to back.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, host):
+        """
+        Block until a request to the given host is allowed.
+
+        Parameters:
+        host (str): The host name of the request.
+        """
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
@@ -0,0 +1,289 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default scheduler settings, overridable through the "schedule" section of config.json
+DEFAULT_SETTINGS = {
+    "interval_minutes": 60.0,     # Base interval of searches without their own interval
+    "jitter": 0.1,                # Every interval is randomly stretched or shrunk by up to 10%
+    "adaptive": True,             # Adapt intervals to how often a search finds new listings
+    "speedup": 0.5,               # Interval factor after a run that found new listings
+    "slowdown": 1.5,              # Interval factor after a run that found nothing
+    "min_interval_factor": 0.25,  # Adaptive intervals stay within these multiples of the base interval
+    "max_interval_factor": 4.0,
+}
+
+def check_interval(interval):
+    """
+    Check that a search interval is a positive number of seconds.
+
+    Parameters:
+    interval (float): The interval.
+
+    Raises:
+    ValueError: If the interval is not positive.
+    """
+    if not interval > 0:
+        raise ValueError(f"The interval of a search must be positive, got {interval}")
+
+class ScheduledSearch:
+    """
+    A search registered with the scheduler and its current timing.
+    """
+    def __init__(self, search_id, search_params, base_interval):
+        """
+        Initialize the ScheduledSearch.
+
+        Parameters:
+        search_id (str): The id the search is submitted under.
+        search_params (dict): The search parameters.
+        base_interval (float): The configured interval in seconds.
+        """
+        self.search_id = search_id
+        self.search_params = dict(search_params)
+        self.base_interval = base_interval
+        self.interval = base_interval
+        self.next_run = None
+        self.running = False
+        # Incremented on every reschedule so stale heap entries can be skipped
+        self.version = 0
+
+class SearchScheduler:
+    """
+    Heap-based scheduler with per-search intervals, jitter and adaptive intervals.
+
+    Searches are popped when due and only rescheduled once their run completes, so runs
+    missed while a search was running or the machine was asleep collapse into one.
+    Between runs the scheduler costs nothing: the caller sleeps until next_due_in().
+    The scheduler is thread-safe.
+    """
+    def __init__(self, jitter=DEFAULT_SETTINGS["jitter"], adaptive=DEFAULT_SETTINGS["adaptive"],
+                 speedup=DEFAULT_SETTINGS["speedup"], slowdown=DEFAULT_SETTINGS["slowdown"],
+                 min_interval_factor=DEFAULT_SETTINGS["min_interval_factor"],
+                 max_interval_factor=DEFAULT_SETTINGS["max_interval_factor"], clock=time.monotonic):
+        """
+        Initialize the SearchScheduler.
+
+        Parameters:
+        jitter (float): Maximum relative random change of every interval.
+        adaptive (bool): Whether intervals adapt to the results of the runs.
+        speedup (float): Interval factor after a run that found new listings.
+        slowdown (float): Interval factor after a run that found nothing.
+        min_interval_factor (float): Lower bound of adaptive intervals, relative to the base interval.
+        max_interval_factor (float): Upper bound of adaptive intervals, relative to the base interval.
+        clock (callable): Returns the current time in seconds.
+        """
+        self.jitter = jitter
+        self.adaptive = adaptive
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.min_interval_factor = min_interval_factor
+        self.max_interval_factor = max_interval_factor
+        self.clock = clock
+        self.searches = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def _push(self, search, run_at):
+        """
+        Schedule the next run of a search, invalidating any earlier heap entry.
+        """
+        search.version += 1
+        search.next_run = run_at
+        heapq.heappush(self._heap, (run_at, next(self._counter), search.search_id, search.version))
+
+    def _jittered(self, interval):
+        """
+        Randomly stretch or shrink an interval by up to the jitter fraction.
+        """
+        return interval * (1 + self.jitter * random.uniform(-1, 1))
+
+    def add(self, search_id, search_params, interval, delay=0.0):
+        """
+        Register a search, or update the parameters and interval of a registered one.
+
+        Parameters:
+        search_id (str): The id the search is submitted under.
+        search_params (dict): The search parameters.
+        interval (float): The base interval in seconds.
+        delay (float): Seconds until the first run.
+
+        Raises:
+        ValueError: If the interval is not positive.
+        """
+        check_interval(interval)
+        with self._lock:
+            search = self.searches.get(search_id)
+            if search is None:
+                search = self.searches[search_id] = ScheduledSearch(search_id, search_params, interval)
+            else:
+                search.search_params = dict(search_params)
+                search.base_interval = search.interval = interval
+            if not search.running:
+                self._push(search, self.clock() + delay)
+
+    def remove(self, search_id):
+        """
+        Unregister a search; its heap entry is skipped lazily.
+
+        Parameters:
+        search_id (str): The id of the search.
+        """
+        with self._lock:
+            self.searches.pop(search_id, None)
+
+    def replace(self, searches):
+        """
+        Replace the registered searches, e.g. after a config reload, keeping the timing of those that stay.
+
+        New searches are due at once. A search whose base interval changed keeps its adapted
+        interval and the time left until its next run, both scaled to the new base interval.
+
+        Parameters:
+        searches (dict): The base interval in seconds and parameters of every search, as
+        {search_id: (search_params, interval)}.
+
+        Raises:
+        ValueError: If an interval is not positive; the registered searches are left unchanged.
+        """
+        for _, interval in searches.values():
+            check_interval(interval)
+        with self._lock:
+            now = self.clock()
+            for search_id in set(self.searches) - set(searches):
+                del self.searches[search_id]
+            for search_id, (search_params, interval) in searches.items():
+                search = self.searches.get(search_id)
+                if search is None:
+                    search = self.searches[search_id] = ScheduledSearch(search_id, search_params, interval)
+                    self._push(search, now)
+                    continue
+                search.search_params = dict(search_params)
+                if interval == search.base_interval:
+                    continue
+                scale = interval / search.base_interval if search.base_interval > 0 else 1.0
+                search.base_interval = interval
+                search.interval *= scale
+                if not search.running:
+                    self._push(search, now + max(0.0, search.next_run - now) * scale)
+
+    def clear(self):
+        """
+        Unregister every search.
+        """
+        with self._lock:
+            self.searches.clear()
+            self._heap.clear()
+
+    def _discard_stale(self):
+        """
+        Drop heap entries of removed or rescheduled searches from the top of the heap.
+        """
+        while self._heap:
+            _, _, search_id, version = self._heap[0]
+            search = self.searches.get(search_id)
+            if search is not None and search.version == version and not search.running:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due_in(self):
+        """
+        Get the time until the next search is due.
+
+        Returns:
+        float: Seconds until the next run, 0 if one is overdue, or None if nothing is scheduled.
+        """
+        with self._lock:
+            self._discard_stale()
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - self.clock())
+
+    def pop_due(self):
+        """
+        Take every search that is due and mark it as running.
+
+        Returns:
+        list: The due ScheduledSearch objects; each must be passed back to complete().
+        """
+        due = []
+        with self._lock:
+            now = self.clock()
+            self._discard_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, search_id, _ = heapq.heappop(self._heap)
+                search = self.searches[search_id]
+                search.running = True
+                due.append(search)
+                self._discard_stale()
+        return due
+
+    def complete(self, search_id, new_listings=None):
+        """
+        Reschedule a search after its run, adapting its interval to the result.
+
+        Parameters:
+        search_id (str): The id of the search.
+        new_listings (int): The number of new listings found, or None if the run failed or was cancelled.
+        """
+        with self._lock:
+            search = self.searches.get(search_id)
+            if search is None or not search.running:
+                return
+            search.running = False
+
+            if self.adaptive and new_listings is not None:
+                factor = self.speedup if new_listings else self.slowdown
+                search.interval = min(
+                    search.base_interval * self.max_interval_factor,
+                    max(search.base_interval * self.min_interval_factor, search.interval * factor),
+                )
+            interval = self._jittered(search.interval)
+            self._push(search, self.clock() + interval)
+        logger.debug(f"Search {search_id} rescheduled in {interval:.0f}s")
+
+def configure_scheduler(scheduler, settings):
+    """
+    Apply the "schedule" section of the config to a scheduler, keeping its searches.
+
+    The base interval of the section is not applied here; it is passed with every search.
+
+    Parameters:
+    scheduler (SearchScheduler): The scheduler.
+    settings (dict): The "schedule" section of the config, or None for the defaults.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    with scheduler._lock:
+        scheduler.jitter = settings["jitter"]
+        scheduler.adaptive = settings["adaptive"]
+        scheduler.speedup = settings["speedup"]
+        scheduler.slowdown = settings["slowdown"]
+        scheduler.min_interval_factor = settings["min_interval_factor"]
+        scheduler.max_interval_factor = settings["max_interval_factor"]
+
+def create_scheduler(settings):
+    """
+    Build a scheduler from the "schedule" section of the config.
+
+    Parameters:
+    settings (dict): The "schedule" section of the config, or None for the defaults.
+
+    Returns:
+    SearchScheduler: The scheduler, without any searches.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    return SearchScheduler(
+        jitter=settings["jitter"],
+        adaptive=settings["adaptive"],
+        speedup=settings["speedup"],
+        slowdown=settings["slowdown"],
+        min_interval_factor=settings["min_interval_factor"],
+        max_interval_factor=settings["max_interval_factor"],
+    )
@@ -0,0 +1,424 @@
+import hashlib
+import logging
+import itertools
+import string
+import threading
+import time
+import http_client
+import html_parser
+import metrics
+
+from collections import namedtuple, OrderedDict
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Base URL of the marketplace search page
+BASE_URL = "https://www.example.com/search?"
+
+# Parameters that must be present before a search is run
+REQUIRED_FIELDS = ['model', 'year']  # Adjust based on your needs
+
+# Selectors of the results page (adjust selectors to match the website)
+SELECTORS = {
+    'listing': '.listing-item',
+    'title': '.title',
+    'price': '.price',
+    'link': 'a[href]',
+    'image': 'img[src]',
+    'next_page': 'a[rel~="next"][href], .pagination .next a[href], a.next[href]',
+}
+
+# Upper bound of result pages followed by a single search
+DEFAULT_MAX_PAGES = 10
+
+# Whether result pages are parsed while they download, see set_streaming()
+_stream_pages = False
+
+# Parsed result pages remembered by body digest, so re-polled unchanged pages are not parsed again
+PARSE_CACHE_SIZE = 128
+_parse_cache = OrderedDict()
+_parse_cache_lock = threading.Lock()
+
+# Outcome of a search run; complete is True if every result page was crawled
+SearchResult = namedtuple("SearchResult", ["listings", "complete"])
+
+class SearchCancelled(Exception):
+    """Raised when a running search is cancelled before it completes."""
+
+class SiteAdapter:
+    """
+    Describes how one marketplace is searched: its URL template, parameter mapping,
+    selectors and pagination rule.
+    """
+    def __init__(self, name, search_url, selectors=None, param_map=None, value_map=None,
+                 pagination=None, required_fields=None, cache_ttl=None):
+        """
+        Initialize the SiteAdapter.
+
+        Parameters:
+        name (str): The name of the site.
+        search_url (str): Either a URL prefix the encoded query is appended to, or a template
+        with {<parameter>} for single quoted site parameters and {query} for the encoded others.
+        selectors (dict): The CSS selectors of the results page overriding SELECTORS.
+        param_map (dict): Site parameter name of each search parameter; None drops the parameter,
+        unmapped parameters keep their name.
+        value_map (dict): Per search parameter, the site value of each search value.
+        pagination (dict): {"type": "next_link"} to follow the next page link (the default), or
+        {"type": "page_param", "param": "page", "start": 1} to count pages in a query parameter.
+        required_fields (list): Search parameters that must be present; defaults to REQUIRED_FIELDS.
+        cache_ttl (float): Seconds a cached result page of the site is reused without revalidation,
+        or None for the TTL of the HTTP cache settings.
+        """
+        self.name = name
+        self.search_url = search_url
+        self.selectors = {**SELECTORS, **(selectors or {})}
+        self.param_map = dict(param_map or {})
+        self.value_map = dict(value_map or {})
+        self.pagination = {"type": "next_link", **(pagination or {})}
+        if self.pagination["type"] not in ("next_link", "page_param"):
+            raise ValueError(f"Unknown pagination type of site {name}: {self.pagination['type']}")
+        self.required_fields = list(REQUIRED_FIELDS if required_fields is None else required_fields)
+        self.cache_ttl = cache_ttl
+
+    def map_params(self, search_params):
+        """
+        Translate search parameters to the parameters of the site.
+
+        Parameters:
+        search_params (dict): The search parameters.
+
+        Returns:
+        dict: The site parameters.
+        """
+        mapped = {}
+        for key, value in search_params.items():
+            site_key = self.param_map.get(key, key)
+            if site_key is not None:
+                mapped[site_key] = self.value_map.get(key, {}).get(value, value)
+        return mapped
+
+    def build_url(self, search_params):
+        """
+        Construct the URL of the first result page.
+
+        Parameters:
+        search_params (dict): The search parameters.
+
+        Returns:
+        str: The search URL.
+
+        Raises:
+        ValueError: If the URL template uses a parameter the search does not set.
+        """
+        mapped = self.map_params(search_params)
+        placeholders = {field for _, field, _, _ in string.Formatter().parse(self.search_url) if field}
+        if not placeholders:
+            return build_search_url(mapped, self.search_url)
+        missing = placeholders - set(mapped) - {"query"}
+        if missing:
+            raise ValueError(f"The search URL of site {self.name} needs the parameters {', '.join(sorted(missing))}")
+        return self.search_url.format(
+            query=urlencode({key: value for key, value in mapped.items() if key not in placeholders}),
+            **{key: quote(str(value), safe="") for key, value in mapped.items() if key in placeholders},
+        )
+
+    def next_page_url(self, page_url, next_link, page_number, listing_count):
+        """
+        Apply the pagination rule after a result page was parsed.
+
+        Parameters:
+        page_url (str): The URL of the parsed page.
+        next_link (str): The next page link found on the page, or None.
+        page_number (int): The 1-based number of the parsed page.
+        listing_count (int): The number of listings found on the page.
+
+        Returns:
+        str: The URL of the next page, or None after the last page.
+        """
+        if self.pagination["type"] == "next_link":
+            return next_link if next_link != page_url else None
+        if listing_count == 0:
+            return None
+        parts = urlsplit(page_url)
+        param = self.pagination.get("param", "page")
+        query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != param]
+        query.append((param, str(self.pagination.get("start", 1) + page_number)))
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+def search_key(search_params):
+    """
+    Build a stable key identifying a combination of search parameters.
+
+    Parameters:
+    search_params (dict): The search parameters.
+
+    Returns:
+    str: The parameters as a sorted query string.
+    """
+    return urlencode(sorted((str(key), str(value)) for key, value in search_params.items()))
+
+def expand_search_params(search_params, combobox_options, fan_out_keys):
+    """
+    Expand the chosen parameters into every combination of their options.
+
+    Parameters:
+    search_params (dict): The base search parameters.
+    combobox_options (dict): The available options of each parameter.
+    fan_out_keys (iterable): The parameters whose options are all searched.
+
+    Returns:
+    list: One search parameter dict per combination, the base parameters if nothing is expanded.
+    """
+    keys = [key for key in fan_out_keys if combobox_options.get(key)]
+    if not keys:
+        return [dict(search_params)]
+
+    combinations = []
+    for values in itertools.product(*(combobox_options[key] for key in keys)):
+        combination = dict(search_params)
+        combination.update(zip(keys, values))
+        combinations.append(combination)
+    return combinations
+
+def build_search_url(search_params, base_url=BASE_URL):
+    """
+    Construct the search URL for the given parameters.
+
+    Parameters:
+    search_params (dict): The search parameters.
+    base_url (str): The search page URL the query is appended to.
+
+    Returns:
+    str: The full search URL.
+    """
+    return base_url + urlencode(search_params)
+
+def check_cancelled(cancel_event):
+    """
+    Raise SearchCancelled if the given cancel event has been set.
+
+    Parameters:
+    cancel_event (threading.Event): Event set when the search should stop, or None.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise SearchCancelled()
+
+def parse_page(content, page_url, backend=None, selectors=SELECTORS):
+    """
+    Extract the listings and the next page link from a search results page.
+
+    The results of byte-identical pages are memoized.
+
+    Parameters:
+    content (bytes): The raw HTML of the results page.
+    page_url (str): The URL of the page, used to resolve relative links.
+    backend (str): The HTML parser backend, or None for the default backend.
+    selectors (dict): The CSS selectors of the site.
+
+    Returns:
+    tuple: The Listing of every listing on the page,
+    and the absolute URL of the next page or None on the last page.
+    """
+    key = (hashlib.blake2b(content, digest_size=16).digest(), page_url, backend, tuple(sorted(selectors.items())))
+    with _parse_cache_lock:
+        cached = _parse_cache.get(key)
+        if cached is not None:
+            _parse_cache.move_to_end(key)
+    if cached is not None:
+        metrics.count("parse_cache_hits_total", "Result pages whose parse was reused")
+        return list(cached[0]), cached[1]
+
+    listings, next_url = html_parser.get_listing_parser(selectors, backend).parse(content, page_url)
+    with _parse_cache_lock:
+        _parse_cache[key] = (tuple(listings), next_url)
+        if len(_parse_cache) > PARSE_CACHE_SIZE:
+            _parse_cache.popitem(last=False)
+    return listings, next_url
+
+def set_streaming(enabled):
+    """
+    Choose whether result pages are parsed incrementally while they download.
+
+    Streaming needs lxml; without it pages are downloaded completely and then parsed.
+
+    Parameters:
+    enabled (bool): True to stream result pages.
+    """
+    global _stream_pages
+    if enabled:
+        try:
+            html_parser.get_streaming_parser(SELECTORS)
+        except ImportError:
+            logger.warning("Streaming result pages needs lxml and cssselect, downloading pages completely instead")
+            enabled = False
+    _stream_pages = enabled
+
+def parse_stream(chunks, page_url, cancel_event=None, selectors=SELECTORS):
+    """
+    Extract the listings of a search results page while it is still downloading.
+
+    Parameters:
+    chunks (iterable): The raw HTML of the results page as byte strings.
+    page_url (str): The URL of the page, used to resolve relative links.
+    cancel_event (threading.Event): Event set when the search should stop, or None.
+    selectors (dict): The CSS selectors of the site, which html_parser.get_streaming_parser() must accept.
+
+    Yields:
+    Listing: Each listing.
+
+    Returns:
+    str: The absolute URL of the next page, or None on the last page.
+
+    Raises:
+    SearchCancelled: If the cancel event was set while the page was downloading.
+    """
+    def checked_chunks():
+        # Parsing runs between the chunks, so only the time spent waiting for them is download time
+        downloading = 0.0
+        iterator = iter(chunks)
+        try:
+            while True:
+                start = time.perf_counter()
+                chunk = next(iterator, None)
+                downloading += time.perf_counter() - start
+                if chunk is None:
+                    return
+                check_cancelled(cancel_event)
+                yield chunk
+        finally:
+            metrics.observe("download", downloading)
+
+    return (yield from html_parser.get_streaming_parser(selectors).parse(checked_chunks(), page_url))
+
+def iter_listings(search_params, cancel_event=None, progress_callback=None, client=None,
+                  max_pages=DEFAULT_MAX_PAGES, base_url=BASE_URL, stream=None, site=None):
+    """
+    Lazily crawl the result pages of a search and yield their listings.
+
+    A page is only fetched once every listing of the previous page has been consumed,
+    so a consumer that stops early never pays for the remaining pages.
+
+    Parameters:
+    search_params (dict): The search parameters.
+    cancel_event (threading.Event): Event set when the search should stop, or None.
+    progress_callback (callable): Called with a short progress message, or None.
+    client (HttpClient): The client used for fetching; defaults to the shared client.
+    max_pages (int): The maximum number of result pages followed.
+    base_url (str): The search page URL the query is appended to; ignored if a site is given.
+    stream (bool): Whether to parse pages while they download, or None for the set_streaming() choice;
+    pages of a site whose selectors cannot be streamed are parsed once downloaded.
+    site (SiteAdapter): The site to search, or None for the default site at base_url.
+
+    Yields:
+    Listing: The scraped listings in page order.
+
+    Returns:
+    bool: True once the last result page has been crawled, False if max_pages was reached first.
+
+    Raises:
+    ValueError: If a required search parameter is missing.
+    SearchCancelled: If the cancel event was set while the search was running.
+    ResponseTooLarge: If a page is larger than the client's max_body_bytes.
+    """
+    site = site or SiteAdapter("default", base_url)
+
+    # Check if required parameters are present
+    missing = [field for field in site.required_fields if field not in search_params]
+    if missing:
+        raise ValueError(f"Missing required search parameters: {', '.join(missing)}")
+
+    client = client or http_client.get_client()
+    stream = _stream_pages if stream is None else stream
+    if stream and html_parser.get_streaming_parser(site.selectors) is None:
+        stream = False
+    with metrics.timed("url_build"):
+        page_url = site.build_url(search_params)
+    for page_number in range(1, max_pages + 1):
+        # Fetch the page
+        check_cancelled(cancel_event)
+        if progress_callback is not None:
+            progress_callback(f"Fetching page {page_number}: {page_url}")
+        with metrics.timed("request"):
+            response = client.get(page_url, stream=True, cache_ttl=site.cache_ttl)
+        from_cache = getattr(response, "from_cache", False)
+        with response:
+            response.raise_for_status()
+            metrics.count("pages_fetched_total", "Result pages downloaded")
+            if stream and not from_cache:
+                # Listings reach the consumer while the rest of the page is still downloading
+                listing_count = 0
+                listings = parse_stream(client.iter_body(response), response.url, cancel_event, site.selectors)
+                while True:
+                    try:
+                        listing = next(listings)
+                    except StopIteration as stop:
+                        next_url = stop.value
+                        break
+                    listing_count += 1
+                    yield listing
+            else:
+                with metrics.timed("download"):
+                    content = client.read_body(response)
+
+        if not stream or from_cache:
+            # Scrape the page
+            check_cancelled(cancel_event)
+            with metrics.timed("parse"):
+                listings, next_url = parse_page(content, response.url, selectors=site.selectors)
+            listing_count = len(listings)
+            yield from listings
+
+        next_url = site.next_page_url(response.url, next_url, page_number, listing_count)
+        if not next_url or next_url == page_url:
+            return True
+        page_url = next_url
+    return False
+
+def run_search(search_params, is_seen=None, cancel_event=None, progress_callback=None, client=None,
+               max_pages=DEFAULT_MAX_PAGES, base_url=BASE_URL, stream=None, site=None):
+    """
+    Run a single search, stopping at the first listing that was already seen.
+
+    Result pages are sorted newest first, so everything after a known listing
+    is known as well and the remaining pages are never fetched.
+
+    This function does blocking network I/O and must not be called from the GUI thread.
+
+    Parameters:
+    search_params (dict): The search parameters.
+    is_seen (callable): Returns True for a listing found unchanged by an earlier run, or None to crawl every page.
+    cancel_event (threading.Event): Event set when the search should stop, or None.
+    progress_callback (callable): Called with a short progress message, or None.
+    client (HttpClient): The client used for fetching; defaults to the shared client.
+    max_pages (int): The maximum number of result pages followed.
+    base_url (str): The search page URL the query is appended to; ignored if a site is given.
+    stream (bool): Whether to parse pages while they download, or None for the set_streaming() choice.
+    site (SiteAdapter): The site to search, or None for the default site at base_url.
+
+    Returns:
+    SearchResult: The listings preceding the first seen one, and whether the crawl covered every page.
+
+    Raises:
+    ValueError: If a required search parameter is missing.
+    SearchCancelled: If the cancel event was set while the search was running.
+    """
+    crawl = iter_listings(search_params, cancel_event=cancel_event, progress_callback=progress_callback,
+                          client=client, max_pages=max_pages, base_url=base_url, stream=stream, site=site)
+    listings = []
+    while True:
+        try:
+            listing = next(crawl)
+        except StopIteration as stop:
+            complete = stop.value
+            break
+        if is_seen is not None and is_seen(listing):
+            crawl.close()
+            complete = False
+            break
+        listings.append(listing)
+
+    site_name = f" on {site.name}" if site is not None else ""
+    logger.info(f"Search {search_key(search_params)}{site_name} returned {len(listings)} unseen listings")
+    return SearchResult(listings, complete)
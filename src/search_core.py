@@ -0,0 +1,221 @@
+import logging
+import time
+import filters
+import http_client
+import html_parser
+import metrics
+import near_duplicates
+import scheduler
+import scraper
+import sites
+
+from functools import partial
+from listing_store import ListingDiff, listing_key
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default number of searches allowed to run at the same time
+DEFAULT_MAX_CONCURRENT_SEARCHES = 8
+
+def apply_settings(config):
+    """
+    Apply the process-wide settings of the config to the shared HTTP client, HTML parser, site registry,
+    listing filter and near-duplicate detection.
+
+    Parameters:
+    config (dict): The application config.
+    """
+    http_client.configure(config.get('http'))
+    html_parser.set_default_backend(config.get('html_parser', 'auto'))
+    metrics.configure(config.get('metrics'))
+    scraper.set_streaming(config.get('stream_pages', False))
+    sites.configure(config.get('sites'))
+    filters.configure(config.get('filters'))
+    near_duplicates.configure(config.get('duplicates'))
+
+def configured_searches(config):
+    """
+    Get every search described by the config, with the fan-out parameters expanded.
+
+    Parameters:
+    config (dict): The application config.
+
+    Returns:
+    list: One search parameter dict per search.
+    """
+    return scraper.expand_search_params(
+        config.get('search_params', {}),
+        config.get('combobox_options', {}),
+        config.get('fan_out', []),
+    )
+
+def scheduled_searches(config):
+    """
+    Get every search to schedule with its interval.
+
+    These are the configured searches, which use the base interval of the "schedule"
+    section, followed by the "saved_searches" entries, which may set their own interval.
+
+    Parameters:
+    config (dict): The application config.
+
+    Returns:
+    list: (search_params, interval_minutes) tuples.
+    """
+    interval = config.get('schedule', {}).get('interval_minutes', scheduler.DEFAULT_SETTINGS['interval_minutes'])
+    searches = [(search_params, interval) for search_params in configured_searches(config)]
+    for saved_search in config.get('saved_searches', []):
+        searches.append((saved_search['search_params'], saved_search.get('interval_minutes', interval)))
+    return searches
+
+class SearchPipeline:
+    """
+    A complete, GUI-free search cycle: crawl, diff against the listing store and notify.
+
+    The pipeline is thread-safe; the GUI runs it on a QThreadPool and the headless
+    daemon on a ThreadPoolExecutor.
+    """
+    def __init__(self, store, dispatcher=None, history=None, duplicates=None, exporter=None):
+        """
+        Initialize the SearchPipeline.
+
+        Parameters:
+        store (ListingStore): The store results are diffed against.
+        dispatcher (NotificationDispatcher): Receives the new listings of every run, or None.
+        history (PriceHistory): Records the prices of new and changed listings, or None.
+        duplicates (NearDuplicateIndex): Finds the new listings repeating earlier ones when
+        enabled in the "duplicates" settings, or None.
+        exporter (ListingExporter): Writes the listings of every run to the export files, or None.
+        """
+        self.store = store
+        self.dispatcher = dispatcher
+        self.history = history
+        self.duplicates = duplicates
+        self.exporter = exporter
+
+    def set_dispatcher(self, dispatcher):
+        """
+        Replace the notification dispatcher, stopping the previous one.
+
+        Parameters:
+        dispatcher (NotificationDispatcher): The new dispatcher, already started, or None; passing
+        the current dispatcher after reconfiguring it keeps it running.
+        """
+        previous, self.dispatcher = self.dispatcher, dispatcher
+        if previous is not None and previous is not dispatcher:
+            previous.stop()
+
+    def set_exporter(self, exporter):
+        """
+        Replace the listing exporter, stopping the previous one and sealing its current file.
+
+        Parameters:
+        exporter (ListingExporter): The new exporter, already started, or None; passing the
+        current exporter after reconfiguring it keeps it running.
+        """
+        previous, self.exporter = self.exporter, exporter
+        if previous is not None and previous is not exporter:
+            previous.stop()
+
+    def run(self, search_params, cancel_event=None, progress_callback=None):
+        """
+        Run one search on every enabled site and queue notifications and exports for its listings.
+
+        The listings of each site are stored, notified and exported as soon as its crawl ends,
+        without waiting for slower sites. Listings are only reported as disappeared once every
+        site was crawled completely.
+
+        Parameters:
+        search_params (dict): The search parameters.
+        cancel_event (threading.Event): Event set when the search should stop, or None.
+        progress_callback (callable): Called with a short progress message, or None.
+
+        Returns:
+        ListingDiff: The new, changed and disappeared listings of all sites, and the new ones that are near-duplicates.
+
+        Raises:
+        ValueError: If a required search parameter is missing.
+        SearchCancelled: If the cancel event was set while the search was running; the sites
+        finished by then are kept.
+        """
+        key = scraper.search_key(search_params)
+        started = time.time()
+        new, changed, disappeared, duplicates = [], [], [], []
+        with metrics.traced_run(key):
+            try:
+                complete = True
+                for _, result in sites.iter_site_results(
+                    search_params,
+                    is_seen=partial(self.store.is_known, key),
+                    cancel_event=cancel_event,
+                    progress_callback=progress_callback,
+                ):
+                    complete = complete and result.complete
+                    diff = self._apply(key, result.listings)
+                    new += diff.new
+                    changed += diff.changed
+                    duplicates += diff.duplicates
+                if complete:
+                    with metrics.timed("dedupe"):
+                        disappeared = self.store.mark_disappeared(key, started)
+                    if self.exporter is not None:
+                        self.exporter.export(key, disappeared=disappeared)
+            except scraper.SearchCancelled:
+                metrics.count("searches_total", "Search runs by outcome", outcome="cancelled")
+                raise
+            except Exception:
+                metrics.count("searches_total", "Search runs by outcome", outcome="failed")
+                raise
+        metrics.count("searches_total", "Search runs by outcome", outcome="completed")
+        return ListingDiff(new, changed, disappeared, duplicates)
+
+    def _apply(self, key, listings):
+        """
+        Filter, store, notify and export the listings one site found for a search.
+
+        Returns:
+        ListingDiff: The new and changed listings, and the new ones that are near-duplicates.
+        """
+        listing_filter = filters.get_filter()
+        if listing_filter:
+            with metrics.timed("filter"):
+                kept = listing_filter.apply(listings)
+            metrics.count("listings_filtered_total", "Listings dropped by the filter rules",
+                          amount=len(listings) - len(kept))
+            listings = kept
+        with metrics.timed("dedupe"):
+            diff = self.store.apply_run(key, listings, False)
+        if self.history is not None:
+            with metrics.timed("price_history"):
+                drops = self.history.record(key, diff.new + diff.changed)
+            metrics.count("price_drops_total", "Listings whose price went down", amount=len(drops))
+        settings = near_duplicates.get_settings()
+        if self.duplicates is not None and settings["enabled"] and diff.new:
+            with metrics.timed("near_duplicates"):
+                matches = self.duplicates.add(key, diff.new, settings["threshold"], settings["price_tolerance"])
+            for match in matches:
+                logger.info(f"Listing {match.listing.title} is a near-duplicate of {match.listing_key} "
+                            f"from search {match.search_key} (similarity {match.similarity:.2f})")
+            metrics.count("listings_near_duplicate_total", "New listings repeating an earlier one",
+                          amount=len(matches))
+            diff = diff._replace(duplicates=[match.listing for match in matches])
+
+        metrics.count("listings_new_total", "New listings found", amount=len(diff.new))
+        if self.dispatcher is not None:
+            self.dispatcher.notify(near_duplicates.to_notify(diff.new, {listing_key(listing) for listing in diff.duplicates}))
+        if self.exporter is not None:
+            self.exporter.export(key, diff.new, diff.changed)
+        return diff
+
+    def close(self):
+        """
+        Flush pending notifications and exports and close the store connections of the calling thread.
+        """
+        self.set_dispatcher(None)
+        self.set_exporter(None)
+        self.store.close()
+        if self.history is not None:
+            self.history.close()
+        if self.duplicates is not None:
+            self.duplicates.close()
@@ -0,0 +1,198 @@
+import logging
+import threading
+import scraper
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+class SearchSignals(QObject):
+    """
+    Signals emitted by a SearchTask while it runs on a worker thread.
+
+    The object is created on the GUI thread, so connected slots are invoked
+    through queued connections on the GUI event loop.
+    """
+    started = Signal(str)
+    progress = Signal(str, str)
+    result = Signal(str, object)
+    error = Signal(str, str)
+    cancelled = Signal(str)
+    finished = Signal(str)
+
+class SearchTask(QRunnable):
+    """
+    A single search executed on the QThreadPool.
+    """
+    def __init__(self, search_id, search_params, pipeline):
+        """
+        Initialize the SearchTask.
+
+        Parameters:
+        search_id (str): Identifier reported with every signal of this task.
+        search_params (dict): The search parameters passed to the scraper.
+        pipeline (SearchPipeline): The pipeline running the search.
+        """
+        super().__init__()
+        # The engine keeps a reference until the task has finished
+        self.setAutoDelete(False)
+        self.search_id = search_id
+        self.search_params = dict(search_params)
+        self.pipeline = pipeline
+        self.signals = SearchSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """
+        Request cancellation; the scraper stops at its next checkpoint.
+        """
+        self.cancel_event.set()
+
+    @Slot()
+    def run(self):
+        """
+        Run the search and report the outcome through the task signals.
+        """
+        self.signals.started.emit(self.search_id)
+        try:
+            diff = self.pipeline.run(
+                self.search_params,
+                cancel_event=self.cancel_event,
+                progress_callback=lambda message: self.signals.progress.emit(self.search_id, message),
+            )
+        except scraper.SearchCancelled:
+            logger.info(f"Search {self.search_id} cancelled")
+            self.signals.cancelled.emit(self.search_id)
+        except Exception as e:
+            logger.error(f"Search {self.search_id} failed: {e}", exc_info=True)
+            self.signals.error.emit(self.search_id, str(e))
+        else:
+            self.signals.result.emit(self.search_id, diff)
+        finally:
+            self.signals.finished.emit(self.search_id)
+
+class SearchEngine(QObject):
+    """
+    Executes searches on a thread pool and reports back to the GUI through signals.
+    """
+
+    # Signals re-emitted from the running tasks
+    search_started = Signal(str)
+    search_progress = Signal(str, str)
+    search_result = Signal(str, object)
+    search_failed = Signal(str, str)
+    search_cancelled = Signal(str)
+    search_finished = Signal(str)
+
+    def __init__(self, pipeline, parent=None, max_concurrency=None):
+        """
+        Initialize the SearchEngine.
+
+        Parameters:
+        pipeline (SearchPipeline): The GUI-free pipeline every search runs through.
+        parent (QObject): The parent object.
+        max_concurrency (int): Maximum number of searches running at once, or None for the Qt default.
+        """
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self._tasks = {}
+        self.pipeline = pipeline
+        if max_concurrency:
+            self.set_max_concurrency(max_concurrency)
+
+    def set_max_concurrency(self, max_concurrency):
+        """
+        Limit the number of searches running at once.
+
+        Parameters:
+        max_concurrency (int): The maximum number of worker threads.
+        """
+        self.thread_pool.setMaxThreadCount(max(1, int(max_concurrency)))
+
+    def submit(self, search_params, search_id=None):
+        """
+        Queue a search for execution.
+
+        Parameters:
+        search_params (dict): The search parameters.
+        search_id (str): Identifier for the search; defaults to the key of the parameters.
+
+        Returns:
+        str: The search id, or None if a search with the same id is already in flight.
+        """
+        search_id = search_id or scraper.search_key(search_params)
+        if search_id in self._tasks:
+            logger.info(f"Search {search_id} is still running, skipping")
+            return None
+
+        task = SearchTask(search_id, search_params, self.pipeline)
+        task.signals.started.connect(self.search_started)
+        task.signals.progress.connect(self.search_progress)
+        task.signals.result.connect(self.search_result)
+        task.signals.error.connect(self.search_failed)
+        task.signals.cancelled.connect(self.search_cancelled)
+        task.signals.finished.connect(self._on_task_finished)
+        self._tasks[search_id] = task
+        self.thread_pool.start(task)
+        return search_id
+
+    def cancel(self, search_id):
+        """
+        Cancel a queued or running search.
+
+        Parameters:
+        search_id (str): The id returned by submit().
+        """
+        task = self._tasks.get(search_id)
+        if task is None:
+            return
+        task.cancel()
+
+        # A task that has not started yet can be taken off the queue directly
+        if self.thread_pool.tryTake(task):
+            self.search_cancelled.emit(search_id)
+            self._on_task_finished(search_id)
+
+    def cancel_all(self):
+        """
+        Cancel every queued or running search.
+        """
+        for search_id in list(self._tasks):
+            self.cancel(search_id)
+
+    def is_running(self, search_id):
+        """
+        Check whether a search is queued or running.
+
+        Parameters:
+        search_id (str): The search id.
+
+        Returns:
+        bool: True if the search has not finished yet.
+        """
+        return search_id in self._tasks
+
+    def active_count(self):
+        """
+        Returns:
+        int: The number of queued or running searches.
+        """
+        return len(self._tasks)
+
+    def shutdown(self, timeout_ms=5000):
+        """
+        Cancel all searches and wait for the worker threads to stop.
+
+        Parameters:
+        timeout_ms (int): Maximum time to wait for running searches.
+        """
+        self.cancel_all()
+        self.thread_pool.waitForDone(timeout_ms)
+
+    def _on_task_finished(self, search_id):
+        """
+        Forget a finished task and forward the finished signal.
+        """
+        if self._tasks.pop(search_id, None) is not None:
+            self.search_finished.emit(search_id)
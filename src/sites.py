@@ -0,0 +1,238 @@
+import contextvars
+import importlib
+import logging
+import threading
+import scraper
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Upper bound of site crawls running at the same time, across all searches
+DEFAULT_MAX_PARALLEL_SITES = 16
+
+# Keys of a site definition that are passed on to SiteAdapter
+ADAPTER_KEYS = ("search_url", "selectors", "param_map", "value_map", "pagination", "required_fields", "cache_ttl")
+
+# The shared registry and pool, and the lock guarding their creation
+_registry = None
+_executor = None
+_lock = threading.Lock()
+
+def create_adapter(definition):
+    """
+    Build the adapter of a site definition.
+
+    A definition either describes the site itself, see SiteAdapter for its keys, or names
+    a plugin module with "plugin"; the module is imported here and its
+    create_adapter(definition) function builds the adapter.
+
+    Parameters:
+    definition (dict): One entry of the "sites" section of the config.
+
+    Returns:
+    SiteAdapter: The adapter.
+
+    Raises:
+    ValueError: If the definition is incomplete.
+    ImportError: If the plugin module cannot be imported.
+    """
+    if "plugin" in definition:
+        module = importlib.import_module(definition["plugin"])
+        return module.create_adapter(definition)
+    if "search_url" not in definition:
+        raise ValueError(f"Site {definition['name']} needs a search_url or a plugin")
+    return scraper.SiteAdapter(definition["name"], **{key: definition[key] for key in ADAPTER_KEYS if key in definition})
+
+class SiteRegistry:
+    """
+    The configured sites, with each adapter built on first use.
+
+    Building an adapter may import a plugin module, so a site costs nothing at startup
+    and a broken site only fails the searches that reach it.
+    """
+    def __init__(self, definitions=None):
+        """
+        Initialize the SiteRegistry.
+
+        Parameters:
+        definitions (list): The "sites" section of the config; entries with "enabled": false are skipped.
+
+        Raises:
+        ValueError: If a definition has no name or a name is used twice.
+        """
+        self._definitions = {}
+        for definition in definitions or []:
+            name = definition.get("name")
+            if not name:
+                raise ValueError(f"Site definition without a name: {definition}")
+            if name in self._definitions:
+                raise ValueError(f"Site {name} is defined twice")
+            if definition.get("enabled", True):
+                self._definitions[name] = definition
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        """
+        Returns:
+        list: The names of the enabled sites in config order.
+        """
+        return list(self._definitions)
+
+    def get(self, name):
+        """
+        Get the adapter of a site, building it on first use.
+
+        Parameters:
+        name (str): The site name.
+
+        Returns:
+        SiteAdapter: The adapter.
+
+        Raises:
+        KeyError: If no enabled site has this name.
+        """
+        with self._lock:
+            adapter = self._adapters.get(name)
+            if adapter is None:
+                adapter = self._adapters[name] = create_adapter(self._definitions[name])
+                logger.info(f"Site adapter {name} loaded")
+            return adapter
+
+def configure(definitions=None):
+    """
+    Replace the shared registry with one built from the given site definitions.
+
+    Parameters:
+    definitions (list): The "sites" section of the config, or None to only search the default site.
+
+    Returns:
+    SiteRegistry: The new shared registry.
+    """
+    global _registry
+    new_registry = SiteRegistry(definitions)
+    with _lock:
+        _registry = new_registry
+    logger.info(f"Sites configured: {', '.join(new_registry.names()) or 'default'}")
+    return new_registry
+
+def get_registry():
+    """
+    Get the shared registry, creating an empty one on first use.
+
+    Returns:
+    SiteRegistry: The shared registry.
+    """
+    global _registry
+    with _lock:
+        if _registry is None:
+            _registry = SiteRegistry()
+        return _registry
+
+def _get_executor():
+    """
+    Get the pool running the crawls of multi-site searches, starting it on first use.
+    """
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_PARALLEL_SITES, thread_name_prefix="site")
+        return _executor
+
+def iter_site_results(search_params, is_seen=None, cancel_event=None, progress_callback=None, registry=None):
+    """
+    Run a search on every enabled site, yielding the result of each site as soon as its crawl ends.
+
+    Sites are crawled in parallel, each stopping at its own first seen listing, so a slow
+    site does not hold back the listings of the others. A failing site is logged and yields
+    an empty, incomplete result, so its listings are not reported as gone.
+
+    This function does blocking network I/O and must not be called from the GUI thread.
+
+    Parameters:
+    search_params (dict): The search parameters.
+    is_seen (callable): Returns True for a listing found unchanged by an earlier run, or None to crawl every page.
+    cancel_event (threading.Event): Event set when the search should stop, or None.
+    progress_callback (callable): Called with a short progress message, or None.
+    registry (SiteRegistry): The sites to search; defaults to the shared registry.
+
+    Yields:
+    tuple: The site name, or None for the built-in default site, and its SearchResult, in completion order.
+
+    Raises:
+    ValueError: If a required search parameter is missing on every site.
+    SearchCancelled: If the cancel event was set while the search was running.
+    Exception: The error of the first site if every site failed.
+    """
+    registry = registry or get_registry()
+    names = registry.names()
+    if not names:
+        # Without configured sites the built-in default site is searched
+        yield None, scraper.run_search(search_params, is_seen=is_seen, cancel_event=cancel_event,
+                                       progress_callback=progress_callback)
+        return
+
+    def run_site(name):
+        site_progress = None
+        if progress_callback is not None:
+            site_progress = lambda message: progress_callback(f"{name}: {message}")
+        return scraper.run_search(search_params, is_seen=is_seen, cancel_event=cancel_event,
+                                  progress_callback=site_progress, site=registry.get(name))
+
+    if len(names) == 1:
+        yield names[0], run_site(names[0])
+        return
+
+    executor = _get_executor()
+    # Each crawl runs in a copy of the caller's context, so it keeps the sampling decision
+    # and the Sentry transaction of the run
+    futures = {executor.submit(contextvars.copy_context().run, run_site, name): name for name in names}
+    errors = {}
+    try:
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except scraper.SearchCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"Search {scraper.search_key(search_params)} failed on site {name}: {e}")
+                errors[name] = e
+                result = scraper.SearchResult([], False)
+            yield name, result
+    finally:
+        # Nothing is left to cancel unless the search was cancelled or the consumer stopped early;
+        # crawls already running see the same cancel event and stop on their own
+        for future in futures:
+            future.cancel()
+
+    if len(errors) == len(names):
+        raise errors[names[0]]
+
+def run_sites(search_params, is_seen=None, cancel_event=None, progress_callback=None, registry=None):
+    """
+    Run a search on every enabled site and merge the results, see iter_site_results().
+
+    The merged result is complete only if every site was crawled completely.
+
+    Parameters:
+    search_params (dict): The search parameters.
+    is_seen (callable): Returns True for a listing found unchanged by an earlier run, or None to crawl every page.
+    cancel_event (threading.Event): Event set when the search should stop, or None.
+    progress_callback (callable): Called with a short progress message, or None.
+    registry (SiteRegistry): The sites to search; defaults to the shared registry.
+
+    Returns:
+    SearchResult: The listings of all sites in site order, and whether every site was crawled completely.
+
+    Raises:
+    ValueError: If a required search parameter is missing on every site.
+    SearchCancelled: If the cancel event was set while the search was running.
+    Exception: The error of the first site if every site failed.
+    """
+    registry = registry or get_registry()
+    results = dict(iter_site_results(search_params, is_seen, cancel_event, progress_callback, registry))
+    listings = [listing for name in registry.names() or [None] if name in results for listing in results[name].listings]
+    return scraper.SearchResult(listings, all(result.complete for result in results.values()))
@@ -1,41 +1,106 @@
-import smtplib
-from email.mime.text import MIMEText
-from twilio.rest import Client
-import json
-
-def send_notifications(self, listings):
-    # Load the JSON config
-    with open('data/onfig.json', 'r') as f:
-        config = json.load(f)
-    notifications = config.get('notifications', {})
-    
-    # Check required notification fields
-    email = notifications.get('email')
-    phone = notifications.get('phone')
-    if not email or not phone:
-        print("Error: Email or phone number missing in config.json.")
-        return
-    
-    # Prepare the message content
-    message_body = "New listings found:\n" + "\n".join([f"{l['title']} - {l['price']}" for l in listings])
-    
-    # Send Email
-    msg = MIMEText(message_body)
-    msg['Subject'] = "New Car Listings Found"
-    msg['From'] = "your_email@example.com"
-    msg['To'] = email
-    with smtplib.SMTP('smtp.example.com', 587) as server:
-        server.starttls()
-        server.login("your_email@example.com", "your_password")
-        server.send_message(msg)
-    
-    # Send SMS via Twilio
-    account_sid = "your_twilio_sid"
-    auth_token = "your_twilio_token"
-    client = Client(account_sid, auth_token)
-    client.messages.create(
-        body=f"Found {len(listings)} new listings!",
-        from_="your_twilio_number",
-        to=phone
-    )
-    print("Notifications sent!")
\ No newline at end of file
+import logging
+import threading
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default Twilio settings, overridable through the "twilio" entry of the notifications config
+DEFAULT_TWILIO_SETTINGS = {
+    "account_sid": "your_twilio_sid",
+    "auth_token": "your_twilio_token",
+    "from_number": "your_twilio_number",
+}
+
+def format_sms(listings):
+    """
+    Build the SMS text for a batch of listings.
+
+    Parameters:
+    listings (list): The new listings.
+
+    Returns:
+    str: The message body.
+    """
+    return f"Found {len(listings)} new listings!"
+
+class TwilioSmsSink:
+    """
+    Sends SMS notifications through Twilio, reusing one client for every message.
+    """
+    name = "sms"
+
+    def __init__(self, phone, settings=None):
+        """
+        Initialize the TwilioSmsSink.
+
+        Parameters:
+        phone (str): The phone number messages are sent to.
+        settings (dict): Overrides for DEFAULT_TWILIO_SETTINGS.
+        """
+        self.phone = phone
+        self.settings = {**DEFAULT_TWILIO_SETTINGS, **(settings or {})}
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        """
+        Get the Twilio client, importing twilio and creating the client on first use.
+        """
+        with self._lock:
+            if self._client is None:
+                from twilio.rest import Client
+                self._client = Client(self.settings["account_sid"], self.settings["auth_token"])
+            return self._client
+
+    def send(self, listings):
+        """
+        Send one SMS summarizing the listings.
+
+        Parameters:
+        listings (list): The new listings.
+        """
+        self._get_client().messages.create(
+            body=format_sms(listings),
+            from_=self.settings["from_number"],
+            to=self.phone,
+        )
+
+    def close(self):
+        pass
+
+class LogSmsSink:
+    """
+    Stand-in for the Twilio sink that only logs and records the messages, for offline use.
+    """
+    name = "sms"
+
+    def __init__(self, phone, settings=None):
+        """
+        Initialize the LogSmsSink.
+
+        Parameters:
+        phone (str): The phone number messages would be sent to.
+        settings (dict): Ignored, accepted for compatibility with TwilioSmsSink.
+        """
+        self.phone = phone
+        self.sent = []
+
+    def send(self, listings):
+        """
+        Log the SMS that would have been sent.
+
+        Parameters:
+        listings (list): The new listings.
+        """
+        body = format_sms(listings)
+        self.sent.append((self.phone, body))
+        logger.info(f"SMS to {self.phone}: {body}")
+
+    def close(self):
+        pass
+
+# SMS sink classes by the "sms_backend" notifications setting
+SMS_BACKENDS = {
+    "twilio": TwilioSmsSink,
+    "log": LogSmsSink,
+}
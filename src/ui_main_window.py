@@ -1,18 +1,27 @@
 import os
 import logging
-import json
-import requests
+import threading
+import importlib
 
-from bs4 import BeautifulSoup
-from PySide6.QtCore import Signal, QTimer
+from PySide6.QtCore import Signal, QTimer, QFileSystemWatcher, QUrl, QSize
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QComboBox,
                                QLabel, QLineEdit, QPushButton, QDialog, QFormLayout, QDialogButtonBox,
-                               QListWidget, QInputDialog)
-from PySide6.QtGui import Qt, QPixmap
+                               QListWidget, QInputDialog, QCheckBox, QTableView, QHeaderView, QAbstractItemView)
+from PySide6.QtGui import Qt, QPixmap, QDesktopServices
+from ui_results_model import ResultsModel
+from image_loader import ImageLoader, THUMBNAIL_SIZE
+from scheduler import configure_scheduler, create_scheduler
+from config_service import ConfigService, ConfigError
+from exporters import configure_exporter
+import metrics
 
 # Get a logger for this module
 logger = logging.getLogger(__name__)
 
+# Modules of the search components, which pull in requests, the stores and the notification
+# sinks; they are imported on a background thread after the window is first shown
+SEARCH_MODULES = ("search_core", "search_engine", "price_history", "near_duplicates", "notifications")
+
 class AddParameterDialog(QDialog):
     """Dialog for adding a new parameter."""
     def __init__(self, parent=None):
@@ -80,6 +89,8 @@ class MainWindow(QMainWindow):
     # Signals to interact with other parts of the application
     start_app_signal = Signal()
     quit_app_signal = Signal()
+    # Emitted from the background thread once SEARCH_MODULES are imported
+    search_modules_loaded = Signal()
     
     def __init__(self, parent=None):
         """
@@ -91,22 +102,52 @@ class MainWindow(QMainWindow):
         
         # Initialize the dialog with the parent widget 
         super().__init__(parent)
+        # Single-shot timer armed for the next search due in the scheduler
+        self.scheduler = create_scheduler(None)
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.start_search)
-        self.is_searching = False  # Prevents overlapping searches
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.run_due_searches)
+        
+        # Searches run through the GUI-free pipeline on a thread pool so the event loop stays responsive.
+        # Both are created by ensure_search_backend() once the window has been shown, or on first use.
+        self.search_pipeline = None
+        self.search_engine = None
+        # Config applied to the search components once they exist
+        self.pending_config = None
+        self.preload_started = False
+        self.search_modules_loaded.connect(self.ensure_search_backend)
+        # Icons and listing thumbnails are downloaded and decoded off the GUI thread
+        self.image_loader = ImageLoader(self)
+        # Current listings of every search, updated from the diff of each run
+        self.results_model = ResultsModel(self, image_loader=self.image_loader)
         
         # UI for timer
         self.interval_input = QLineEdit("60")  # Default: 60 minutes
-        self.set_timer_button = QPushButton("Set Timer")
-        self.set_timer_button.clicked.connect(self.set_timer_interval)
+        self.set_timer_button = self.create_button("Set Timer", self.set_timer_interval)
+        self.stop_timer_button = self.create_button("Stop Timer", self.stop_timer)
         
         self.parameters = {}
+        # "All options" checkboxes of the parameters that can be fanned out
+        self.fan_out_checkboxes = {}
+        self.fan_out_keys = []
         # Predefined options for certain parameters
         self.combobox_options = {
             "model": ["VW ID7", "VW ID3", "VW ID4", "Other"],
             "year": ["2019", "2020", "2021", "2022", "2023"]
         }
         
+        # The config is loaded once and reloaded only when the file changes on disk
+        self.config_service = ConfigService()
+        self.config_service.add_listener(self.on_config_reloaded)
+        self.config_watcher = QFileSystemWatcher(self)
+        self.config_watcher.fileChanged.connect(self.on_config_file_changed)
+        
+        # Edits in the form are saved after a short pause, so bursts of changes cost one write
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(500)
+        self.save_timer.timeout.connect(self.save_parameters)
+        
         # Initialize the UI components
         self.init_ui()
         
@@ -127,22 +168,39 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout(central_widget) 
 
         # Create the header layout
-        header_layout = self.create_header_layout(icon_path)
+        header_layout = self.create_header_layout(icon_path, self.image_loader)
         layout.addLayout(header_layout)
         
         # Parameter layout for dynamic rows
         self.parameter_layout = QVBoxLayout()
         layout.addLayout(self.parameter_layout)
         
+        # Timer row to repeat the search on a schedule
+        timer_layout = QHBoxLayout()
+        timer_layout.addWidget(QLabel("Search every (minutes):"))
+        timer_layout.addWidget(self.interval_input)
+        timer_layout.addWidget(self.set_timer_button)
+        timer_layout.addWidget(self.stop_timer_button)
+        layout.addLayout(timer_layout)
+        
         # Create buttons
         add_button = self.create_button("Add New Parameter", self.add_parameter)
         start_button = self.create_button("Start Search", self.start_search)
+        stop_button = self.create_button("Stop Search", self.stop_search)
         close_button = self.create_button("Close", self.close)
         
-        buttons = [start_button, close_button, add_button]
+        buttons = [start_button, stop_button, close_button, add_button]
          
         for button in buttons:
             layout.addWidget(button)
+
+        # Results panel
+        self.results_label = QLabel()
+        layout.addWidget(self.results_label)
+        self.results_view = self.create_results_view(self.results_model)
+        self.results_view.doubleClicked.connect(self.open_listing)
+        layout.addWidget(self.results_view, 1)
+        self.update_results_label()
             
         # Set the main layout and tab order
         self.setLayout(layout)  # Note: For QMainWindow, this is handled via central widget
@@ -151,26 +209,129 @@ class MainWindow(QMainWindow):
         # Load existing parameters
         self.load_parameters()
 
+    def showEvent(self, event):
+        """Start importing the search components once the window has been painted for the first time."""
+        super().showEvent(event)
+        if not self.preload_started:
+            self.preload_started = True
+            QTimer.singleShot(0, self.preload_search_modules)
+
+    def preload_search_modules(self):
+        """Import SEARCH_MODULES on a background thread and create the search components when done."""
+        def preload():
+            try:
+                for name in SEARCH_MODULES:
+                    importlib.import_module(name)
+            except ImportError as e:
+                logger.error(f"Cannot preload the search components: {e}")
+            finally:
+                # Queued to the GUI thread, where the components are created
+                self.search_modules_loaded.emit()
+
+        threading.Thread(target=preload, name="search-preload", daemon=True).start()
+
+    def ensure_search_backend(self):
+        """
+        Create the search pipeline and engine if they do not exist yet and load the stored listings.
+
+        Returns:
+        SearchEngine: The search engine.
+        """
+        if self.search_engine is not None:
+            return self.search_engine
+        from search_core import SearchPipeline, DEFAULT_MAX_CONCURRENT_SEARCHES
+        from search_engine import SearchEngine
+        from listing_store import ListingStore
+        from near_duplicates import NearDuplicateIndex
+        from price_history import PriceHistory
+
+        self.search_pipeline = SearchPipeline(ListingStore(), history=PriceHistory(), duplicates=NearDuplicateIndex())
+        self.search_engine = SearchEngine(self.search_pipeline, self, max_concurrency=DEFAULT_MAX_CONCURRENT_SEARCHES)
+        self.search_engine.search_started.connect(self.on_search_started)
+        self.search_engine.search_progress.connect(self.on_search_progress)
+        self.search_engine.search_result.connect(self.on_search_result)
+        self.search_engine.search_failed.connect(self.on_search_failed)
+        self.search_engine.search_cancelled.connect(self.on_search_cancelled)
+        self.search_engine.search_finished.connect(self.arm_timer)
+        self.results_model.set_listings(self.search_pipeline.store.active_listings())
+        self.update_results_label()
+        if self.pending_config is not None:
+            self.apply_config(self.pending_config)
+            self.pending_config = None
+        return self.search_engine
+
     def set_timer_interval(self):
-        interval_minutes = int(self.interval_input.text())
-        self.timer.setInterval(interval_minutes * 60 * 1000)  # Convert to milliseconds
-        self.timer.start()
-        print(f"Search scheduled every {interval_minutes} minutes.")
+        """
+        Schedule every combination of the current parameters, starting now.
+
+        The interval is the base interval; the scheduler shortens it for searches that
+        often find new listings, lengthens it for idle ones and adds random jitter.
+        """
+        interval_minutes = self.read_interval()
+        if interval_minutes is None:
+            logger.warning(f"Invalid search interval {self.interval_input.text()!r}")
+            self.statusBar().showMessage("Error: The interval must be a positive number of minutes.")
+            return
+        self.ensure_search_backend()
+        self.scheduler.clear()
+        for search_id, (search_params, interval) in self.scheduled_combinations(interval_minutes).items():
+            self.scheduler.add(search_id, search_params, interval)
+        self.arm_timer()
+        self.schedule_save()
+        logger.info(f"Search scheduled every {interval_minutes:g} minutes")
+        self.statusBar().showMessage(f"Search scheduled every {interval_minutes:g} minutes.")
+
+    def read_interval(self):
+        """
+        Get the base interval entered in the timer input.
+
+        Returns:
+        float: The interval in minutes, or None if the input is not a positive number.
+        """
+        try:
+            interval_minutes = float(self.interval_input.text())
+        except ValueError:
+            return None
+        return interval_minutes if interval_minutes > 0 else None
+
+    def scheduled_combinations(self, interval_minutes):
+        """
+        Get every combination of the current parameters to schedule.
+
+        Parameters:
+        interval_minutes (float): The base interval of every search.
+
+        Returns:
+        dict: {search_id: (search_params, interval in seconds)}, as taken by SearchScheduler.replace().
+        """
+        from scraper import expand_search_params, search_key
+        combinations = expand_search_params(self.get_search_params(), self.combobox_options, self.get_fan_out_keys())
+        return {search_key(search_params): (search_params, interval_minutes * 60) for search_params in combinations}
 
     def stop_timer(self):
+        """Unschedule every search."""
+        self.scheduler.clear()
         self.timer.stop()
-        print("Timer stopped.")
-        
-    def load_parameters(self):
-        """Load parameters from a config file."""
-        try:
-            with open('data/config.json', 'r') as f:
-                config = json.load(f)
-                for key, value in config.get('search_params', {}).items():
-                    self.add_parameter_row(key, str(value))
-        except FileNotFoundError:
-            pass  # Start with empty parameters if no config exists
+        logger.info("Search schedule stopped")
+        self.statusBar().showMessage("Timer stopped.")
 
+    def arm_timer(self, *_):
+        """Start the single-shot timer for the next due search, or stop it if nothing is scheduled."""
+        due_in = self.scheduler.next_due_in()
+        if due_in is None:
+            self.timer.stop()
+        else:
+            self.timer.start(int(due_in * 1000))
+
+    def run_due_searches(self):
+        """Submit every search the scheduler reports as due."""
+        search_engine = self.ensure_search_backend()
+        for search in self.scheduler.pop_due():
+            if search_engine.submit(search.search_params, search.search_id) is None:
+                # A manual run of the same search is in flight, count it as this run
+                self.scheduler.complete(search.search_id)
+        self.arm_timer()
+        
     def add_parameter(self):
         """Open a dialog to add a new parameter."""
         dialog = AddParameterDialog(self)
@@ -183,6 +344,7 @@ class MainWindow(QMainWindow):
                 if options:
                     self.combobox_options[name] = options
                 self.add_parameter_row(name, value)
+                self.schedule_save()
 
     def add_parameter_row(self, name, value):
         """Add a new parameter row to the parameter_layout."""
@@ -199,20 +361,37 @@ class MainWindow(QMainWindow):
                 else:
                     value_widget.setCurrentText("Other")
             edit_options_button = self.create_button("Edit Options", lambda: self.edit_options(name))
+            # Search every option of this parameter instead of only the selected one
+            fan_out_checkbox = QCheckBox("All options")
+            fan_out_checkbox.setChecked(name in self.fan_out_keys)
+            fan_out_checkbox.toggled.connect(value_widget.setDisabled)
+            value_widget.setDisabled(fan_out_checkbox.isChecked())
         else:
             value_widget = QLineEdit(value)
             edit_options_button = None
+            fan_out_checkbox = None
 
         remove_button = self.create_button("Remove", lambda: self.remove_parameter(name))
 
         row_layout.addWidget(name_label)
         row_layout.addWidget(value_widget)
+        if fan_out_checkbox:
+            row_layout.addWidget(fan_out_checkbox)
+            self.fan_out_checkboxes[name] = fan_out_checkbox
         if edit_options_button:
             row_layout.addWidget(edit_options_button)
         row_layout.addWidget(remove_button)
         self.parameter_layout.addLayout(row_layout)
 
         self.parameters[name] = (value_widget, row_layout)
+
+        # Persist later edits of this row
+        if isinstance(value_widget, QComboBox):
+            value_widget.currentTextChanged.connect(self.schedule_save)
+        else:
+            value_widget.editingFinished.connect(self.schedule_save)
+        if fan_out_checkbox:
+            fan_out_checkbox.toggled.connect(self.schedule_save)
     
     def edit_options(self, name):
         """Open a dialog to edit options for the given parameter."""
@@ -231,67 +410,230 @@ class MainWindow(QMainWindow):
                         value_widget.setCurrentIndex(index)
                     else:
                         value_widget.setCurrentIndex(0)
+                self.schedule_save()
     
     def load_parameters(self):
-        """Load parameters from a config file."""
+        """Load parameters from the config and watch the config file for changes."""
         try:
-            with open('data/config.json', 'r') as f:
-                config = json.load(f)
-                self.combobox_options = config.get('combobox_options', self.combobox_options)
-                for key, value in config.get('search_params', {}).items():
-                    self.add_parameter_row(key, str(value))
+            config = self.config_service.get()
         except FileNotFoundError:
-            pass  # Start with empty parameters if no config exists
+            return  # Start with empty parameters if no config exists
+        except ValueError as e:
+            logger.error(f"Cannot load the config: {e}")
+            return
+        self.scheduler = create_scheduler(config.get('schedule'))
+        self.apply_config(config)
+        self.show_parameters(config)
+        self.config_watcher.addPath(self.config_service.path)
+
+    def apply_config(self, config):
+        """
+        Apply the settings of the config to the search components.
+
+        Parameters:
+        config (dict): The application config.
+        """
+        if self.search_engine is None:
+            # Applied by ensure_search_backend()
+            self.pending_config = config
+            return
+        import search_core
+        from notifications import configure_dispatcher
+        search_core.apply_settings(config)
+        self.search_engine.set_max_concurrency(
+            config.get('max_concurrent_searches', search_core.DEFAULT_MAX_CONCURRENT_SEARCHES))
+        # Reconfigured in place: searches still running keep notifying it, and stopping it would
+        # wait for its pending batch on the GUI thread
+        self.search_pipeline.set_dispatcher(
+            configure_dispatcher(self.search_pipeline.dispatcher, config.get('notifications')))
+        # Reconfigured in place, a second exporter would write to the same files
+        self.search_pipeline.set_exporter(configure_exporter(self.search_pipeline.exporter, config.get('exports')))
+
+    def show_parameters(self, config):
+        """
+        Replace the parameter rows and the timer interval with those of the config.
+
+        Parameters:
+        config (dict): The application config.
+        """
+        for name in list(self.parameters):
+            self.remove_parameter(name, save=False)
+        self.interval_input.setText(str(config.get('schedule', {}).get('interval_minutes', 60)))
+        self.combobox_options = dict(config.get('combobox_options', self.combobox_options))
+        self.fan_out_keys = config.get('fan_out', [])
+        for key, value in config.get('search_params', {}).items():
+            self.add_parameter_row(key, str(value))
+
+    def on_config_file_changed(self, path):
+        """Reload the config after the file was changed on disk."""
+        # Atomic writes replace the file, which removes it from the watcher
+        if path not in self.config_watcher.files() and os.path.exists(path):
+            self.config_watcher.addPath(path)
+        self.config_service.check_for_changes()
+
+    def on_config_reloaded(self, config):
+        """Apply a config that was changed outside the application."""
+        self.save_timer.stop()
+        configure_scheduler(self.scheduler, config.get('schedule'))
+        self.apply_config(config)
+        self.show_parameters(config)
+        if self.scheduler.searches:
+            # Keep the schedule running with the new parameters and interval
+            interval_minutes = self.read_interval()
+            if interval_minutes is None:
+                return
+            self.scheduler.replace(self.scheduled_combinations(interval_minutes))
+            self.arm_timer()
+
+    def schedule_save(self, *_):
+        """Save the parameters once the form has not changed for a moment."""
+        self.save_timer.start()
+
+    def save_parameters(self):
+        """Atomically write the parameters, options and timer interval to the config."""
+        try:
+            schedule = dict(self.config_service.get().get('schedule', {}))
+        except (OSError, ValueError):
+            schedule = {}
+        interval_minutes = self.read_interval()
+        if interval_minutes is not None:
+            schedule['interval_minutes'] = interval_minutes  # Keep the saved interval while the input is invalid
+        try:
+            self.config_service.update({
+                'search_params': self.get_parameter_values(),
+                'combobox_options': self.combobox_options,
+                'fan_out': self.get_fan_out_keys(),
+                'schedule': schedule,
+            })
+        except (ConfigError, OSError) as e:
+            logger.error(f"Failed to save the config: {e}")
         
-    def remove_parameter(self, name):
-        """Remove a parameter row from the layout."""
+
+    def remove_parameter(self, name, save=True):
+        """
+        Remove a parameter row from the layout.
+
+        Parameters:
+        name (str): The name of the parameter.
+        save (bool): Whether to persist the change to the config.
+        """
         value_edit, row_layout = self.parameters.pop(name)
+        self.fan_out_checkboxes.pop(name, None)
         for i in reversed(range(row_layout.count())):
             widget = row_layout.itemAt(i).widget()
             if widget is not None:
                 widget.deleteLater()
         self.parameter_layout.removeItem(row_layout)
+        if save:
+            self.schedule_save()
+
+    def get_parameter_values(self):
+        """
+        Collect the values of all parameter rows.
+
+        Returns:
+        dict: The parameter names mapped to their values.
+        """
+        values = {}
+        for name, (value_widget, _) in self.parameters.items():
+            if isinstance(value_widget, QComboBox):
+                values[name] = value_widget.currentText()
+            else:
+                values[name] = value_widget.text()
+        return values
+
+    def get_search_params(self):
+        """
+        Collect the current search parameters from the parameter rows.
+
+        Returns:
+        dict: The parameter names mapped to their non-empty values.
+        """
+        return {name: value for name, value in self.get_parameter_values().items() if value}
+
+    def get_fan_out_keys(self):
+        """
+        Get the parameters whose options should all be searched.
+
+        Returns:
+        list: The names of the parameters with "All options" checked.
+        """
+        return [name for name, checkbox in self.fan_out_checkboxes.items() if checkbox.isChecked()]
 
     def start_search(self):
-        if self.is_searching:
-            print("Waiting for previous search to finish...")
-            return
-        self.is_searching = True
-        try:
-            # Your scraper logic here
-            print("Running search...")
-        finally:
-            self.is_searching = False
-            
-        # Load the JSON config
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-        search_params = config.get('search_params', {})
-        
-        # Check if required parameters are present
-        required_fields = ['model', 'year']  # Adjust based on your needs
-        if not all(field in search_params for field in required_fields):
-            print("Error: Missing required search parameters.")
-            return
-        
-        # Construct the search URL
-        base_url = "https://www.example.com/search?"
-        query = "&".join([f"{key}={value}" for key, value in search_params.items()])
-        search_url = base_url + query
-        
-        # Fetch and scrape the page
-        response = requests.get(search_url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract listings (adjust selectors to match the website)
-        listings = []
-        for item in soup.select('.listing-item'):
-            title = item.select_one('.title').text
-            price = item.select_one('.price').text
-            listings.append({'title': title, 'price': price})
-        
-        print("Scraped listings:", listings)
-        # Next: Send these listings to the notification system
+        """
+        Submit a search for the current parameters to the search engine.
+
+        Parameters marked "All options" are expanded into every combination of their
+        options, and the combinations run concurrently on the search engine.
+        """
+        from scraper import expand_search_params
+        search_engine = self.ensure_search_backend()
+        combinations = expand_search_params(self.get_search_params(), self.combobox_options, self.get_fan_out_keys())
+        skipped = sum(1 for search_params in combinations if search_engine.submit(search_params) is None)
+        if skipped:
+            logger.info(f"Waiting for {skipped} previous search(es) to finish")
+            self.statusBar().showMessage(f"Waiting for {skipped} previous search(es) to finish...")
+
+    def stop_search(self):
+        """Cancel all queued and running searches."""
+        if self.search_engine is not None:
+            self.search_engine.cancel_all()
+
+    def on_search_started(self, search_id):
+        """Show that a search has started running."""
+        self.statusBar().showMessage("Running search...")
+
+    def on_search_progress(self, search_id, message):
+        """Show the latest progress message of a search."""
+        self.statusBar().showMessage(message)
+
+    def on_search_result(self, search_id, diff):
+        """Apply the listing diff of a finished search to the results panel."""
+        self.scheduler.complete(search_id, len(diff.new))
+        self.statusBar().showMessage(
+            f"{len(diff.new)} new, {len(diff.changed)} changed, {len(diff.disappeared)} disappeared listings")
+        self.results_model.apply_diff(search_id, diff)
+        self.update_results_label()
+
+    def update_results_label(self):
+        """Show the number of current listings above the results panel."""
+        self.results_label.setText(f"Results ({self.results_model.total_count()} listings):")
+
+    def open_listing(self, index):
+        """Open the listing of a double-clicked row in the browser."""
+        listing = self.results_model.listing(index.row())
+        if listing.url:
+            QDesktopServices.openUrl(QUrl(listing.url))
+
+    def on_search_failed(self, search_id, error_message):
+        """Report a search that raised an error."""
+        self.scheduler.complete(search_id)
+        # The search engine has logged the error with its traceback already
+        self.statusBar().showMessage(f"Search failed: {error_message}")
+
+    def on_search_cancelled(self, search_id):
+        """Report a search that was cancelled."""
+        self.scheduler.complete(search_id)
+        self.statusBar().showMessage("Search cancelled")
+
+    def closeEvent(self, event):
+        """Save pending edits, stop the timer, wait for running searches and flush notifications before closing."""
+        if self.save_timer.isActive():
+            self.save_timer.stop()
+            self.save_parameters()
+        self.timer.stop()
+        if self.search_engine is not None:
+            self.search_engine.shutdown()
+            self.search_pipeline.close()
+        self.image_loader.shutdown()
+        export_path = metrics.get_settings()['export_path']
+        if export_path:
+            try:
+                metrics.registry.export(export_path)
+            except OSError as e:
+                logger.error(f"Failed to export metrics to {export_path}: {e}")
+        super().closeEvent(event)
         
     def set_tab_order(self, buttons):
         """
@@ -303,6 +645,37 @@ class MainWindow(QMainWindow):
         for i in range(len(buttons) - 1):
             self.setTabOrder(buttons[i], buttons[i + 1])
 
+    @staticmethod
+    def create_results_view(model):
+        """
+        Create the table showing the results.
+
+        Rows have a fixed height that fits a thumbnail, so the view can place any row
+        without measuring the others, and only the visible rows are painted.
+
+        Parameters:
+        model (ResultsModel): The results to show.
+
+        Returns:
+        QTableView: The table view.
+        """
+        view = QTableView()
+        view.setModel(model)
+        view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        view.setWordWrap(False)
+        view.setAlternatingRowColors(True)
+        view.verticalHeader().hide()
+        view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        view.verticalHeader().setDefaultSectionSize(max(view.fontMetrics().height() + 6, THUMBNAIL_SIZE + 4))
+        view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        view.horizontalHeader().setStretchLastSection(True)
+        view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        view.setSortingEnabled(True)
+        view.setColumnWidth(0, 300)
+        return view
+
     @staticmethod
     def create_button(text, click_handler):
         """
@@ -366,12 +739,16 @@ class MainWindow(QMainWindow):
         return os.path.join(os.path.dirname(__file__), "data/icon.png")
     
     @staticmethod
-    def create_header_layout(icon_path):
+    def create_header_layout(icon_path, image_loader):
         """
         Create the header layout containing the icon and welcome text.
 
+        The icon is decoded and scaled by the image loader on a worker thread; a gray
+        placeholder is shown until it is ready, and stays if the icon is missing.
+
         Parameters:
         icon_path (str): Path to the icon image file.
+        image_loader (ImageLoader): Loads the icon.
 
         Returns:
         QHBoxLayout: A layout containing the icon and welcome text.
@@ -380,22 +757,25 @@ class MainWindow(QMainWindow):
         # Create a horizontal layout
         horizontal_layout = QHBoxLayout()
 
-        # Load the icon
-        icon_pixmap = QPixmap(icon_path)
-        if icon_pixmap.isNull():
-            icon_pixmap = QPixmap(32, 32)  # Create a blank pixmap as a placeholder
-            icon_pixmap.fill(Qt.gray)  # Optional: Add color for a placeholder
-            welcome_label = QLabel("Welcome! (Icon missing)")
-        else:
-            icon_pixmap = icon_pixmap.scaled(32, 32, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            icon_label = QLabel()
-            icon_label.setPixmap(icon_pixmap)
-            icon_label.setFixedSize(32, 32)
-            horizontal_layout.addWidget(icon_label)
+        # Show a placeholder until the icon is loaded
+        icon_pixmap = QPixmap(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        icon_pixmap.fill(Qt.gray)
+        icon_label = QLabel()
+        icon_label.setPixmap(icon_pixmap)
+        icon_label.setFixedSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        horizontal_layout.addWidget(icon_label)
+
+        def show_icon(source):
+            pixmap = image_loader.request(icon_path) if source == icon_path else None
+            if pixmap is not None:
+                icon_label.setPixmap(pixmap)
+
+        # Requests the icon, or shows it at once if it is loaded already
+        image_loader.image_ready.connect(show_icon)
+        show_icon(icon_path)
 
         # Welcome label
-        if 'welcome_label' not in locals():
-            welcome_label = QLabel("WebScrapper!\nSetup your search and press Enter to start:")
+        welcome_label = QLabel("WebScrapper!\nSetup your search and press Enter to start:")
 
         # Add the welcome label to the layout
         horizontal_layout.addWidget(welcome_label)
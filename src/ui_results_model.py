@@ -0,0 +1,313 @@
+import logging
+
+from collections import namedtuple
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from listing_store import listing_key
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Rows handed to the view per fetchMore() call
+DEFAULT_FETCH_BATCH = 500
+
+# Sorted inserts above this count are applied as one layout change instead of row by row
+BULK_INSERT_THRESHOLD = 200
+
+# One listing of the results table with the search that found it
+ResultRow = namedtuple("ResultRow", ["search_key", "key", "listing"])
+
+class ResultsModel(QAbstractTableModel):
+    """
+    Table of the current listings of every search, updated in place from listing diffs.
+
+    All rows are held as lightweight tuples, but the view only sees the rows fetched so
+    far: they are handed out in batches through canFetchMore()/fetchMore() as the view
+    scrolls, so the view never lays out more rows than it shows. Sorting is done here on
+    all rows rather than in a proxy, which could only sort the fetched ones, and every
+    diff is applied as row inserts, data changes and row removals, so the selection and
+    scroll position survive a search cycle. Listing images are shown as thumbnails once
+    the image loader has them; only the rows the view paints request them.
+    """
+    COLUMNS = ("Title", "Price", "Search", "Link")
+
+    def __init__(self, parent=None, fetch_batch=DEFAULT_FETCH_BATCH, image_loader=None):
+        """
+        Initialize the ResultsModel.
+
+        Parameters:
+        parent (QObject): The parent object.
+        fetch_batch (int): The number of rows handed to the view per fetchMore() call.
+        image_loader (ImageLoader): Loads the thumbnails of the listing images, or None to show none.
+        """
+        super().__init__(parent)
+        self.fetch_batch = fetch_batch
+        self.image_loader = image_loader
+        # Rows waiting for the thumbnail of each image URL, by row id
+        self._waiting_images = {}
+        if image_loader is not None:
+            image_loader.image_ready.connect(self._on_image_ready)
+            image_loader.image_failed.connect(lambda source, error: self._waiting_images.pop(source, None))
+        self._rows = []
+        self._loaded = 0
+        # Maps (search_key, listing key) to the row index; rebuilt lazily after rows moved
+        self._positions = None
+        self._sort_column = None
+        self._sort_order = Qt.AscendingOrder
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        row = self._rows[index.row()]
+        listing = row.listing
+        if role == Qt.DisplayRole:
+            return (listing.title, listing.price, row.search_key, listing.url or "")[index.column()]
+        if role == Qt.ToolTipRole:
+            return listing.url or listing.title
+        if role == Qt.TextAlignmentRole and index.column() == 1:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        if role == Qt.DecorationRole and index.column() == 0 and listing.image_url and self.image_loader is not None:
+            pixmap = self.image_loader.request(listing.image_url)
+            if pixmap is None:
+                self._waiting_images.setdefault(listing.image_url, set()).add((row.search_key, row.key))
+            return pixmap
+        if role == Qt.UserRole:
+            return listing
+        return None
+
+    def _on_image_ready(self, source):
+        """
+        Repaint the title cells of the rows waiting for a thumbnail.
+        """
+        for row_id in self._waiting_images.pop(source, ()):
+            position = self._position(row_id)
+            if position is not None and position < self._loaded:
+                index = self.index(position, 0)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._rows)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.fetch_batch, len(self._rows) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def listing(self, row):
+        """
+        Get the listing shown in a row.
+
+        Parameters:
+        row (int): The row index.
+
+        Returns:
+        Listing: The listing.
+        """
+        return self._rows[row].listing
+
+    def total_count(self):
+        """
+        Returns:
+        int: The number of listings, including those not fetched by the view yet.
+        """
+        return len(self._rows)
+
+    def _sort_key(self, row):
+        """
+        Get the value a row is ordered by in the current sort column.
+        """
+        listing = row.listing
+        if self._sort_column == 0:
+            return listing.title.casefold()
+        if self._sort_column == 1:
+            # Unparsed prices sort after every parsed one
+            return (listing.price_cents is None, listing.currency or "", listing.price_cents or 0)
+        if self._sort_column == 2:
+            return row.search_key
+        return listing.url or ""
+
+    def _position(self, row_id):
+        """
+        Get the index of a row by its (search_key, listing key) id, or None.
+        """
+        if self._positions is None:
+            self._positions = {(row.search_key, row.key): index for index, row in enumerate(self._rows)}
+        return self._positions.get(row_id)
+
+    def _insert_position(self, row):
+        """
+        Find where a row belongs in the current sort order; after its equals, like a stable sort.
+        """
+        if self._sort_column is None:
+            return len(self._rows)
+        key = self._sort_key(row)
+        descending = self._sort_order == Qt.DescendingOrder
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            other = self._sort_key(self._rows[middle])
+            if (key > other) if descending else (key < other):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _rearrange(self, update):
+        """
+        Apply a change that reorders rows, keeping the row and column count, as one layout change.
+
+        Parameters:
+        update (callable): Reorders or replaces self._rows; the number of rows it adds is
+        added to the unfetched rows.
+        """
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        ids = [(self._rows[index.row()].search_key, self._rows[index.row()].key) for index in persistent]
+        update()
+        self._positions = None
+        moved = []
+        for index, row_id in zip(persistent, ids):
+            position = self._position(row_id)
+            moved.append(self.index(position, index.column())
+                         if position is not None and position < self._loaded else QModelIndex())
+        self.changePersistentIndexList(persistent, moved)
+        self.layoutChanged.emit()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sort every row, fetched or not, by a column; a negative column keeps the current order.
+        """
+        if column < 0:
+            self._sort_column = None
+            return
+        self._sort_column, self._sort_order = column, order
+        self._rearrange(lambda: self._rows.sort(key=self._sort_key, reverse=order == Qt.DescendingOrder))
+
+    def set_listings(self, listings):
+        """
+        Replace every row, e.g. with the stored listings at startup.
+
+        Parameters:
+        listings (list): (search_key, Listing) tuples.
+        """
+        self.beginResetModel()
+        self._rows = [ResultRow(search_key, listing_key(listing), listing) for search_key, listing in listings]
+        if self._sort_column is not None:
+            self._rows.sort(key=self._sort_key, reverse=self._sort_order == Qt.DescendingOrder)
+        self._loaded = min(self.fetch_batch, len(self._rows))
+        self._positions = None
+        self.endResetModel()
+
+    def apply_diff(self, search_key, diff):
+        """
+        Update the rows of a search from the diff of its latest run.
+
+        Disappeared listings are removed, changed ones updated in place (or moved if their
+        sort position changed) and new ones inserted at their sort position. Rows that the
+        view has not fetched yet change without any signal.
+
+        Parameters:
+        search_key (str): The key of the search.
+        diff (ListingDiff): The new, changed and disappeared listings of the run.
+        """
+        removed = set()
+        inserts = [ResultRow(search_key, listing_key(listing), listing) for listing in diff.new]
+        for listing in diff.disappeared:
+            position = self._position((search_key, listing_key(listing)))
+            if position is not None:
+                removed.add(position)
+
+        for listing in diff.changed:
+            row = ResultRow(search_key, listing_key(listing), listing)
+            position = self._position((search_key, row.key))
+            if position is None:
+                inserts.append(row)
+            elif self._sort_column is not None and self._sort_key(row) != self._sort_key(self._rows[position]):
+                removed.add(position)
+                inserts.append(row)
+            else:
+                self._rows[position] = row
+                if position < self._loaded:
+                    self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.COLUMNS) - 1))
+
+        # New listings of a search may already be shown, e.g. when a run was applied twice
+        unique = {}
+        for row in inserts:
+            position = self._position((row.search_key, row.key))
+            if position is not None and position not in removed:
+                self._rows[position] = row
+                if position < self._loaded:
+                    self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.COLUMNS) - 1))
+            else:
+                unique[(row.search_key, row.key)] = row
+
+        self._remove_rows(sorted(removed, reverse=True))
+        self._insert_rows(list(unique.values()))
+
+    def _remove_rows(self, positions):
+        """
+        Remove rows given in descending order, one signal per contiguous visible range.
+        """
+        while positions:
+            end = start = positions.pop(0)
+            while positions and positions[0] == start - 1:
+                start = positions.pop(0)
+            if start < self._loaded:
+                visible_end = min(end, self._loaded - 1)
+                self.beginRemoveRows(QModelIndex(), start, visible_end)
+                del self._rows[start:end + 1]
+                self._loaded -= visible_end - start + 1
+                self._positions = None
+                self.endRemoveRows()
+            else:
+                del self._rows[start:end + 1]
+                self._positions = None
+
+    def _insert_rows(self, rows):
+        """
+        Insert rows at the end, or at their sort position if the model is sorted.
+        """
+        if not rows:
+            return
+        if self._sort_column is None:
+            fully_loaded = self._loaded == len(self._rows)
+            self._rows.extend(rows)
+            self._positions = None
+            # A view showing every row gets the new ones right away, the others fetch them on scrolling
+            if fully_loaded:
+                self.fetchMore()
+            return
+
+        descending = self._sort_order == Qt.DescendingOrder
+        if len(rows) > BULK_INSERT_THRESHOLD:
+            def merge():
+                self._rows.extend(rows)
+                self._rows.sort(key=self._sort_key, reverse=descending)
+            self._rearrange(merge)
+            return
+
+        for row in rows:
+            position = self._insert_position(row)
+            self._positions = None
+            if position < self._loaded or self._loaded == len(self._rows):
+                self.beginInsertRows(QModelIndex(), position, position)
+                self._rows.insert(position, row)
+                self._loaded += 1
+                self.endInsertRows()
+            else:
+                self._rows.insert(position, row)
@@ -0,0 +1,341 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import search_core
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config_service import ConfigService
+from job_queue import JobQueue
+from listing import Listing
+from listing_store import ListingStore, listing_key
+from near_duplicates import NearDuplicateIndex
+from logging_setup import configure_child_logging, forward_child_logging
+from price_history import PriceHistory
+from scraper import SearchCancelled
+
+# Get a logger for this module
+logger = logging.getLogger(__name__)
+
+# Default worker settings, overridable through the "workers" section of config.json
+DEFAULT_SETTINGS = {
+    "processes": 0,               # Worker processes, 0 to run the searches in the daemon's own threads
+    "threads": 4,                 # Searches run concurrently by each worker process
+    "lease_seconds": 120.0,       # A job whose worker stops renewing its lease for this long is handed to another worker
+    "max_attempts": 3,            # Leases of a job before it is given up
+    "retry_delay_seconds": 30.0,  # Delay before a failed job is retried, doubled after every attempt
+    "poll_seconds": 1.0,          # Sleep of idle workers and of the coordinator between queue checks
+    "restart_delay_seconds": 1.0, # Delay before restarting a worker that died soon after starting, doubled each time
+    "max_quick_restarts": 5,      # Workers of a slot dying soon after starting in a row before the slot is given up
+}
+
+# A worker dying within this many seconds of starting counts as failing to start, e.g. on a bad config
+QUICK_EXIT_SECONDS = 10.0
+
+def make_worker_id(*suffix):
+    """
+    Build a lease owner id that is unique across the processes sharing a queue.
+
+    Parameters:
+    suffix: Parts appended to distinguish the workers of one process.
+
+    Returns:
+    str: The id, <host>-<pid>[-<suffix>...].
+    """
+    return "-".join([socket.gethostname(), str(os.getpid()), *map(str, suffix)])
+
+def create_queue(path, settings=None):
+    """
+    Open the job queue with the retry policy of the "workers" section of the config.
+
+    Parameters:
+    path (str): The path of the queue database.
+    settings (dict): The "workers" section of the config, or None for the defaults.
+
+    Returns:
+    JobQueue: The queue.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    return JobQueue(path, max_attempts=settings["max_attempts"], retry_delay=settings["retry_delay_seconds"])
+
+def job_result(diff):
+    """
+    Reduce the diff of a search run to the JSON result a worker hands to the coordinator.
+
+    Parameters:
+    diff (ListingDiff): The outcome of the run.
+
+    Returns:
+    dict: The new listings, the keys of those that are near-duplicates and the numbers of
+    changed and disappeared listings.
+    """
+    return {
+        "new": [listing.to_dict() for listing in diff.new],
+        "duplicates": [listing_key(listing) for listing in diff.duplicates],
+        "changed": len(diff.changed),
+        "disappeared": len(diff.disappeared),
+    }
+
+def new_listings(result):
+    """
+    Get the new listings of a job result, see job_result().
+
+    Parameters:
+    result (dict): The result of a done job.
+
+    Returns:
+    list: The new Listing objects.
+    """
+    return [Listing(**values) for values in result["new"]]
+
+class Worker:
+    """
+    Leases search jobs from the queue and runs them through a SearchPipeline.
+
+    The pipeline writes listings and prices to the shared database itself; the
+    coordinator only receives the summary of every run through the queue, so
+    notifications are still sent from a single process.
+    """
+    def __init__(self, worker_id, queue, pipeline, settings=None):
+        """
+        Initialize the Worker.
+
+        Parameters:
+        worker_id (str): The lease owner id, unique across every process sharing the queue.
+        queue (JobQueue): The queue to take jobs from.
+        pipeline (SearchPipeline): The pipeline running the searches, without a dispatcher.
+        settings (dict): The "workers" section of the config, or None for the defaults.
+        """
+        self.worker_id = worker_id
+        self.queue = queue
+        self.pipeline = pipeline
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+
+    def process(self, job, stop_event):
+        """
+        Run one leased job and record its outcome in the queue.
+
+        The lease is renewed by run() while the job runs, see renew_leases().
+
+        Parameters:
+        job (Job): The leased job.
+        stop_event (threading.Event): Set on shutdown; the job is then put back for another worker.
+        """
+        try:
+            diff = self.pipeline.run(job.search_params, cancel_event=stop_event)
+        except SearchCancelled:
+            self.queue.release(job.job_id, self.worker_id)
+            return
+        except Exception as e:
+            logger.error(f"Job {job.job_id} of search {job.search_key} failed (attempt {job.attempts}): {e}",
+                         exc_info=True)
+            self.queue.fail(job.job_id, self.worker_id, str(e))
+            return
+        if not self.queue.complete(job.job_id, self.worker_id, job_result(diff)):
+            logger.warning(f"Worker {self.worker_id} lost the lease of job {job.job_id}, result discarded")
+
+    def renew_leases(self, jobs):
+        """
+        Extend the leases of the running jobs.
+
+        Leases are renewed on a clock rather than on search progress, so a single slow
+        download does not lose the job; only a worker that stopped running loses it.
+
+        Parameters:
+        jobs (iterable): The running Job objects.
+        """
+        for job in jobs:
+            if not self.queue.extend(job.job_id, self.worker_id, self.settings["lease_seconds"]):
+                logger.warning(f"Worker {self.worker_id} lost the lease of job {job.job_id}")
+
+    def run(self, stop_event, config_service=None):
+        """
+        Lease and run jobs until the stop event is set, renewing the leases of the running ones.
+
+        Parameters:
+        stop_event (threading.Event or multiprocessing.Event): Set on shutdown.
+        config_service (ConfigService): Checked for config changes between jobs, or None.
+        """
+        threads = self.settings["threads"]
+        lease_seconds = self.settings["lease_seconds"]
+        # Checked at least this often, so leases are renewed well before they expire
+        poll_seconds = min(self.settings["poll_seconds"], lease_seconds / 6)
+        logger.info(f"Worker {self.worker_id} started with {threads} threads")
+        # The job of every running future
+        running = {}
+        last_renewed = time.monotonic()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="job") as executor:
+            while not stop_event.is_set():
+                if config_service is not None:
+                    config_service.check_for_changes()
+                running = {future: job for future, job in running.items() if not future.done()}
+                if running and time.monotonic() - last_renewed >= lease_seconds / 3:
+                    self.renew_leases(running.values())
+                    last_renewed = time.monotonic()
+                job = self.queue.lease(self.worker_id, lease_seconds) if len(running) < threads else None
+                if job is not None:
+                    if not running:
+                        last_renewed = time.monotonic()
+                    running[executor.submit(self.process, job, stop_event)] = job
+                elif running and len(running) == threads:
+                    wait(running, timeout=poll_seconds, return_when=FIRST_COMPLETED)
+                else:
+                    stop_event.wait(poll_seconds)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+def run_worker(worker_id, config_path, database, queue_path, stop_event, log_queue=None):
+    """
+    Entry point of a worker process.
+
+    Parameters:
+    worker_id (str): The lease owner id of the worker.
+    config_path (str): The path of the JSON config.
+    database (str): The path of the listing database.
+    queue_path (str): The path of the queue database.
+    stop_event (multiprocessing.Event): Set by the coordinator on shutdown.
+    log_queue (multiprocessing.Queue): Where log records are sent to the coordinator, or None
+    to keep the logging of the calling process.
+    """
+    config_service = ConfigService(config_path)
+    config = config_service.get()
+    if log_queue is not None:
+        # Interrupts reach the whole process group; the coordinator stops workers through the stop event
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        configure_child_logging(log_queue, config.get('logging', {}).get('level', 'INFO'))
+    search_core.apply_settings(config)
+    # The worker settings are only read at startup
+    config_service.add_listener(search_core.apply_settings)
+
+    settings = config.get('workers')
+    queue = create_queue(queue_path, settings)
+    pipeline = search_core.SearchPipeline(ListingStore(database), history=PriceHistory(database),
+                                          duplicates=NearDuplicateIndex(database))
+    try:
+        Worker(worker_id, queue, pipeline, settings).run(stop_event, config_service)
+    finally:
+        pipeline.close()
+        queue.close()
+
+class WorkerPool:
+    """
+    Worker processes sharing a job queue, supervised by the coordinator process.
+
+    Processes are started with the spawn method, so they do not inherit the threads
+    and open connections of the coordinator. A worker that dies is replaced and its
+    jobs are handed to the other workers at once. Workers that die right after starting,
+    e.g. on a bad config, are restarted with an exponential backoff, and their slot is
+    given up after max_quick_restarts such failures in a row.
+    """
+    def __init__(self, processes, config_path, database, queue, settings=None):
+        """
+        Initialize the WorkerPool.
+
+        Parameters:
+        processes (int): The number of worker processes.
+        config_path (str): The path of the JSON config the workers load.
+        database (str): The path of the listing database.
+        queue (JobQueue): The queue shared with the workers.
+        settings (dict): The "workers" section of the config, or None for the defaults.
+        """
+        self.processes = processes
+        self.config_path = config_path
+        self.database = database
+        self.queue = queue
+        self.settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._log_queue = self._context.Queue()
+        self._log_listener = None
+        self._workers = {}
+        self._started = 0
+        # Per slot: the failures to start in a row, and when a slot waiting for a restart is due
+        self._quick_exits = {}
+        self._restart_at = {}
+
+    def _spawn(self, slot):
+        """
+        Start the worker process of a slot.
+        """
+        self._started += 1
+        worker_id = make_worker_id(self._started)
+        process = self._context.Process(
+            target=run_worker,
+            args=(worker_id, self.config_path, self.database, self.queue.path, self._stop_event, self._log_queue),
+            name=f"worker-{slot}",
+            daemon=True,
+        )
+        process.start()
+        self._workers[slot] = (worker_id, process, time.monotonic())
+
+    def start(self):
+        """
+        Start the worker processes.
+
+        Returns:
+        WorkerPool: The pool itself.
+        """
+        self._log_listener = forward_child_logging(self._log_queue)
+        for slot in range(self.processes):
+            self._spawn(slot)
+        logger.info(f"Started {self.processes} worker processes")
+        return self
+
+    def check_workers(self):
+        """
+        Replace the worker processes that died, releasing the jobs they held.
+
+        Returns:
+        bool: True while any slot has a worker running or waiting to be restarted.
+        """
+        if self._stop_event.is_set():
+            return True
+        now = time.monotonic()
+        for slot, restart_at in list(self._restart_at.items()):
+            if now >= restart_at:
+                del self._restart_at[slot]
+                self._spawn(slot)
+        for slot, (worker_id, process, started_at) in list(self._workers.items()):
+            if process.is_alive():
+                continue
+            del self._workers[slot]
+            released = self.queue.release_owner(worker_id)
+            if now - started_at >= QUICK_EXIT_SECONDS:
+                self._quick_exits[slot] = 0
+                logger.error(f"Worker {worker_id} died with exit code {process.exitcode}, "
+                             f"released {released} jobs and starting a replacement")
+                self._spawn(slot)
+                continue
+            self._quick_exits[slot] = self._quick_exits.get(slot, 0) + 1
+            if self._quick_exits[slot] > self.settings["max_quick_restarts"]:
+                logger.error(f"Worker {worker_id} exited with code {process.exitcode} right after starting "
+                             f"{self._quick_exits[slot]} times in a row, giving up on it")
+                continue
+            delay = self.settings["restart_delay_seconds"] * 2 ** (self._quick_exits[slot] - 1)
+            logger.error(f"Worker {worker_id} exited with code {process.exitcode} right after starting, "
+                         f"released {released} jobs and restarting it in {delay:g}s")
+            self._restart_at[slot] = now + delay
+        return bool(self._workers or self._restart_at)
+
+    def stop(self, timeout=30.0):
+        """
+        Stop the workers, waiting for their running searches to be cancelled.
+
+        Parameters:
+        timeout (float): Seconds to wait before terminating a worker.
+        """
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        self._restart_at.clear()
+        for worker_id, process, _ in self._workers.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Terminating worker {worker_id}")
+                process.terminate()
+                process.join()
+                self.queue.release_owner(worker_id)
+        self._workers.clear()
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from config_service import ConfigError, ConfigService, validate
+
+def test_valid_config_passes():
+    validate({"duplicates": {"threshold": 0.8}, "notifications": {"sms_backend": "log"}})
+
+@pytest.mark.parametrize("config", [
+    {"duplicates": {"threshold": "0.8"}},
+    {"duplicates": {"threshold": None}},
+    {"duplicates": {"threshold": True}},
+    {"duplicates": {"threshold": 1.5}},
+    {"notifications": {"sms_backend": "twillio"}},
+    {"max_concurrent_searches": 0},
+    {"schedule": {"interval_minutes": 0}},
+    {"saved_searches": [{"search_params": {}, "interval_minutes": -5}]},
+    {"search_params": []},
+])
+def test_invalid_configs_are_rejected(config):
+    with pytest.raises(ConfigError):
+        validate(config)
+
+def test_invalid_file_keeps_the_previous_config(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"duplicates": {"threshold": 0.8}}))
+    service = ConfigService(str(path))
+    assert service.get()["duplicates"]["threshold"] == 0.8
+
+    path.write_text(json.dumps({"duplicates": {"threshold": None}, "padding": "changes the size"}))
+    service.check_for_changes()
+    assert service.get()["duplicates"]["threshold"] == 0.8
@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+
+import pytest
+
+import exporters
+from exporters import INDEX_NAME, ExportError, ListingExporter, read_index
+from listing import Listing
+
+def cars(*names):
+    return [Listing.from_text(name, "10.000 EUR", f"https://example.com/{name}") for name in names]
+
+def read_rows(directory, entry):
+    path = os.path.join(directory, entry["path"])
+    if entry["format"] == "jsonl":
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+    if entry["format"] == "csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+    return exporters._pyarrow().parquet.read_table(path).to_pylist()
+
+@pytest.mark.parametrize("file_format", ["jsonl", "csv", "parquet"])
+def test_exported_rows_are_sealed_and_indexed(tmp_path, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    directory = str(tmp_path)
+    exporter = ListingExporter(directory, file_format, events=["new", "disappeared"])
+    exporter.start()
+    exporter.export("golfs", new=cars("golf", "polo"), changed=cars("up"))
+    exporter.export("golfs", disappeared=cars("id3"))
+    exporter.stop()
+
+    entry, = read_index(directory)
+    assert (entry["sequence"], entry["format"], entry["rows"]) == (1, file_format, 3)
+    rows = read_rows(directory, entry)
+    assert [(row["event"], row["title"]) for row in rows] == [("new", "golf"), ("new", "polo"), ("disappeared", "id3")]
+    assert not any(name.endswith(exporters.OPEN_SUFFIX) for _, _, names in os.walk(directory) for name in names)
+
+def test_files_are_rotated_by_size(tmp_path):
+    directory = str(tmp_path)
+    exporter = ListingExporter(directory, "jsonl", rotate_bytes=1)
+    exporter.start()
+    for name in ("golf", "polo", "up"):
+        exporter.export(name, new=cars(name))
+    exporter.stop()
+
+    entries = read_index(directory)
+    assert [entry["sequence"] for entry in entries] == [1, 2, 3]
+    assert [entry["rows"] for entry in entries] == [1, 1, 1]
+    assert [entry["sequence"] for entry in read_index(directory, after_sequence=2)] == [3]
+
+def test_reconfigure_seals_the_current_file(tmp_path):
+    directory = str(tmp_path)
+    exporter = ListingExporter(directory, "jsonl")
+    exporter.start()
+    exporter.export("golfs", new=cars("golf"))
+    exporter.reconfigure(directory, "csv", ["new"], 0, 0, 1000)
+    exporter.export("golfs", new=cars("polo"))
+    exporter.stop()
+
+    assert [(entry["format"], entry["rows"]) for entry in read_index(directory)] == [("jsonl", 1), ("csv", 1)]
+
+def test_unknown_format_is_rejected(tmp_path):
+    with pytest.raises(ExportError):
+        ListingExporter(str(tmp_path), "xml")
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_files_left_open_by_a_crash_are_recovered(tmp_path):
+    directory = str(tmp_path)
+    partition = os.path.join(directory, "date=2024-01-01")
+    sealed = {"sequence": 4, "path": "date=2024-01-01/listings-20240101T000000Z-000004.jsonl", "format": "jsonl",
+              "rows": 1}
+    # The index ends in a line cut short by the crash
+    write(os.path.join(directory, INDEX_NAME), json.dumps(sealed).encode() + b'\n{"sequence": 5, "pa')
+    lines = [json.dumps({"exported_at": f"2024-01-01T00:00:0{second}Z", "title": "golf"}) for second in range(3)]
+    write(os.path.join(partition, "listings-20240101T000001Z-000005.jsonl.open"),
+          "\n".join(lines).encode() + b'\n{"exported_at": "2024-01-01T00:0')
+    write(os.path.join(partition, "listings-20240101T000002Z-000006.csv.open"), b"title,price\ngolf,1\npolo,2\nup,")
+    write(os.path.join(partition, "listings-20240101T000003Z-000007.csv.open"), b"title,price\n")
+    write(os.path.join(partition, "listings-20240101T000004Z-000008.parquet.open"), b"PAR1 without a footer")
+
+    exporter = ListingExporter(directory, "jsonl")
+
+    entries = read_index(directory)
+    assert [(entry["sequence"], entry["rows"]) for entry in entries] == [(4, 1), (5, 3), (6, 2)]
+    assert [entry["path"] for entry in entries[1:]] == [
+        "date=2024-01-01/listings-20240101T000001Z-000005.jsonl",
+        "date=2024-01-01/listings-20240101T000002Z-000006.csv",
+    ]
+    assert (entries[1]["first_exported_at"], entries[1]["last_exported_at"]) == (
+        "2024-01-01T00:00:00Z", "2024-01-01T00:00:02Z")
+    with open(os.path.join(partition, "listings-20240101T000001Z-000005.jsonl"), encoding="utf-8") as f:
+        assert [json.loads(line)["title"] for line in f] == ["golf"] * 3
+    with open(os.path.join(partition, "listings-20240101T000002Z-000006.csv"), encoding="utf-8") as f:
+        assert f.read() == "title,price\ngolf,1\npolo,2\n"
+    # Empty and unreadable files are dropped
+    assert sorted(os.listdir(partition)) == [
+        "listings-20240101T000001Z-000005.jsonl",
+        "listings-20240101T000002Z-000006.csv",
+    ]
+
+    # New partitions continue the sequence
+    exporter.start()
+    exporter.export("golfs", new=cars("golf"))
+    exporter.stop()
+    assert read_index(directory)[-1]["sequence"] == 7
+
+def test_recovery_runs_once_per_directory(tmp_path):
+    directory = str(tmp_path)
+    ListingExporter(directory, "jsonl")
+    # A file opened after the first exporter of the process is live, not left by a crash
+    live = os.path.join(directory, "date=2024-01-01", "listings-20240101T000000Z-000001.jsonl.open")
+    write(live, b'{"title": "golf"}\n')
+    ListingExporter(directory, "jsonl")
+    assert os.path.exists(live)
+    assert read_index(directory) == []
@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+import filters
+from filters import FilterError, KeywordMatcher, ListingFilter
+from listing import Listing
+
+@pytest.fixture
+def pure_python(monkeypatch):
+    """
+    Use the built-in automaton even if pyahocorasick is installed.
+    """
+    monkeypatch.setattr(filters, "_ahocorasick", lambda: None)
+
+def brute_force(keywords, text):
+    return sum_masks(mask for keyword, mask in keywords.items() if keyword.casefold() in text.casefold())
+
+def sum_masks(masks):
+    found = 0
+    for mask in masks:
+        found |= mask
+    return found
+
+def test_overlapping_keywords_are_all_found(pure_python):
+    matcher = KeywordMatcher({"he": 1, "she": 2, "his": 4, "hers": 8})
+    assert matcher.match("ushers") == 1 | 2 | 8
+    assert matcher.match("his") == 4
+    assert matcher.match("nothing here") == 1
+    assert matcher.match("") == 0
+
+def test_matching_is_case_insensitive(pure_python):
+    matcher = KeywordMatcher({"Diesel": 1, "ÄRGER": 2})
+    assert matcher.match("VW Golf DIESEL") == 1
+    assert matcher.match("viel ärger") == 2
+
+def test_automaton_agrees_with_brute_force(pure_python):
+    rng = random.Random(7)
+    keywords = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 4))): 1 << bit for bit in range(12)}
+    matcher = KeywordMatcher(keywords)
+    for _ in range(500):
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 20)))
+        assert matcher.match(text) == brute_force(keywords, text), text
+
+def listing(title, price="10.000 EUR", url="https://example.com/car"):
+    return Listing.from_text(title, price, url)
+
+CARS = [
+    listing("VW Golf diesel", "12.000 EUR"),
+    listing("VW Polo petrol", "8.000 EUR"),
+    listing("VW ID.3 electric", "30.000 EUR"),
+    listing("VW Up damaged", "2.000 EUR"),
+    listing("VW Passat", "£ 15,000"),
+    listing("VW Beetle", "price on request"),
+]
+
+def titles(listings):
+    return [car.title for car in listings]
+
+def test_without_rules_every_listing_passes():
+    assert not ListingFilter()
+    assert ListingFilter().apply(CARS) == CARS
+
+def test_price_rules_drop_listings_without_price():
+    rules = [{"type": "min_price", "value": 5000}, {"type": "max_price", "value": 20000}]
+    assert titles(ListingFilter(rules).apply(CARS)) == ["VW Golf diesel", "VW Polo petrol", "VW Passat"]
+
+def test_price_rule_with_currency():
+    rules = [{"type": "max_price", "value": 20000, "currency": "EUR"}]
+    assert titles(ListingFilter(rules).apply(CARS)) == ["VW Golf diesel", "VW Polo petrol", "VW Up damaged"]
+
+def test_include_and_exclude_keywords(pure_python):
+    rules = [
+        {"type": "include", "keywords": ["golf", "polo", "up"]},
+        {"type": "exclude", "keywords": ["DAMAGED"]},
+    ]
+    assert titles(ListingFilter(rules).apply(CARS)) == ["VW Golf diesel", "VW Polo petrol"]
+
+def test_every_include_rule_must_match(pure_python):
+    rules = [{"type": "include", "keywords": ["vw"]}, {"type": "include", "keywords": ["diesel", "electric"]}]
+    assert titles(ListingFilter(rules).apply(CARS)) == ["VW Golf diesel", "VW ID.3 electric"]
+
+def test_keyword_rules_on_other_fields(pure_python):
+    cars = [listing("VW Golf", url="https://dealer.example.com/1"), listing("VW Polo", url="https://private.example.com/2")]
+    rules = [{"type": "exclude", "keywords": ["private."], "field": "url"}]
+    assert titles(ListingFilter(rules).apply(cars)) == ["VW Golf"]
+
+def test_regex_rules():
+    rules = [{"type": "regex", "pattern": r"^vw (golf|polo)\b"}, {"type": "regex", "pattern": "petrol", "exclude": True}]
+    assert titles(ListingFilter(rules).apply(CARS)) == ["VW Golf diesel"]
+
+def test_disabled_rules_are_skipped():
+    rules = [{"type": "include", "keywords": ["golf"], "enabled": False}]
+    assert ListingFilter(rules).apply(CARS) == CARS
+
+def test_select_returns_indices_in_order(pure_python):
+    rules = [{"type": "exclude", "keywords": ["polo", "up"]}]
+    assert ListingFilter(rules).select(CARS) == [0, 2, 4, 5]
+
+@pytest.mark.parametrize("rule", [
+    {"type": "unknown"},
+    {"type": "min_price"},
+    {"type": "min_price", "value": "cheap"},
+    {"type": "include", "keywords": []},
+    {"type": "include", "keywords": [""]},
+    {"type": "include", "keywords": ["golf"], "field": "color"},
+    {"type": "regex", "pattern": "("},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(FilterError):
+        ListingFilter([rule])
@@ -0,0 +1,137 @@
+import pytest
+
+import html_parser
+from html_parser import ListingParser, StreamingListingParser
+
+SELECTORS = {
+    "listing": "div.listing",
+    "title": ".title",
+    "price": ".price",
+    "link": "a",
+    "image": "img",
+    "next_page": "a.next",
+}
+
+PAGE = b"""<!DOCTYPE html>
+<html><body>
+<div class="results">
+  <div class="listing featured"><a href="/cars/1"><span class="title"> VW Golf </span></a>
+    <span class="price">12.500 EUR</span><img src="/img/1.jpg"></div>
+  <div class="listing"><a href="https://other.example.com/cars/2"><span class="title">VW Polo</span></a>
+    <span class="price">&euro; 9,900</span></div>
+  <div class="listing"><span class="title">No price, skipped</span></div>
+  <div class="listing"><span class="title">Without link</span><span class="price">7.000 EUR</span></div>
+</div>
+<div class="pager"><a class="next" href="?page=2">Next</a></div>
+</body></html>"""
+
+PAGE_URL = "https://example.com/search?page=1"
+
+EXPECTED = [
+    ("VW Golf", "12.500 EUR", "https://example.com/cars/1", "https://example.com/img/1.jpg", 1250000, "EUR"),
+    ("VW Polo", "€ 9,900", "https://other.example.com/cars/2", None, 990000, "EUR"),
+    ("Without link", "7.000 EUR", None, None, 700000, "EUR"),
+]
+
+def fields(listing):
+    return (listing.title, listing.price, listing.url, listing.image_url, listing.price_cents, listing.currency)
+
+def backend_or_skip(name):
+    try:
+        return html_parser.get_backend(name)
+    except ImportError:
+        pytest.skip(f"the {name} backend is not installed")
+
+@pytest.fixture(params=sorted(html_parser.BACKENDS))
+def backend(request):
+    return backend_or_skip(request.param)
+
+def test_backends_extract_the_same_listings(backend):
+    listings, next_url = ListingParser(SELECTORS, backend).parse(PAGE, PAGE_URL)
+    assert [fields(listing) for listing in listings] == EXPECTED
+    assert next_url == "https://example.com/search?page=2"
+
+def test_last_page_has_no_next_url(backend):
+    page = PAGE.replace(b'class="next"', b'class="previous"')
+    _, next_url = ListingParser(SELECTORS, backend).parse(page, PAGE_URL)
+    assert next_url is None
+
+def test_parsers_are_cached_per_selectors():
+    backend_or_skip("html.parser")
+    parser = html_parser.get_listing_parser(SELECTORS, "html.parser")
+    assert html_parser.get_listing_parser(dict(reversed(list(SELECTORS.items()))), "html.parser") is parser
+
+def test_unknown_default_backend_is_rejected():
+    with pytest.raises(ValueError):
+        html_parser.set_default_backend("no-such-parser")
+
+def streaming_parse(parser, page, chunk_size):
+    """
+    Run the streaming parser over a page cut into chunks, returning its listings and next URL.
+    """
+    chunks = [page[start:start + chunk_size] for start in range(0, len(page), chunk_size)]
+    generator = parser.parse(chunks, PAGE_URL)
+    listings = []
+    while True:
+        try:
+            listings.append(next(generator))
+        except StopIteration as stop:
+            return listings, stop.value
+
+@pytest.fixture
+def streaming_parser():
+    backend_or_skip("lxml")
+    pytest.importorskip("cssselect")
+    return StreamingListingParser(SELECTORS)
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_streaming_parser_matches_the_full_parse(streaming_parser, chunk_size):
+    listings, next_url = streaming_parse(streaming_parser, PAGE, chunk_size)
+    assert [fields(listing) for listing in listings] == EXPECTED
+    assert next_url == "https://example.com/search?page=2"
+
+def test_streaming_parser_matches_descendant_and_child_selectors():
+    backend_or_skip("lxml")
+    pytest.importorskip("cssselect")
+    parser = StreamingListingParser({**SELECTORS, "listing": "div.results > div.listing", "next_page": ".pager a"})
+    listings, next_url = streaming_parse(parser, PAGE, 16)
+    assert [fields(listing) for listing in listings] == EXPECTED
+    assert next_url == "https://example.com/search?page=2"
+
+SIBLING_PAGE = b"""<html><body><div class="results">
+  <div class="header">Featured</div>
+  <div class="listing"><span class="title">First</span><span class="price">1 EUR</span></div>
+  <div class="listing"><span class="title">Second</span><span class="price">2 EUR</span></div>
+  <div class="header">Others</div>
+  <div class="listing"><span class="title">Third</span><span class="price">3 EUR</span></div>
+</div></body></html>"""
+
+@pytest.mark.parametrize("listing_selector, titles", [
+    ("div.header + div.listing", ["First", "Third"]),
+    ("div.listing + div.listing", ["Second"]),
+    ("div.header ~ div.listing", ["First", "Second", "Third"]),
+    ("div.listing ~ div.header ~ div.listing", ["Third"]),
+    ("div.listing:nth-child(3)", ["Second"]),
+])
+@pytest.mark.parametrize("chunk_size", [1, 1 << 20])
+def test_streaming_parser_matches_sibling_selectors(listing_selector, titles, chunk_size):
+    backend_or_skip("lxml")
+    pytest.importorskip("cssselect")
+    selectors = {**SELECTORS, "listing": listing_selector}
+    listings, _ = streaming_parse(StreamingListingParser(selectors), SIBLING_PAGE, chunk_size)
+    assert [listing.title for listing in listings] == titles
+    full, _ = ListingParser(selectors, html_parser.get_backend("lxml")).parse(SIBLING_PAGE, PAGE_URL)
+    assert [listing.title for listing in full] == titles
+
+@pytest.mark.parametrize("selectors", [
+    {"listing": "div.listing:last-child"},
+    {"listing": "div.listing:nth-last-of-type(2)"},
+    {"listing": "div.results:has(.header) > div.listing"},
+    {"listing": "div.listing:not(:only-child)"},
+    {"next_page": ".pager:last-child a"},
+])
+def test_streaming_parser_is_not_used_for_lookahead_selectors(selectors):
+    backend_or_skip("lxml")
+    pytest.importorskip("cssselect")
+    assert html_parser.get_streaming_parser({**SELECTORS, **selectors}) is None
+    assert html_parser.get_streaming_parser(SELECTORS) is not None
@@ -0,0 +1,181 @@
+import collections
+import io
+import types
+
+import pytest
+import requests
+
+import http_cache
+import metrics
+import scraper
+from http_client import HttpClient
+
+URL = "https://example.com/search?q=golf"
+
+PAGE = b"""<html><body>
+<div class="listing-item"><a href="/1"><span class="title">VW Golf</span></a><span class="price">9.000 EUR</span></div>
+<div class="listing-item"><a href="/2"><span class="title">VW Polo</span></a><span class="price">7.000 EUR</span></div>
+</body></html>"""
+
+def make_response(url, status=200, body=b"", headers=None):
+    """
+    Build a streamed response as the session would return it.
+    """
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers or {})
+    return response
+
+class StubSend:
+    """
+    Stand in for the network, answering with the queued responses and recording the request headers.
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def __call__(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        status, body, response_headers = self.responses.pop(0)
+        return make_response(url, status, body, response_headers)
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    client = HttpClient(rate_limit_per_host=0, chunk_bytes=16,
+                        cache={"enabled": True, "path": str(tmp_path / "http_cache.db")})
+    yield client
+    client.close()
+
+def stub(monkeypatch, client, *responses):
+    send = StubSend(*responses)
+    monkeypatch.setattr(client, "_send", send)
+    return send
+
+def test_a_miss_is_streamed_and_stored_once_read_completely(client, monkeypatch):
+    stub(monkeypatch, client, (200, PAGE, {"ETag": '"v1"'}))
+    response = client.get(URL, stream=True)
+    assert not getattr(response, "from_cache", False)
+
+    chunks = client.iter_body(response)
+    next(chunks)
+    assert client.cache.lookup(http_cache.normalize_url(URL)) is None
+    assert next(chunks) + b"".join(chunks)
+    entry = client.cache.lookup(http_cache.normalize_url(URL))
+    assert entry.body == PAGE and entry.etag == '"v1"'
+
+    # The stored page is now a hit
+    assert client.get(URL, stream=True).from_cache
+
+def test_a_body_read_only_partly_is_not_stored(client, monkeypatch):
+    stub(monkeypatch, client, (200, PAGE, {}))
+    chunks = client.iter_body(client.get(URL, stream=True))
+    next(chunks)
+    chunks.close()
+    assert client.cache.lookup(http_cache.normalize_url(URL)) is None
+
+def test_errors_and_no_store_responses_are_not_stored(client, monkeypatch):
+    stub(monkeypatch, client, (500, b"error", {}), (200, PAGE, {"Cache-Control": "no-store"}))
+    for _ in range(2):
+        client.read_body(client.get(URL, stream=True))
+    assert client.cache.lookup(http_cache.normalize_url(URL)) is None
+
+def test_result_pages_stream_on_a_cache_miss(client, monkeypatch):
+    pytest.importorskip("lxml")
+    pytest.importorskip("cssselect")
+    stub(monkeypatch, client, (200, PAGE, {}))
+    site = scraper.SiteAdapter("test", "https://example.com/search?", required_fields=[])
+
+    listings = scraper.iter_listings({"q": "golf"}, client=client, stream=True, site=site, max_pages=1)
+    assert next(listings).title == "VW Golf"
+    # The first listing arrived before the page was downloaded and stored
+    assert client.cache.lookup(http_cache.normalize_url("https://example.com/search?q=golf")) is None
+    assert [listing.title for listing in listings] == ["VW Polo"]
+    assert client.cache.lookup(http_cache.normalize_url("https://example.com/search?q=golf")).body == PAGE
+
+def test_a_fresh_entry_is_served_without_a_request(client, monkeypatch):
+    send = stub(monkeypatch, client, (200, PAGE, {}))
+    client.read_body(client.get(URL, stream=True))
+    # Equivalent spellings of the URL share the entry
+    response = client.get("HTTPS://example.com:443/search?q=golf#top", stream=True)
+    assert response.from_cache and response.content == PAGE
+    assert len(send.requests) == 1
+
+def test_an_expired_entry_is_revalidated_with_its_validators(client, monkeypatch):
+    send = stub(monkeypatch, client,
+                (200, PAGE, {"ETag": '"v1"', "Last-Modified": "Thu, 01 Jan 2026 10:00:00 GMT"}),
+                (304, b"", {"ETag": '"v2"'}))
+    client.read_body(client.get(URL, stream=True))
+
+    response = client.get(URL, cache_ttl=0, stream=True)
+    assert send.requests[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Thu, 01 Jan 2026 10:00:00 GMT"}
+    assert response.from_cache and response.content == PAGE
+    assert client.cache.lookup(http_cache.normalize_url(URL)).etag == '"v2"'
+    # The 304 restarted the TTL
+    assert client.get(URL, stream=True).from_cache
+    assert len(send.requests) == 2
+
+def test_an_expired_entry_without_validators_is_downloaded_again(client, monkeypatch):
+    send = stub(monkeypatch, client, (200, b"old", {}), (200, PAGE, {}))
+    client.read_body(client.get(URL, stream=True))
+
+    response = client.get(URL, cache_ttl=0, stream=True)
+    assert send.requests[1] == {} and not getattr(response, "from_cache", False)
+    assert client.read_body(response) == PAGE
+    assert client.cache.lookup(http_cache.normalize_url(URL)).body == PAGE
+
+def test_the_least_recently_used_entries_are_evicted_over_max_bytes(tmp_path, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(http_cache, "time", type("Clock", (), {"time": staticmethod(lambda: clock[0])}))
+    cache = http_cache.ResponseCache(str(tmp_path / "http_cache.db"), max_bytes=25)
+    for name in ("a", "b", "c"):
+        clock[0] += 1
+        cache.store(name, make_response(f"https://example.com/{name}"), b"x" * 10)
+        if name == "b":
+            # Using "a" makes "b" the least recently used
+            clock[0] += 1
+            cache.lookup("a")
+
+    assert [key for key in "abc" if cache.lookup(key) is not None] == ["a", "c"]
+    cache.close()
+
+def test_replay_serves_stored_responses_and_fails_on_misses(tmp_path):
+    path = str(tmp_path / "http_cache.db")
+    http_cache.ResponseCache(path).store(http_cache.normalize_url(URL), make_response(URL), PAGE)
+    cache = http_cache.create_cache({"replay": True, "path": path})
+
+    def send(url, headers):
+        raise AssertionError("replay must not send requests")
+
+    # A replayed response is served however old it is
+    assert cache.get(URL, send, ttl_seconds=0).content == PAGE
+    with pytest.raises(http_cache.CacheMiss):
+        cache.get("https://example.com/search?q=polo", send)
+    cache.close()
+
+def test_identical_pages_are_parsed_once(monkeypatch):
+    pytest.importorskip("lxml")
+    pytest.importorskip("cssselect")
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    monkeypatch.setattr(scraper, "_parse_cache", collections.OrderedDict())
+    get_listing_parser = scraper.html_parser.get_listing_parser
+    calls = []
+
+    def counting_parser(selectors, backend):
+        parser = get_listing_parser(selectors, backend)
+        return types.SimpleNamespace(parse=lambda content, page_url: calls.append(page_url) or parser.parse(content, page_url))
+
+    monkeypatch.setattr(scraper.html_parser, "get_listing_parser", counting_parser)
+
+    first, _ = scraper.parse_page(PAGE, URL)
+    first.clear()
+    second, _ = scraper.parse_page(PAGE, URL)
+    # The memoized listings are not affected by changes to a returned list
+    assert [listing.title for listing in second] == ["VW Golf", "VW Polo"]
+    # A page with other content, or the same content at another URL, is parsed again
+    scraper.parse_page(PAGE.replace(b"Polo", b"Up!"), URL)
+    scraper.parse_page(PAGE, "https://example.com/search?q=golf&page=2")
+    assert len(calls) == 3
+    assert registry.to_json()["parse_cache_hits_total"]["series"][0]["value"] == 1
@@ -0,0 +1,103 @@
+import pytest
+
+from job_queue import JobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2, retry_delay=0)
+    yield queue
+    queue.close()
+
+def test_jobs_are_leased_in_order(queue):
+    first = queue.enqueue("a", {"model": "golf"})
+    second = queue.enqueue("b", {"model": "polo"})
+    job = queue.lease("worker-1", 60)
+    assert (job.job_id, job.search_key, job.search_params, job.attempts) == (first, "a", {"model": "golf"}, 1)
+    assert queue.lease("worker-2", 60).job_id == second
+    assert queue.lease("worker-3", 60) is None
+
+def test_pending_search_is_not_enqueued_twice(queue):
+    assert queue.enqueue("a", {}) is not None
+    assert queue.enqueue("a", {}) is None
+    job = queue.lease("worker-1", 60)
+    assert queue.enqueue("a", {}) is None
+    queue.complete(job.job_id, "worker-1", {})
+    assert queue.enqueue("a", {}) is not None
+
+def test_completed_jobs_are_collected_once(queue):
+    queue.enqueue("a", {})
+    job = queue.lease("worker-1", 60)
+    assert queue.complete(job.job_id, "worker-1", {"new": 3})
+    assert queue.pending_count() == 0
+
+    finished, = queue.collect_finished()
+    assert (finished.search_key, finished.state, finished.attempts, finished.result) == ("a", "done", 1, {"new": 3})
+    assert queue.collect_finished() == []
+
+def test_only_the_owner_extends_and_completes(queue):
+    queue.enqueue("a", {})
+    job = queue.lease("worker-1", 60)
+    assert queue.extend(job.job_id, "worker-1", 60)
+    assert not queue.extend(job.job_id, "worker-2", 60)
+    assert not queue.complete(job.job_id, "worker-2", {})
+    assert queue.pending_count() == 1
+
+def test_expired_lease_is_taken_over(queue):
+    queue.enqueue("a", {})
+    job = queue.lease("worker-1", -1)
+    retaken = queue.lease("worker-2", 60)
+    assert (retaken.job_id, retaken.attempts) == (job.job_id, 2)
+
+    # The first worker lost the job and its result is discarded
+    assert not queue.extend(job.job_id, "worker-1", 60)
+    assert not queue.complete(job.job_id, "worker-1", {"new": 1})
+    assert queue.complete(job.job_id, "worker-2", {"new": 2})
+    finished, = queue.collect_finished()
+    assert finished.result == {"new": 2}
+
+def test_job_is_given_up_after_its_leases_expire_max_attempts_times(queue):
+    queue.enqueue("a", {})
+    queue.lease("worker-1", -1)
+    queue.lease("worker-2", -1)
+    assert queue.lease("worker-3", 60) is None
+
+    finished, = queue.collect_finished()
+    assert (finished.state, finished.error) == ("failed", "lease expired")
+
+def test_failed_job_is_retried_then_given_up(queue):
+    queue.enqueue("a", {})
+    job = queue.lease("worker-1", 60)
+    assert queue.fail(job.job_id, "worker-1", "timeout")
+
+    job = queue.lease("worker-1", 60)
+    assert job.attempts == 2
+    assert not queue.fail(job.job_id, "worker-1", "timeout again")
+    finished, = queue.collect_finished()
+    assert (finished.state, finished.error) == ("failed", "timeout again")
+
+def test_failed_job_waits_for_the_retry_delay(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=3, retry_delay=60)
+    queue.enqueue("a", {})
+    job = queue.lease("worker-1", 60)
+    queue.fail(job.job_id, "worker-1", "timeout")
+    assert queue.lease("worker-1", 60) is None
+    assert queue.pending_count() == 1
+    queue.close()
+
+def test_release_does_not_count_the_attempt(queue):
+    queue.enqueue("a", {})
+    job = queue.lease("worker-1", 60)
+    queue.release(job.job_id, "worker-1")
+    assert queue.lease("worker-2", 60).attempts == 1
+
+def test_release_owner_frees_the_jobs_of_a_dead_worker(queue):
+    queue.enqueue("a", {})
+    queue.enqueue("b", {})
+    queue.lease("worker-1", 60)
+    queue.lease("worker-1", 60)
+    assert queue.lease("worker-2", 60) is None
+
+    assert queue.release_owner("worker-1") == 2
+    leased = [queue.lease("worker-2", 60), queue.lease("worker-2", 60)]
+    assert sorted(job.search_key for job in leased) == ["a", "b"]
+    assert all(job.attempts == 2 for job in leased)
@@ -0,0 +1,34 @@
+import pytest
+
+from listing import Listing, parse_price
+
+@pytest.mark.parametrize("text, expected", [
+    ("10.148 EUR", (1014800, "EUR")),
+    ("$1,234.50", (123450, "USD")),
+    ("1 234,5 €", (123450, "EUR")),
+    ("CHF 1'250.-", (125000, "CHF")),
+    ("Price on request", (None, None)),
+    ("USD on request", (None, "USD")),
+])
+def test_prices_are_normalized(text, expected):
+    assert parse_price(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("1.500 OBO", (150000, None)),
+    ("NEW 2.000", (200000, None)),
+    ("1.000 € incl. VAT", (100000, "EUR")),
+    ("VAT incl. 1.000 GBP", (100000, "GBP")),
+])
+def test_words_of_three_capitals_are_not_currencies(text, expected):
+    assert parse_price(text) == expected
+
+@pytest.mark.parametrize("text, currency", [
+    ("USD accepted, 800 EUR", "EUR"),
+    ("CHF 1.000, GBP accepted", "CHF"),
+])
+def test_the_code_next_to_the_number_wins(text, currency):
+    assert parse_price(text)[1] == currency
+
+def test_listing_from_text_parses_the_price():
+    listing = Listing.from_text("VW Golf", "12.500 EUR", "https://example.com/1")
+    assert (listing.price_cents, listing.currency) == (1250000, "EUR")
@@ -0,0 +1,83 @@
+import pytest
+import time
+
+from listing import Listing
+from listing_store import ListingStore, content_hash, listing_key
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(str(tmp_path / "listings.db"))
+    yield store
+    store.close()
+
+def car(name, price="10.000 EUR", url=True):
+    return Listing.from_text(name, price, f"https://example.com/{name}" if url else None)
+
+def titles(listings):
+    return sorted(listing.title for listing in listings)
+
+def test_first_run_reports_every_listing_as_new(store):
+    diff = store.apply_run("search", [car("golf"), car("polo")], complete=True)
+    assert titles(diff.new) == ["golf", "polo"]
+    assert diff.changed == [] and diff.disappeared == []
+
+def test_second_run_reports_new_changed_and_disappeared(store):
+    store.apply_run("search", [car("golf"), car("polo"), car("up")], complete=True)
+    diff = store.apply_run("search", [car("golf"), car("polo", "9.000 EUR"), car("id3")], complete=True)
+
+    assert titles(diff.new) == ["id3"]
+    assert titles(diff.changed) == ["polo"]
+    assert diff.changed[0].price_cents == 900000
+    assert titles(diff.disappeared) == ["up"]
+
+def test_incomplete_run_does_not_report_disappeared(store):
+    store.apply_run("search", [car("golf"), car("polo")], complete=True)
+    diff = store.apply_run("search", [car("golf")], complete=False)
+    assert diff.new == [] and diff.changed == [] and diff.disappeared == []
+    assert titles(listing for _, listing in store.active_listings()) == ["golf", "polo"]
+
+def test_run_stored_in_parts_reports_disappeared_once_complete(store):
+    store.apply_run("search", [car("golf"), car("polo"), car("up")], complete=True)
+    started = time.time()
+    assert titles(store.apply_run("search", [car("golf")], complete=False).new) == []
+    assert titles(store.apply_run("search", [car("id3")], complete=False).new) == ["id3"]
+
+    assert titles(store.mark_disappeared("search", started)) == ["polo", "up"]
+    assert store.mark_disappeared("search", started) == []
+    assert titles(listing for _, listing in store.active_listings()) == ["golf", "id3"]
+
+def test_reappearing_listing_is_active_again_without_being_new(store):
+    store.apply_run("search", [car("golf"), car("polo")], complete=True)
+    store.apply_run("search", [car("golf")], complete=True)
+    assert titles(listing for _, listing in store.active_listings()) == ["golf"]
+
+    diff = store.apply_run("search", [car("golf"), car("polo")], complete=True)
+    assert diff.new == [] and diff.changed == [] and diff.disappeared == []
+    assert titles(listing for _, listing in store.active_listings()) == ["golf", "polo"]
+
+def test_searches_are_diffed_independently(store):
+    store.apply_run("golfs", [car("golf")], complete=True)
+    diff = store.apply_run("polos", [car("golf"), car("polo")], complete=True)
+    assert titles(diff.new) == ["golf", "polo"]
+    assert store.apply_run("golfs", [], complete=True).disappeared == [car("golf")]
+
+def test_listings_without_link_are_keyed_by_content(store):
+    listing = car("golf", url=False)
+    assert listing_key(listing) == content_hash(listing)
+    store.apply_run("search", [listing], complete=True)
+    assert store.is_known("search", listing)
+
+    diff = store.apply_run("search", [car("golf", "9.000 EUR", url=False)], complete=True)
+    # Without a link a new price makes a different listing
+    assert titles(diff.new) == ["golf"] and titles(diff.disappeared) == ["golf"]
+
+def test_duplicates_within_a_run_are_stored_once(store):
+    diff = store.apply_run("search", [car("golf"), car("golf")], complete=True)
+    assert len(diff.new) == 1
+    assert len(store.active_listings()) == 1
+
+def test_is_known_detects_changed_content(store):
+    store.apply_run("search", [car("golf")], complete=True)
+    assert store.is_known("search", car("golf"))
+    assert not store.is_known("search", car("golf", "9.000 EUR"))
+    assert not store.is_known("other", car("golf"))
@@ -0,0 +1,80 @@
+import gzip
+import logging
+import os
+import pytest
+import time
+
+from logging_setup import RotatingLogFileHandler, tail_lines
+
+@pytest.fixture
+def log_file(tmp_path):
+    return tmp_path / "application.log"
+
+def numbered(count):
+    return "".join(f"line {number}\n" for number in range(count))
+
+def record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+@pytest.mark.parametrize("block_size", [1, 7, 8192])
+def test_tail_returns_the_last_lines_for_any_block_size(log_file, block_size):
+    log_file.write_text(numbered(50))
+    assert tail_lines(str(log_file), 3, block_size) == "line 47\nline 48\nline 49\n"
+
+def test_tail_keeps_a_line_crossing_a_block_boundary_whole(log_file):
+    log_file.write_text("first\n" + "x" * 25 + "\nlast\n")
+    # The 10-byte blocks split the long line three times
+    assert tail_lines(str(log_file), 2, 10) == "x" * 25 + "\nlast\n"
+
+def test_tail_returns_a_last_line_without_newline(log_file):
+    log_file.write_text("one\ntwo\nthree")
+    assert tail_lines(str(log_file), 2, 4) == "two\nthree"
+
+def test_tail_returns_the_whole_file_when_it_has_fewer_lines(log_file):
+    log_file.write_text(numbered(3))
+    assert tail_lines(str(log_file), 100, 5) == numbered(3)
+    assert tail_lines(str(log_file), 0, 5) == ""
+
+def test_tail_decodes_characters_split_across_blocks(log_file):
+    log_file.write_bytes("Preis: 1.000 €\nMünchen\n".encode("utf-8"))
+    assert tail_lines(str(log_file), 2, 3) == "Preis: 1.000 €\nMünchen\n"
+
+def test_tail_of_a_missing_file_raises(log_file):
+    with pytest.raises(FileNotFoundError):
+        tail_lines(str(log_file))
+
+def test_handler_rotates_by_size_into_gzipped_segments(log_file):
+    handler = RotatingLogFileHandler(str(log_file), max_bytes=40, backup_count=2, compress=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    for number in range(4):
+        handler.emit(record(f"message {number} " + "x" * 20))
+    handler.close()
+
+    assert sorted(os.listdir(log_file.parent)) == ["application.log", "application.log.1.gz", "application.log.2.gz"]
+    assert gzip.open(f"{log_file}.1.gz", "rt").read() == "message 2 " + "x" * 20 + "\n"
+    assert log_file.read_text() == "message 3 " + "x" * 20 + "\n"
+
+def test_handler_rotates_a_segment_older_than_rotate_days(log_file):
+    handler = RotatingLogFileHandler(str(log_file), rotate_days=1, backup_count=1)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.emit(record("yesterday"))
+    handler.emit(record("still yesterday"))
+    handler.opened_at -= 24 * 60 * 60
+    handler.emit(record("today"))
+    handler.close()
+
+    assert (log_file.parent / "application.log.1").read_text() == "yesterday\nstill yesterday\n"
+    assert log_file.read_text() == "today\n"
+
+def test_handler_ages_a_log_left_by_a_previous_run_from_its_last_write(log_file):
+    log_file.write_text("old run\n")
+    two_days_ago = time.time() - 2 * 24 * 60 * 60
+    os.utime(log_file, (two_days_ago, two_days_ago))
+
+    handler = RotatingLogFileHandler(str(log_file), rotate_days=1, backup_count=1, compress=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.emit(record("new run"))
+    handler.close()
+
+    assert gzip.open(f"{log_file}.1.gz", "rt").read() == "old run\n"
+    assert log_file.read_text() == "new run\n"
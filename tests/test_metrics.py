@@ -0,0 +1,126 @@
+import contextlib
+import contextvars
+import json
+import sys
+import threading
+import types
+
+import pytest
+
+import metrics
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    return registry
+
+def sample_rate(monkeypatch, rate, draws=None):
+    """Set the sample rate and, optionally, the values random.random() returns in turn."""
+    monkeypatch.setattr(metrics, "_settings", {**metrics.DEFAULT_SETTINGS, "sample_rate": rate})
+    if draws is not None:
+        draws = iter(draws)
+        monkeypatch.setattr(metrics.random, "random", lambda: next(draws))
+
+def phase_counts(registry):
+    series = registry.to_json().get("search_phase_seconds", {"series": []})["series"]
+    return {entry["labels"]["phase"]: entry["count"] for entry in series}
+
+def test_counters_and_histograms_are_exported_as_prometheus_text(registry):
+    registry.counter("listings_total", "Listings found", site="a\"b").inc(3)
+    for seconds in (0.05, 0.5, 50.0):
+        registry.histogram("phase_seconds", "Phase durations", phase="parse").observe(seconds)
+
+    lines = registry.to_prometheus().splitlines()
+    assert lines[:5] == [
+        "# HELP listings_total Listings found",
+        "# TYPE listings_total counter",
+        'listings_total{site="a\\"b"} 3',
+        "# HELP phase_seconds Phase durations",
+        "# TYPE phase_seconds histogram",
+    ]
+    # Buckets are cumulative and an observation on a bound falls into that bucket
+    assert 'phase_seconds_bucket{phase="parse",le="0.025"} 0' in lines
+    assert 'phase_seconds_bucket{phase="parse",le="0.05"} 1' in lines
+    assert 'phase_seconds_bucket{phase="parse",le="30.0"} 2' in lines
+    assert lines[-3:] == [
+        'phase_seconds_bucket{phase="parse",le="+Inf"} 3',
+        'phase_seconds_sum{phase="parse"} 50.55',
+        'phase_seconds_count{phase="parse"} 3',
+    ]
+
+def test_series_are_identified_by_name_and_labels(registry):
+    metrics.count("runs_total", "Runs", search="a")
+    metrics.count("runs_total", "Runs", amount=2, search="a")
+    metrics.count("runs_total", "Runs", search="b")
+
+    exported = registry.to_json()["runs_total"]
+    assert exported["type"] == "counter"
+    assert [(series["labels"], series["value"]) for series in exported["series"]] == [
+        ({"search": "a"}, 3), ({"search": "b"}, 1)
+    ]
+
+@pytest.mark.parametrize("file_name", ["metrics.json", "metrics.prom"])
+def test_export_writes_json_or_prometheus_text(registry, tmp_path, file_name):
+    metrics.count("runs_total", "Runs")
+    path = tmp_path / file_name
+    registry.export(str(path))
+
+    if file_name.endswith(".json"):
+        assert json.loads(path.read_text())["runs_total"]["series"][0]["value"] == 1
+    else:
+        assert path.read_text() == registry.to_prometheus()
+    assert sorted(item.name for item in tmp_path.iterdir()) == [file_name]
+
+def test_phases_outside_of_a_run_are_sampled_on_their_own(registry, monkeypatch):
+    sample_rate(monkeypatch, 0.5, [0.4, 0.6, 0.1])
+    for _ in range(3):
+        with metrics.timed("parse"):
+            pass
+    assert phase_counts(registry) == {"parse": 2}
+
+@pytest.mark.parametrize("draw, expected", [(0.4, {"download": 2, "parse": 1}), (0.6, {})])
+def test_every_phase_of_a_run_follows_its_sampling_decision(registry, monkeypatch, draw, expected):
+    # A second draw would raise StopIteration: the run decides once for all its phases
+    sample_rate(monkeypatch, 0.5, [draw])
+    with metrics.traced_run("search"):
+        with metrics.timed("download"):
+            pass
+        with metrics.timed("parse"):
+            pass
+        metrics.observe("download", 0.2)
+    assert phase_counts(registry) == expected
+    assert metrics._run_sampled.get() is None
+
+def test_sampling_decision_reaches_threads_started_in_a_copied_context(registry, monkeypatch):
+    # Without the run's context the thread would draw again and fail on the exhausted draws
+    sample_rate(monkeypatch, 0.5, [0.1])
+    with metrics.traced_run("search"):
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(metrics.observe, "parse", 0.1))
+        thread.start()
+        thread.join()
+    assert phase_counts(registry) == {"parse": 1}
+
+def test_sampled_runs_become_sentry_transactions_with_phase_spans(registry, monkeypatch):
+    recorded = []
+
+    @contextlib.contextmanager
+    def record(kind, **kwargs):
+        recorded.append((kind, kwargs))
+        yield
+
+    sentry_sdk = types.SimpleNamespace(
+        is_initialized=lambda: True,
+        get_current_span=lambda: object() if recorded else None,
+        start_transaction=lambda **kwargs: record("transaction", **kwargs),
+        start_span=lambda **kwargs: record("span", **kwargs),
+    )
+    monkeypatch.setitem(sys.modules, "sentry_sdk", sentry_sdk)
+    monkeypatch.setattr(metrics, "_settings", {**metrics.DEFAULT_SETTINGS, "sentry_traces_sample_rate": 1.0})
+
+    with metrics.traced_run("golf"):
+        with metrics.timed("download"):
+            pass
+    assert recorded == [("transaction", {"op": "search", "name": "golf"}), ("span", {"op": "download"})]
+    assert phase_counts(registry) == {"download": 1}
@@ -0,0 +1,86 @@
+import pytest
+import zlib
+
+import near_duplicates
+from listing import Listing
+from listing_store import listing_key
+from near_duplicates import NearDuplicateIndex, minhash, shingles, similarity
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "listings.db"))
+    yield index
+    index.close()
+
+def car(title, price="12.500 EUR", site="a"):
+    return Listing.from_text(title, price, f"https://{site}.example.com/{zlib.crc32(title.encode())}")
+
+GOLF = "VW Golf 7 1.4 TSI Highline, 2017, 85.000 km"
+
+def test_a_repost_on_another_site_joins_the_group_of_the_original(index):
+    original, repost = car(GOLF), car("VW Golf 7 1.4 TSI Highline 2017 - 85.000km!", "12.400 EUR", site="b")
+    assert index.add("golf", [original]) == []
+
+    match, = index.add("golf-b", [repost])
+    assert (match.listing, match.search_key, match.listing_key) == (repost, "golf", listing_key(original))
+    assert match.similarity == 1.0
+    assert index.group("golf-b", repost) == [("golf", listing_key(original)), ("golf-b", listing_key(repost))]
+
+def test_similarity_is_compared_against_the_threshold(tmp_path):
+    original, edited = car(GOLF), car("VW Golf VII 1.4 TSI Highline 2017 85.000km", site="b")
+    score = similarity(minhash(shingles(original)), minhash(shingles(edited)))
+    assert 0.5 < score < 0.75
+
+    below = NearDuplicateIndex(str(tmp_path / "below.db"))
+    assert below.add("golf", [original, edited], threshold=0.75) == []
+    below.close()
+    above = NearDuplicateIndex(str(tmp_path / "above.db"))
+    assert [match.similarity for match in above.add("golf", [original, edited], threshold=score)] == [score]
+    above.close()
+
+def test_different_cars_and_distant_prices_are_not_duplicates(index):
+    index.add("golf", [car(GOLF)])
+    assert index.add("golf", [car("VW Golf 7 1.4 TSI Comfortline, 2016, 120.000 km")]) == []
+    assert index.add("golf", [car(GOLF + ".", "15.000 EUR")]) == []
+    # Another currency leaves the decision to the title
+    assert len(index.add("golf", [car(GOLF + "!", "13.000 CHF")])) == 1
+
+def test_listings_already_indexed_for_the_search_are_skipped(index):
+    listing = car(GOLF)
+    index.add("golf", [listing])
+    assert index.add("golf", [listing]) == []
+    assert index.group("golf", listing) == [("golf", listing_key(listing))]
+
+def test_numpy_and_pure_python_signatures_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    features = shingles(car(GOLF))
+    with_numpy = minhash(features)
+    monkeypatch.setattr(near_duplicates, "_numpy", lambda: None)
+    assert minhash(features) == with_numpy
+
+def test_the_index_persists_across_reopening(tmp_path):
+    path = str(tmp_path / "listings.db")
+    index = NearDuplicateIndex(path)
+    index.add("golf", [car(GOLF)])
+    index.close()
+
+    reopened = NearDuplicateIndex(path)
+    assert len(reopened.add("golf", [car(GOLF + "!", site="b")])) == 1
+    reopened.close()
+
+def test_an_index_built_with_other_parameters_is_cleared(tmp_path, monkeypatch):
+    path = str(tmp_path / "listings.db")
+    index = NearDuplicateIndex(path)
+    index.add("golf", [car(GOLF)])
+    index.close()
+
+    monkeypatch.setattr(near_duplicates, "INDEX_VERSION", "minhash-128-32-5")
+    rebuilt = NearDuplicateIndex(path)
+    assert rebuilt.add("golf", [car(GOLF + "!", site="b")]) == []
+    rebuilt.close()
+
+@pytest.mark.parametrize("action, expected", [("suppress", ["polo"]), ("notify", [GOLF, "polo"])])
+def test_near_duplicates_are_suppressed_or_notified(monkeypatch, action, expected):
+    monkeypatch.setattr(near_duplicates, "_settings", {**near_duplicates.DEFAULT_SETTINGS, "action": action})
+    listings = [car(GOLF), car("polo")]
+    assert [listing.title for listing in near_duplicates.to_notify(listings, {listing_key(listings[0])})] == expected
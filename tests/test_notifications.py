@@ -0,0 +1,134 @@
+import email
+import socket
+import threading
+
+import pytest
+
+from listing import Listing
+from notifications import EmailSink, MemorySink, NotificationDispatcher
+
+Controller = pytest.importorskip("aiosmtpd.controller").Controller
+
+class RecordingHandler:
+    """
+    aiosmtpd handler keeping every received message, failing the first `failures` DATA commands.
+    """
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.messages = []
+        self.received = threading.Event()
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            self.failures -= 1
+            return "451 Temporary failure, try again"
+        self.messages.append(email.message_from_bytes(envelope.content))
+        self.received.set()
+        return "250 OK"
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    """
+    Start an in-process SMTP server and yield a function creating its handler's EmailSink.
+    """
+    handler = RecordingHandler()
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    settings = {"host": "127.0.0.1", "port": port, "starttls": False,
+                "username": None, "sender": "scraper@example.com", "timeout": 5.0}
+    try:
+        yield handler, lambda: EmailSink("user@example.com", settings)
+    finally:
+        controller.stop()
+
+def listings(*titles):
+    return [Listing.from_text(title, "1.000 EUR", f"https://example.com/{title}") for title in titles]
+
+def test_email_sink_sends_every_listing(smtp_server):
+    handler, create_sink = smtp_server
+    sink = create_sink()
+    sink.send(listings("Golf", "Polo"))
+    sink.close()
+
+    message, = handler.messages
+    assert message["To"] == "user@example.com"
+    assert message["From"] == "scraper@example.com"
+    body = message.get_payload(decode=True).decode()
+    assert "Golf - 1.000 EUR" in body and "Polo - 1.000 EUR" in body
+
+def test_email_sink_reuses_its_connection(smtp_server):
+    handler, create_sink = smtp_server
+    sink = create_sink()
+    sink.send(listings("Golf"))
+    server = sink._server
+    sink.send(listings("Polo"))
+    assert sink._server is server
+    sink.close()
+    assert len(handler.messages) == 2
+
+def test_dispatcher_coalesces_listings_into_one_email(smtp_server):
+    handler, create_sink = smtp_server
+    dispatcher = NotificationDispatcher([create_sink()], coalesce_seconds=0.5, max_retries=0)
+    dispatcher.start()
+    dispatcher.notify(listings("Golf"))
+    dispatcher.notify(listings("Polo", "Passat"))
+    dispatcher.notify([])
+    assert handler.received.wait(5)
+    dispatcher.stop()
+
+    message, = handler.messages
+    body = message.get_payload(decode=True).decode()
+    assert all(title in body for title in ("Golf", "Polo", "Passat"))
+
+def test_dispatcher_retries_failed_sends(smtp_server):
+    handler, create_sink = smtp_server
+    handler.failures = 2
+    dispatcher = NotificationDispatcher([create_sink()], coalesce_seconds=0, max_retries=3, backoff_factor=0.01)
+    dispatcher.start()
+    dispatcher.notify(listings("Golf"))
+    assert handler.received.wait(5)
+    dispatcher.stop()
+
+    assert handler.failures == 0
+    assert len(handler.messages) == 1
+
+def test_dispatcher_gives_up_after_max_retries(smtp_server):
+    handler, create_sink = smtp_server
+    handler.failures = 10
+    memory = MemorySink()
+    dispatcher = NotificationDispatcher([create_sink(), memory], coalesce_seconds=0, max_retries=1,
+                                        backoff_factor=0.01)
+    dispatcher.start()
+    dispatcher.notify(listings("Golf"))
+    dispatcher.stop()
+
+    assert handler.failures == 8
+    assert handler.messages == []
+    # A failing sink does not keep the others from sending
+    assert memory.sent == [listings("Golf")]
+
+def test_dispatcher_stop_flushes_the_pending_batch():
+    memory = MemorySink()
+    dispatcher = NotificationDispatcher([memory], coalesce_seconds=60)
+    dispatcher.start()
+    dispatcher.notify(listings("Golf"))
+    dispatcher.stop()
+    assert memory.sent == [listings("Golf")]
+
+def test_reconfigure_sends_queued_listings_to_the_previous_sinks():
+    previous, current = MemorySink("previous"), MemorySink("current")
+    dispatcher = NotificationDispatcher([previous], coalesce_seconds=60)
+    dispatcher.start()
+    dispatcher.notify(listings("Golf"))
+    dispatcher.reconfigure([current], 60, 0, 1.0)
+    dispatcher.notify(listings("Polo"))
+    dispatcher.stop()
+
+    assert previous.sent == [listings("Golf")]
+    assert current.sent == [listings("Polo")]
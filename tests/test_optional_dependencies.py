@@ -0,0 +1,18 @@
+import json
+
+from optional_dependencies import lazy_import
+
+def test_installed_module_is_returned():
+    assert lazy_import("json")() is json
+
+def test_missing_module_or_submodule_gives_none():
+    assert lazy_import("no_such_module_here")() is None
+    assert lazy_import("json", "json.no_such_submodule")() is None
+
+def test_import_is_only_attempted_once(monkeypatch):
+    attempts = []
+    get = lazy_import("no_such_module_here")
+    monkeypatch.setattr("importlib.import_module", lambda name: attempts.append(name) or json)
+    assert get() is json
+    assert get() is json
+    assert attempts == ["no_such_module_here"]
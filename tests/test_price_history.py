@@ -0,0 +1,65 @@
+import pytest
+
+from listing import Listing
+from listing_store import ListingStore, listing_key
+from price_history import PriceHistory, day_of
+
+# Noon on a fixed day, so every observation lands in the same daily rollup
+NOON = 1767268800.0
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(str(tmp_path / "listings.db"))
+    yield store
+    store.close()
+
+@pytest.fixture
+def history(store):
+    history = PriceHistory(store.path)
+    yield history
+    history.close()
+
+def run(store, history, listings, observed_at):
+    """Store a complete run and record its prices, the way SearchPipeline does."""
+    diff = store.apply_run("search", listings, True)
+    return history.record("search", diff.new + diff.changed, observed_at)
+
+def car(name, price):
+    return Listing.from_text(name, price, f"https://example.com/{name}")
+
+def test_drops_are_reported_against_the_latest_price(history):
+    assert history.record("search", [car("golf", "10.000 EUR"), car("polo", "8.000 EUR")], NOON) == []
+    drops = history.record("search", [car("golf", "9.500 EUR"), car("polo", "8.500 EUR")], NOON + 60)
+    assert [(drop.listing.title, drop.previous_cents, drop.price_cents) for drop in drops] == [("golf", 1000000, 950000)]
+    assert [row[:4] for row in history.price_drops("search")] == [(listing_key(car("golf", "")), "EUR", 1000000, 950000)]
+
+def test_unchanged_and_unpriced_listings_are_skipped(history):
+    history.record("search", [car("golf", "10.000 EUR")], NOON)
+    history.record("search", [car("golf", "10.000 EUR"), car("up", "call us")], NOON + 60)
+    assert [observation.price_cents for observation in history.listing_history("search", listing_key(car("golf", "")))] == [1000000]
+
+def test_a_drop_to_another_currency_is_not_a_drop(history):
+    history.record("search", [car("golf", "10.000 EUR")], NOON)
+    assert history.record("search", [car("golf", "9.000 CHF")], NOON + 60) == []
+
+def test_daily_rollups_count_every_listing_on_the_market_that_day(store, history):
+    run(store, history, [car("golf", "10.000 EUR"), car("polo", "8.000 EUR")], NOON)
+    run(store, history, [car("golf", "9.000 EUR"), car("polo", "8.000 EUR"), car("up", "6.000 EUR")], NOON + 60)
+
+    daily, = history.daily("search")
+    assert daily.day == day_of(NOON)
+    # Each listing counts once per day, at its last price of the day
+    assert (daily.count, daily.min_cents, daily.median_cents, daily.max_cents) == (3, 600000, 800000, 900000)
+    assert daily.mean_cents == (900000 + 800000 + 600000) // 3
+
+def test_unchanged_listings_count_on_every_day_they_stay_listed(store, history):
+    run(store, history, [car("golf", "10.000 EUR"), car("polo", "8.000 EUR")], NOON)
+    # Nothing changed the next day; only the price of golf was observed once
+    run(store, history, [car("golf", "10.000 EUR"), car("polo", "8.000 EUR")], NOON + 86400)
+    # The day after, polo is gone
+    run(store, history, [car("golf", "10.000 EUR")], NOON + 2 * 86400)
+
+    assert [(daily.count, daily.median_cents) for daily in history.daily("search")] == [
+        (2, 900000), (2, 900000), (1, 1000000)
+    ]
+    assert len(history.listing_history("search", listing_key(car("golf", "")))) == 1
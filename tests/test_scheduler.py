@@ -0,0 +1,124 @@
+import pytest
+
+from scheduler import SearchScheduler, configure_scheduler
+
+class FakeClock:
+    """
+    A clock that only moves when told to.
+    """
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def scheduler(clock):
+    return SearchScheduler(jitter=0.0, speedup=0.5, slowdown=2.0, min_interval_factor=0.25,
+                           max_interval_factor=4.0, clock=clock)
+
+def run(scheduler, clock, new_listings=0):
+    """
+    Advance to the next due search, run it and report its result; returns its id.
+    """
+    clock.advance(scheduler.next_due_in())
+    search, = scheduler.pop_due()
+    scheduler.complete(search.search_id, new_listings)
+    return search.search_id
+
+def test_new_search_is_due_after_its_delay(scheduler, clock):
+    assert scheduler.next_due_in() is None
+    scheduler.add("golf", {"model": "golf"}, 60, delay=10)
+    assert scheduler.next_due_in() == 10
+    assert scheduler.pop_due() == []
+    clock.advance(10)
+    assert [search.search_id for search in scheduler.pop_due()] == ["golf"]
+    # A running search is not due again until it completes
+    assert scheduler.next_due_in() is None
+
+def test_idle_search_backs_off_up_to_the_maximum(scheduler, clock):
+    scheduler.add("golf", {}, 60)
+    intervals = []
+    for _ in range(4):
+        run(scheduler, clock, new_listings=0)
+        intervals.append(scheduler.next_due_in())
+    assert intervals == [120, 240, 240, 240]
+
+def test_search_finding_listings_speeds_up_down_to_the_minimum(scheduler, clock):
+    scheduler.add("golf", {}, 60)
+    run(scheduler, clock, new_listings=0)
+    intervals = []
+    for _ in range(4):
+        run(scheduler, clock, new_listings=3)
+        intervals.append(scheduler.next_due_in())
+    assert intervals == [60, 30, 15, 15]
+
+def test_failed_run_keeps_the_interval(scheduler, clock):
+    scheduler.add("golf", {}, 60)
+    run(scheduler, clock, new_listings=0)
+    run(scheduler, clock, new_listings=None)
+    assert scheduler.next_due_in() == 120
+
+def test_runs_missed_while_running_collapse_into_one(scheduler, clock):
+    scheduler.add("golf", {}, 60)
+    search, = scheduler.pop_due()
+    clock.advance(600)
+    scheduler.complete(search.search_id, 0)
+    assert scheduler.next_due_in() == 120
+    assert scheduler.pop_due() == []
+
+def test_replace_keeps_the_timing_of_searches_that_stay(scheduler, clock):
+    scheduler.add("golf", {"model": "golf"}, 60)
+    scheduler.add("polo", {"model": "polo"}, 60)
+    for search in scheduler.pop_due():
+        scheduler.complete(search.search_id, 0)
+    clock.advance(20)
+
+    scheduler.replace({"golf": ({"model": "golf", "year": 2020}, 60), "up": ({"model": "up"}, 60)})
+    assert set(scheduler.searches) == {"golf", "up"}
+    assert scheduler.searches["golf"].search_params == {"model": "golf", "year": 2020}
+    # The new search is due at once, the kept one still after the rest of its backed-off interval
+    assert [search.search_id for search in scheduler.pop_due()] == ["up"]
+    clock.advance(scheduler.next_due_in())
+    assert [search.search_id for search in scheduler.pop_due()] == ["golf"]
+    assert clock.now == 1000.0 + 120
+
+def test_replace_scales_a_changed_interval(scheduler, clock):
+    scheduler.add("golf", {}, 60)
+    run(scheduler, clock, new_listings=0)
+    clock.advance(20)
+    scheduler.replace({"golf": ({}, 30)})
+    # 100s were left of the adapted 120s; both are halved
+    assert scheduler.next_due_in() == 50
+    assert scheduler.searches["golf"].interval == 60
+
+def test_replaced_running_search_is_rescheduled_on_completion(scheduler, clock):
+    scheduler.add("golf", {}, 60)
+    clock.advance(scheduler.next_due_in())
+    search, = scheduler.pop_due()
+    scheduler.replace({"golf": ({}, 120)})
+    assert scheduler.next_due_in() is None
+    scheduler.complete(search.search_id, 0)
+    assert scheduler.next_due_in() == 240
+
+@pytest.mark.parametrize("interval", [0, -60])
+def test_non_positive_intervals_are_rejected(scheduler, interval):
+    with pytest.raises(ValueError):
+        scheduler.add("golf", {}, interval)
+    scheduler.add("polo", {}, 60)
+    with pytest.raises(ValueError):
+        scheduler.replace({"golf": ({}, interval), "polo": ({}, 60)})
+    assert set(scheduler.searches) == {"polo"}
+
+def test_configure_scheduler_changes_the_adaptation(scheduler, clock):
+    configure_scheduler(scheduler, {"jitter": 0.0, "adaptive": False})
+    scheduler.add("golf", {}, 60)
+    run(scheduler, clock, new_listings=0)
+    assert scheduler.next_due_in() == 60
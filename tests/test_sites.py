@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+import metrics
+import scraper
+import sites
+
+def fake_search(results, gates):
+    """
+    Stand in for scraper.run_search, returning the result of a site once its gate opens.
+    """
+    def run_search(search_params, site=None, **kwargs):
+        gates[site.name].wait(5)
+        outcome = results[site.name]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return run_search
+
+@pytest.fixture
+def registry():
+    return sites.SiteRegistry([
+        {"name": name, "search_url": f"https://{name}.example.com/s?{{query}}"} for name in ("slow", "fast", "broken")
+    ])
+
+def test_site_results_are_yielded_as_each_crawl_ends(registry, monkeypatch):
+    results = {
+        "slow": scraper.SearchResult(["slow listing"], True),
+        "fast": scraper.SearchResult(["fast listing"], True),
+        "broken": RuntimeError("site down"),
+    }
+    gates = {name: threading.Event() for name in results}
+    monkeypatch.setattr(scraper, "run_search", fake_search(results, gates))
+    gates["fast"].set()
+
+    site_results = sites.iter_site_results({}, registry=registry)
+    # The slow site is still crawling when the fast one is handed over
+    assert next(site_results) == ("fast", results["fast"])
+    gates["broken"].set()
+    assert next(site_results) == ("broken", scraper.SearchResult([], False))
+    gates["slow"].set()
+    assert list(site_results) == [("slow", results["slow"])]
+
+def test_merged_result_is_in_site_order_and_incomplete_on_failure(registry, monkeypatch):
+    results = {
+        "slow": scraper.SearchResult(["slow listing"], True),
+        "fast": scraper.SearchResult(["fast listing"], True),
+        "broken": RuntimeError("site down"),
+    }
+    gates = {name: threading.Event() for name in results}
+    for gate in gates.values():
+        gate.set()
+    monkeypatch.setattr(scraper, "run_search", fake_search(results, gates))
+
+    assert sites.run_sites({}, registry=registry) == scraper.SearchResult(["slow listing", "fast listing"], False)
+
+def test_error_is_raised_when_every_site_fails(registry, monkeypatch):
+    results = {name: ValueError(f"{name} needs a model") for name in registry.names()}
+    gates = {name: threading.Event() for name in results}
+    for gate in gates.values():
+        gate.set()
+    monkeypatch.setattr(scraper, "run_search", fake_search(results, gates))
+
+    with pytest.raises(ValueError, match="slow needs a model"):
+        sites.run_sites({}, registry=registry)
+
+def test_site_crawls_keep_the_sampling_decision_of_the_run(registry, monkeypatch):
+    sampled = {}
+
+    def run_search(search_params, site=None, **kwargs):
+        sampled[site.name] = metrics.is_sampled()
+        return scraper.SearchResult([], True)
+
+    monkeypatch.setattr(scraper, "run_search", run_search)
+    monkeypatch.setattr(metrics, "_settings", {**metrics._settings, "sample_rate": 0.5})
+    for decision in (0.0, 0.99):
+        # traced_run draws once; a draw below the rate samples the whole run
+        monkeypatch.setattr(metrics.random, "random", lambda: decision)
+        with metrics.traced_run("search"):
+            # Draws inside the run would disagree with the run's decision
+            monkeypatch.setattr(metrics.random, "random", lambda: 1.0 - decision)
+            sites.run_sites({}, registry=registry)
+        assert sampled == {name: decision < 0.5 for name in registry.names()}